@@ -0,0 +1,105 @@
+import asyncio
+import multiprocessing
+import os
+from itertools import count
+from typing import List, Optional
+
+from disas import InstrDisas
+from uiCA import AnalysisOptions, AnalysisResult, SimulationCancelledError, analyzeDisas, checkAnalysisParameters, decodeCode, getExecutor
+
+# asyncio interface for uiCA. The analyses are run on an executor that is managed by the AsyncAnalyzer (a thread pool on free-threaded Python
+# builds, a process pool otherwise; see uiCA.getExecutor), and are awaited without blocking the event loop. At most maxConcurrency analyses are
+# submitted to the executor at the same time; further requests wait in the event loop. Each submitted analysis uses a slot with a cancellation
+# flag in shared memory, which the simulation checks in every cycle; thus, if a request is cancelled or times out, the simulation is stopped as
+# well, and the worker becomes available for other requests.
+
+analyzerIdIter = count()
+cancelFlagsForAnalyzer = {} # id of the AsyncAnalyzer -> cancellation flags; set in each worker process (or, for thread pools, in this process)
+
+def initWorker(analyzerId, cancelFlags):
+   cancelFlagsForAnalyzer[analyzerId] = cancelFlags
+
+def runAnalysis(analyzerId, slot, code, disas, uArchConfig, options):
+   cancelFlags = cancelFlagsForAnalyzer[analyzerId]
+   def isCancelled():
+      return cancelFlags[slot] != 0
+
+   if isCancelled():
+      raise SimulationCancelledError()
+   if disas is None:
+      disas = decodeCode(code, uArchConfig)
+   return analyzeDisas(disas, uArchConfig, options, isCancelled)
+
+
+class AsyncAnalyzer:
+   def __init__(self, maxConcurrency=None, maxWorkers=None, executorType=None):
+      self.maxWorkers = maxWorkers or os.cpu_count() or 1
+      self.maxConcurrency = maxConcurrency or self.maxWorkers
+      self.id = next(analyzerIdIter)
+      self.cancelFlags = multiprocessing.RawArray('b', self.maxConcurrency)
+      self.executor = getExecutor(executorType, self.maxWorkers, initializer=initWorker, initargs=(self.id, self.cancelFlags))
+      self.freeSlots: Optional[asyncio.Queue] = None # created in the event loop
+      self.closed = False
+
+   async def __aenter__(self):
+      return self
+
+   async def __aexit__(self, *exc):
+      await self.close()
+
+   # Like uiCA.analyze; raises an asyncio.TimeoutError if the analysis does not finish within timeout seconds (including the time waiting for a
+   # slot). The analysis is stopped if the request is cancelled.
+   async def analyze(self, code: bytes, arch, options: Optional[AnalysisOptions]=None, timeout=None) -> AnalysisResult:
+      return await self.submit(bytes(code), None, arch, options, timeout)
+
+   # Like analyze, but for code that has already been decoded
+   async def analyzeDisas(self, disas: List[InstrDisas], arch, options: Optional[AnalysisOptions]=None, timeout=None) -> AnalysisResult:
+      return await self.submit(None, list(disas), arch, options, timeout)
+
+   async def submit(self, code, disas, arch, options, timeout):
+      if self.closed:
+         raise RuntimeError('AsyncAnalyzer is closed')
+      if options is None:
+         options = AnalysisOptions()
+      if options.keepSimulation:
+         raise ValueError('keepSimulation is not supported by AsyncAnalyzer') # the simulation cannot be transferred from a worker process
+      uArchConfig = checkAnalysisParameters(arch, options)
+
+      loop = asyncio.get_running_loop()
+      if self.freeSlots is None:
+         self.freeSlots = asyncio.Queue()
+         for slot in range(self.maxConcurrency):
+            self.freeSlots.put_nowait(slot)
+      return await asyncio.wait_for(self.run(loop, code, disas, uArchConfig, options), timeout)
+
+   async def run(self, loop, code, disas, uArchConfig, options):
+      slot = await self.freeSlots.get()
+      self.cancelFlags[slot] = 0
+      try:
+         future = self.executor.submit(runAnalysis, self.id, slot, code, disas, uArchConfig, options)
+      except BaseException:
+         self.freeSlots.put_nowait(slot)
+         raise
+      # the slot is only reused after the analysis has actually stopped
+      future.add_done_callback(lambda _: self.releaseSlot(loop, slot))
+      try:
+         return await asyncio.wrap_future(future)
+      except asyncio.CancelledError:
+         self.cancelFlags[slot] = 1
+         raise
+
+   def releaseSlot(self, loop, slot):
+      try:
+         loop.call_soon_threadsafe(self.freeSlots.put_nowait, slot)
+      except RuntimeError:
+         pass # the event loop is already closed
+
+   # Stops the analyses that are still running (their requests raise a SimulationCancelledError), and shuts down the executor
+   async def close(self):
+      if self.closed:
+         return
+      self.closed = True
+      for slot in range(self.maxConcurrency):
+         self.cancelFlags[slot] = 1
+      await asyncio.get_running_loop().run_in_executor(None, self.executor.shutdown)
+      cancelFlagsForAnalyzer.pop(self.id, None)
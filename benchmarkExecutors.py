@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+
+import argparse
+import sys
+import time
+from itertools import repeat
+
+import uiCA
+from microArchConfigs import MicroArchConfigs
+
+# Compares the process pool and the thread pool (see uiCA.getExecutor) for the simulations that are run for "-alignmentOffset all" and for
+# "-arch all". The instruction data is reloaded for each run, so that the startup costs of both executors are included in the measured times. The
+# thread pool only runs simulations in parallel on free-threaded builds of Python.
+
+def clearCaches():
+   for cache in [uiCA.archDataCache, uiCA.instrDataFileCache, uiCA.attrKeysCache, uiCA.instrDataCache]:
+      cache.clear()
+
+# like runSimulation, but without printing anything
+def getTP(disas, uArchConfig, alignmentOffset, initPolicy):
+   instructions = uiCA.getInstructions(disas, uArchConfig, uiCA.getArchData(uArchConfig), alignmentOffset)
+   return uiCA.simulate(instructions, uArchConfig, alignmentOffset, initPolicy, False).TP
+
+def runBenchmark(executorType, disasList, uArchConfigs, alignmentOffsets, initPolicy):
+   clearCaches()
+   startTime = time.perf_counter()
+   with uiCA.getExecutor(executorType) as executor:
+      TPList = list(executor.map(getTP, disasList, uArchConfigs, alignmentOffsets, repeat(initPolicy)))
+   return (time.perf_counter() - startTime, TPList)
+
+
+def main():
+   parser = argparse.ArgumentParser(description='Compares process and thread pools for running simulations in parallel')
+   parser.add_argument('filename', help='File to be analyzed')
+   parser.add_argument('-raw', help='raw file', action='store_true')
+   parser.add_argument('-iacaMarkers', help='Use IACA markers', action='store_true')
+   parser.add_argument('-arch', help='Microarchitecture for the "-alignmentOffset all" benchmark; default: SKL', default='SKL')
+   parser.add_argument('-initPolicy', help='Initial register state; default: "diff"', default='diff')
+   parser.add_argument('-repetitions', help='Number of runs per benchmark and executor; the minimum time is reported. Default: 3', type=int, default=3)
+   args = parser.parse_args()
+
+   if not args.arch in MicroArchConfigs:
+      print('Unsupported microarchitecture')
+      exit(1)
+
+   print('Python {}, {}'.format(sys.version.split()[0], 'free-threaded' if uiCA.isFreeThreaded() else 'with GIL'))
+
+   uArchConfig = MicroArchConfigs[args.arch]
+   disas = uiCA.getXedDisas(args.filename, args.raw, uArchConfig, args.iacaMarkers)
+   allArchConfigs = [MicroArchConfigs[uArch] for uArch in sorted(m for m in MicroArchConfigs if not '_' in m)]
+   disasForChip = uiCA.getXedDisasForArchs(args.filename, args.raw, allArchConfigs, args.iacaMarkers)
+
+   benchmarks = [('-alignmentOffset all', [disas] * 64, [uArchConfig] * 64, list(range(0, 64))),
+                 ('-arch all', [disasForChip[c.XEDName] for c in allArchConfigs], allArchConfigs, [0] * len(allArchConfigs))]
+   for name, disasList, uArchConfigs, alignmentOffsets in benchmarks:
+      times = {}
+      TPLists = {}
+      for executorType in ['process', 'thread']:
+         runs = [runBenchmark(executorType, disasList, uArchConfigs, alignmentOffsets, args.initPolicy) for _ in range(args.repetitions)]
+         times[executorType] = min(t for t, _ in runs)
+         TPLists[executorType] = runs[0][1]
+      if TPLists['process'] != TPLists['thread']:
+         print('{}: the executors computed different throughputs'.format(name))
+         exit(1)
+      print('{:<22} process pool: {:7.3f} s   thread pool: {:7.3f} s   speedup: {:.2f}'.format(name, times['process'], times['thread'],
+                                                                                          times['process'] / times['thread']))
+
+
+if __name__ == "__main__":
+    main()
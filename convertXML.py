@@ -1,25 +1,67 @@
 #!/usr/bin/env python3
 
 import argparse
+import hashlib
+import json
 import os
 import xml.etree.ElementTree as ET
 from collections import defaultdict
+from concurrent import futures
+from itertools import repeat
 
 from disas import allXmlAttributes
+from instrDataFile import computeAttrKeysDict, magic, writeSharedInstrDataFile
 from microArchConfigs import MicroArchConfigs
 
+# returns the relevant attributes of each iform for the arch; if writeModule is True, the data is also written to instrData/<ARCH>.py
+def writeArchData(path, arch, instrData, perfData, attrData, writeModule):
+   attrKeys = computeAttrKeysDict(instrData, attrData)
+   if writeModule:
+      with open(os.path.join(path, arch + '.py'), 'w') as f:
+         f.write('instrData = ' + repr(instrData) + '\n')
+         f.write('perfData = ' + repr(perfData) + '\n')
+         f.write('attrData = ' + repr(attrData) + '\n')
+         f.write('attrKeys = ' + repr(attrKeys) + '\n')
+   return attrKeys
+
+
+# returns a representation of data that does not depend on the iteration order of sets
+def canonicalize(data):
+   if isinstance(data, (set, frozenset)):
+      return ('set', tuple(sorted(canonicalize(x) for x in data)))
+   if isinstance(data, dict):
+      return ('dict', tuple((canonicalize(k), canonicalize(v)) for k, v in data.items()))
+   if isinstance(data, (list, tuple)):
+      return (type(data).__name__, tuple(canonicalize(x) for x in data))
+   return data
+
+def getDigest(data):
+   return hashlib.sha256(repr(canonicalize(data)).encode()).hexdigest()
+
+
 def main():
    parser = argparse.ArgumentParser(description='Convert XML file')
    parser.add_argument('xmlfile', help="XML file")
    args = parser.parse_args()
 
-   root = ET.parse(args.xmlfile)
    instrDataForArch = defaultdict(dict)
    perfDataForArch = defaultdict(list)
    perfDataForArchIdxDict = defaultdict(dict)
    attrDataForArch = defaultdict(list)
    attrDataForArchIdxDict = defaultdict(dict)
-   for XMLInstr in root.iter('instruction'):
+   # the file is parsed incrementally; as soon as an instruction element is complete, it is removed from the tree, so that the memory usage does
+   # not depend on the size of the file
+   parents = []
+   for event, XMLInstr in ET.iterparse(args.xmlfile, events=('start', 'end')):
+      if event == 'start':
+         parents.append(XMLInstr)
+         continue
+      parents.pop()
+      if XMLInstr.tag != 'instruction':
+         continue
+      if parents:
+         parents[-1].remove(XMLInstr)
+
       iform = XMLInstr.attrib['iform']
       instrString = XMLInstr.attrib['string']
       attr = {a.upper(): XMLInstr.attrib[a] for a in allXmlAttributes if a in XMLInstr.attrib}
@@ -143,11 +185,26 @@ def main():
 
    open(os.path.join(path, '__init__.py'), 'a').close()
 
-   for arch in instrDataForArch.keys():
-      with open(os.path.join(path, arch + '.py'), 'w') as f:
-         f.write('instrData = ' + repr(instrDataForArch[arch]) + '\n')
-         f.write('perfData = ' + repr(perfDataForArch[arch]) + '\n')
-         f.write('attrData = ' + repr(attrDataForArch[arch]) + '\n')
+   # The files for an arch are only regenerated if the digest of its data differs from the one recorded in the manifest. The digest also covers
+   # the version of the binary format.
+   archs = sorted(instrDataForArch.keys())
+   digests = {arch: getDigest((magic, instrDataForArch[arch], perfDataForArch[arch], attrDataForArch[arch])) for arch in archs}
+   manifestFile = os.path.join(path, 'manifest.json')
+   prevDigests = {}
+   if os.path.isfile(manifestFile):
+      with open(manifestFile) as f:
+         prevDigests = json.load(f).get('archs', {})
+   changedArchs = [arch for arch in archs if (digests[arch] != prevDigests.get(arch)) or (not os.path.isfile(os.path.join(path, arch + '.py')))]
+
+   # all archs are stored in a single binary file, in which identical records are only stored once
+   sharedFile = os.path.join(path, 'allArchs.bin')
+   if changedArchs or (set(prevDigests) != set(archs)) or (not os.path.isfile(sharedFile)):
+      with futures.ProcessPoolExecutor() as executor:
+         attrKeysList = list(executor.map(writeArchData, repeat(path), archs, (instrDataForArch[arch] for arch in archs),
+                                           (perfDataForArch[arch] for arch in archs), (attrDataForArch[arch] for arch in archs),
+                                           ((arch in changedArchs) for arch in archs)))
+      writeSharedInstrDataFile(sharedFile, {arch: (instrDataForArch[arch], perfDataForArch[arch], attrDataForArch[arch], attrKeys)
+                                            for arch, attrKeys in zip(archs, attrKeysList)})
 
    allPorts = {}
    ALUPorts = {}
@@ -158,6 +215,11 @@ def main():
       f.write('allPorts = ' + repr(allPorts) + '\n')
       f.write('ALUPorts = ' + repr(ALUPorts) + '\n')
 
+   # the digest of the manifest identifies the version of the data of all archs
+   with open(manifestFile, 'w') as f:
+      json.dump({'digest': getDigest(sorted(digests.items())), 'archs': digests, 'rebuilt': changedArchs}, f, indent=2, sort_keys=True)
+      f.write('\n')
+
 
 if __name__ == "__main__":
     main()
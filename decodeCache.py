@@ -0,0 +1,120 @@
+import hashlib
+import marshal
+import os
+import tempfile
+import time
+import zlib
+
+from disas import InstrDisas
+
+# Persistent caches for the disassembly of input files and for simulation results. Each entry is stored in a separate file, whose name is a hash
+# of the input bytes and the parameters. Entries are written to a temporary file first and then renamed, so that concurrent processes never see incomplete entries.
+# The modification time of an entry is updated when it is used; if the total size exceeds maxSize, the least recently used entries are removed.
+
+formatVersion = 1
+marshalVersion = 4
+defaultMaxSize = 100 * 1024 * 1024
+
+def getDefaultCacheDir(name='decode'):
+   cacheHome = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+   return os.path.join(cacheHome, 'uiCA', name)
+
+# parts: bytes or str
+def getKey(*parts):
+   h = hashlib.sha256()
+   for part in parts:
+      if isinstance(part, str):
+         part = part.encode()
+      h.update(len(part).to_bytes(8, 'little'))
+      h.update(part)
+   return h.hexdigest()
+
+
+# Values can be all objects that are supported by marshal
+class FileCache:
+   def __init__(self, path, maxSize=defaultMaxSize):
+      self.path = path
+      self.maxSize = maxSize
+      self.approxSize = None # total size of the entries; entries that are added by other processes are only taken into account by evict()
+
+   def getFilename(self, key):
+      return os.path.join(self.path, key + '.bin')
+
+   # Returns the cached value, or None if there is no (valid) entry for key
+   def get(self, key):
+      filename = self.getFilename(key)
+      try:
+         with open(filename, 'rb') as f:
+            version, value = marshal.loads(zlib.decompress(f.read()))
+         os.utime(filename)
+      except (OSError, EOFError, ValueError, TypeError, zlib.error):
+         return None
+      if version != formatVersion:
+         return None
+      return value
+
+   def put(self, key, value):
+      data = zlib.compress(marshal.dumps((formatVersion, value), marshalVersion))
+      try:
+         os.makedirs(self.path, exist_ok=True)
+         fd, tmpFilename = tempfile.mkstemp(dir=self.path, suffix='.tmp')
+         try:
+            with os.fdopen(fd, 'wb') as f:
+               f.write(data)
+            os.replace(tmpFilename, self.getFilename(key))
+         except OSError:
+            os.remove(tmpFilename)
+            raise
+      except OSError:
+         return # the cache is only an optimization
+      if self.approxSize is None:
+         self.evict()
+      else:
+         self.approxSize += len(data)
+         if self.approxSize > self.maxSize:
+            self.evict()
+
+   # Removes the least recently used entries until the total size is at most maxSize
+   def evict(self):
+      entries = []
+      totalSize = 0
+      try:
+         with os.scandir(self.path) as it:
+            for entry in it:
+               try:
+                  stat = entry.stat()
+               except OSError:
+                  continue # removed by another process
+               if entry.name.endswith('.tmp') and (stat.st_mtime < time.time() - 3600):
+                  removeFile(entry.path) # left behind by a process that was killed while writing
+               if not entry.name.endswith('.bin'):
+                  continue
+               entries.append((stat.st_mtime, stat.st_size, entry.path))
+               totalSize += stat.st_size
+      except OSError:
+         return
+      for _, size, path in sorted(entries):
+         if totalSize <= self.maxSize:
+            break
+         removeFile(path)
+         totalSize -= size
+      self.approxSize = totalSize
+
+
+class DecodeCache(FileCache):
+   # Returns the cached list of InstrDisas, or None if there is no (valid) entry for key
+   def get(self, key):
+      disas = FileCache.get(self, key)
+      if disas is None:
+         return None
+      return [InstrDisas(*d) for d in disas]
+
+   def put(self, key, disas):
+      FileCache.put(self, key, [tuple(d) for d in disas])
+
+
+def removeFile(path):
+   try:
+      os.remove(path)
+   except OSError:
+      pass # removed by another process, or still in use (Windows)
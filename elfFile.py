@@ -0,0 +1,72 @@
+import struct
+
+# Minimal reader for 64-bit little-endian ELF files (relocatable files, executables, and shared libraries). The data can be a bytes object or an
+# mmap object.
+
+SHT_PROGBITS = 1
+SHT_SYMTAB = 2
+SHF_EXECINSTR = 0x4
+STT_FUNC = 2
+
+def isELF64(data):
+   return data[:6] == b'\x7fELF\x02\x01'
+
+# Returns a list of (name, type, flags, address, offset, size, link, entsize) for all sections, or None if the data is not an ELF64 file
+def getELFSectionHeaders(data):
+   if not isELF64(data):
+      return None
+   shoff, = struct.unpack_from('<Q', data, 0x28)
+   shentsize, shnum, shstrndx = struct.unpack_from('<HHH', data, 0x3A)
+   if shoff == 0 or shstrndx >= shnum:
+      return None
+
+   rawHeaders = [struct.unpack_from('<IIQQQQIIQQ', data, shoff + i*shentsize) for i in range(shnum)]
+   strTabOffset = rawHeaders[shstrndx][4]
+   return [(getString(data, strTabOffset + nameOffset), shType, flags, address, offset, size, link, entsize)
+           for nameOffset, shType, flags, address, offset, size, link, _, _, entsize in rawHeaders]
+
+def getString(data, offset):
+   return data[offset:data.find(b'\0', offset)].decode(errors='replace')
+
+# Returns a list of (name, address, file offset, size) for the executable sections
+def getExecutableELFSectionHeaders(data):
+   sectionHeaders = getELFSectionHeaders(data)
+   if sectionHeaders is None:
+      return None
+   return [(name, address, offset, size) for name, shType, flags, address, offset, size, _, _ in sectionHeaders
+           if (shType == SHT_PROGBITS) and (flags & SHF_EXECINSTR)]
+
+# Returns a list of (name, address, code) for the executable sections
+def getExecutableELFSections(data):
+   sectionHeaders = getExecutableELFSectionHeaders(data)
+   if sectionHeaders is None:
+      return None
+   return [(name, address, data[offset:offset+size]) for name, address, offset, size in sectionHeaders]
+
+# Returns a list of (name, address, code) for the functions in the symbol table that are in executable sections. If there is no symbol table
+# (e.g., for stripped binaries), each executable section is treated as one function.
+def getELFFunctions(data):
+   sectionHeaders = getELFSectionHeaders(data)
+   if sectionHeaders is None:
+      return None
+
+   functions = []
+   for _, shType, _, _, symOffset, symSize, link, entsize in sectionHeaders:
+      if shType != SHT_SYMTAB or entsize == 0:
+         continue
+      strTabOffset = sectionHeaders[link][4]
+      for i in range(symSize // entsize):
+         nameOffset, info, _, shndx, value, size = struct.unpack_from('<IBBHQQ', data, symOffset + i*entsize)
+         if (info & 0xf) != STT_FUNC or size == 0 or shndx >= len(sectionHeaders):
+            continue
+         _, secType, secFlags, secAddress, secOffset, secSize, _, _ = sectionHeaders[shndx]
+         if secType != SHT_PROGBITS or not (secFlags & SHF_EXECINSTR):
+            continue
+         start = value - secAddress # in relocatable files, secAddress is 0, and value is the offset in the section
+         if not (0 <= start <= start + size <= secSize):
+            continue
+         functions.append((getString(data, strTabOffset + nameOffset), value, data[secOffset+start:secOffset+start+size]))
+
+   if not functions:
+      functions = getExecutableELFSections(data)
+   return functions
@@ -0,0 +1,151 @@
+import marshal
+import mmap
+import struct
+from collections import namedtuple
+
+# Binary format for the instruction data of all microarchitectures (instrData/allArchs.bin); it contains the same data as the instrData/<ARCH>.py
+# files.
+#
+# The file starts with a header (see headerFormat), which contains the location of a directory. The directory maps the name of each table to the
+# location of its entries. Each entry is stored as a marshal blob; identical blobs are only stored once. Tables that are dicts (with the iform as
+# key) are located via an index (key -> (start, end)) that is part of the directory. For tables that are lists, the file contains an array with the
+# start and end offsets of the entries (64-bit, little endian).
+#
+# The perfData and attrData tables are shared by all microarchitectures; for each microarchitecture, there are separate <ARCH>.instrData and
+# <ARCH>.attrKeys tables, which refer to entries of the shared tables.
+#
+# The file is memory-mapped, and the entries are only decoded when they are accessed for the first time.
+
+magic = b'uiCAID\x00\x04'
+headerFormat = '<8sQQ' # magic, offset and length of the directory
+marshalVersion = 4 # supported by all Python 3 versions >= 3.4
+
+
+# Returns the attributes that occur in the attrData entries of the instrData entries of an iform; whether an instruction with this iform matches
+# one of these entries only depends on the values of these attributes.
+def computeAttrKeys(instrDataList, attrData):
+   return tuple(sorted({k for instrData in instrDataList for k in attrData[instrData['attr']]}))
+
+def computeAttrKeysDict(instrData, attrData):
+   return {iform: computeAttrKeys(instrDataList, attrData) for iform, instrDataList in instrData.items()}
+
+
+def writeInstrDataFile(filename, tables):
+   blobs = bytearray()
+   headerSize = struct.calcsize(headerFormat)
+
+   def addBlob(blob):
+      offset = headerSize + len(blobs)
+      blobs.extend(blob)
+      return offset
+
+   blobOffsets = {}
+   def addEntry(entry):
+      blob = marshal.dumps(entry, marshalVersion)
+      start = blobOffsets.get(blob)
+      if start is None:
+         start = addBlob(blob)
+         blobOffsets[blob] = start
+      return (start, start + len(blob))
+
+   directory = {}
+   for name, table in tables.items():
+      if isinstance(table, dict):
+         directory[name] = ('dict', {key: addEntry(entry) for key, entry in table.items()})
+      else:
+         locations = [addEntry(entry) for entry in table]
+         directory[name] = ('list', addBlob(struct.pack('<{}Q'.format(2*len(locations)), *(x for l in locations for x in l))), len(table))
+
+   directoryBlob = marshal.dumps(directory, marshalVersion)
+   directoryOffset = addBlob(directoryBlob)
+
+   with open(filename, 'wb') as f:
+      f.write(struct.pack(headerFormat, magic, directoryOffset, len(directoryBlob)))
+      f.write(blobs)
+
+
+class LazyEntries:
+   def __init__(self, data, locate):
+      self.data = data
+      self.locate = locate # key -> (start, end), or None if there is no entry for the key
+      self.entries = {}
+
+   def __getitem__(self, key):
+      entry = self.entries.get(key)
+      if entry is None:
+         location = self.locate(key)
+         if location is None:
+            raise KeyError(key)
+         start, end = location
+         entry = marshal.loads(self.data[start:end])
+         self.entries[key] = entry
+      return entry
+
+   def __contains__(self, key):
+      return (key in self.entries) or (self.locate(key) is not None)
+
+   def get(self, key, default=None):
+      try:
+         return self[key]
+      except KeyError:
+         return default
+
+
+# dataForArch: arch -> (instrData, perfData, attrData, attrKeys), where instrData refers to the positions in perfData and attrData
+def writeSharedInstrDataFile(filename, dataForArch):
+   sharedPerfData = []
+   sharedAttrData = []
+   sharedIdx = {} # (table, marshalled entry) -> position in shared table
+   def getSharedIdx(sharedList, name, entry):
+      key = (name, marshal.dumps(entry, marshalVersion))
+      if key not in sharedIdx:
+         sharedIdx[key] = len(sharedList)
+         sharedList.append(entry)
+      return sharedIdx[key]
+
+   tables = {}
+   for arch, (instrData, perfData, attrData, attrKeys) in sorted(dataForArch.items()):
+      perfDataIdx = [getSharedIdx(sharedPerfData, 'perfData', pd) for pd in perfData]
+      attrDataIdx = [getSharedIdx(sharedAttrData, 'attrData', ad) for ad in attrData]
+      sharedInstrData = {}
+      for iform, instrDataList in instrData.items():
+         sharedInstrData[iform] = [dict(entry, perfData=perfDataIdx[entry['perfData']], attr=attrDataIdx[entry['attr']]) for entry in instrDataList]
+      tables[arch + '.instrData'] = sharedInstrData
+      tables[arch + '.attrKeys'] = attrKeys
+   tables['perfData'] = sharedPerfData
+   tables['attrData'] = sharedAttrData
+   writeInstrDataFile(filename, tables)
+
+
+ArchData = namedtuple('ArchData', ['instrData', 'perfData', 'attrData', 'attrKeys'])
+
+class InstrDataFile:
+   def __init__(self, filename):
+      with open(filename, 'rb') as f:
+         self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+      if self.data[:len(magic)] != magic:
+         raise ValueError('{} is not a valid instruction data file; it needs to be regenerated with convertXML.py'.format(filename))
+      _, directoryOffset, directoryLength = struct.unpack_from(headerFormat, self.data)
+
+      directory = marshal.loads(self.data[directoryOffset:(directoryOffset+directoryLength)])
+      self.tables = {}
+      for name, location in directory.items():
+         if location[0] == 'dict':
+            self.tables[name] = LazyEntries(self.data, location[1].get)
+         else:
+            self.tables[name] = LazyEntries(self.data, self.getEntryLocator(location[1], location[2]))
+
+   def getArchs(self):
+      return [name[:-len('.instrData')] for name in self.tables if name.endswith('.instrData')]
+
+   # returns the instruction data for arch, with the same attributes as the instrData/<ARCH>.py modules
+   def getArchData(self, arch):
+      return ArchData(self.tables[arch + '.instrData'], self.tables['perfData'], self.tables['attrData'], self.tables[arch + '.attrKeys'])
+
+   def getEntryLocator(self, offsetsOffset, nEntries):
+      def locate(idx):
+         if not (0 <= idx < nEntries):
+            return None
+         return struct.unpack_from('<QQ', self.data, offsetsOffset + 16*idx)
+      return locate
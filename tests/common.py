@@ -0,0 +1,194 @@
+import importlib.util
+import os
+import struct
+import sys
+import unittest
+
+# The tests use the instruction data and the disassembler (disas.py) that are generated by setup.sh; tests that need them are skipped if they are
+# not available.
+
+repoDir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if repoDir not in sys.path:
+   sys.path.insert(0, repoDir)
+
+hasSimulator = all(importlib.util.find_spec(m) is not None for m in ['disas', 'instrData'])
+requiresSimulator = unittest.skipUnless(hasSimulator, 'disas.py and the instruction data are not available (run setup.sh)')
+
+
+def I(asm, opcode, iform, regOperands=None, memOperands=None, rw=None, attributes=None):
+   from disas import InstrDisas
+   return InstrDisas(asm, opcode, iform, dict(regOperands or {}), dict(memOperands or {}), dict(rw or {}), dict(attributes or {'EOSZ': '3'}))
+
+GPRs = ['RAX', 'RCX', 'RDX', 'RBX', 'RSP', 'RBP', 'RSI', 'RDI', 'R8', 'R9', 'R10', 'R11', 'R12', 'R13', 'R14', 'R15']
+
+# returns the REX prefix and the ModRM byte for instructions with a 64-bit register in the reg field and a 64-bit register in the r/m field
+def getREXAndModRM(reg, rm):
+   regNr = GPRs.index(reg) if reg in GPRs else reg
+   rmNr = GPRs.index(rm)
+   return '{:02x}'.format(0x48 | ((regNr >> 3) << 2) | (rmNr >> 3)), '{:02x}'.format(0xc0 | ((regNr & 7) << 3) | (rmNr & 7))
+
+def add(a, b):
+   rex, modRM = getREXAndModRM(b, a)
+   return I('add {}, {}'.format(a.lower(), b.lower()), rex + '01' + modRM, 'ADD_GPRv_GPRv_01', {'REG0': a, 'REG1': b, 'REG2': 'RFLAGS'}, None,
+            {'REG0': 'RW', 'REG1': 'R', 'REG2': 'W'})
+
+def dec(a):
+   rex, modRM = getREXAndModRM(1, a)
+   return I('dec ' + a.lower(), rex + 'ff' + modRM, 'DEC_GPRv_FFr1', {'REG0': a, 'REG1': 'RFLAGS'}, None, {'REG0': 'RW', 'REG1': 'W'})
+
+# the target is relative to the start of the block
+def jnz(rel8, target=0):
+   return I('jnz 0x{:x}'.format(target), '75{:02x}'.format(rel8 & 0xff), 'JNZ_RELBRb', {'REG0': 'RIP', 'REG1': 'RFLAGS'}, None,
+            {'REG0': 'RW', 'REG1': 'R'})
+
+def div(a):
+   rex, modRM = getREXAndModRM(6, a)
+   return I('div ' + a.lower(), rex + 'f7' + modRM, 'DIV_GPRv', {'REG0': a, 'REG1': 'RAX', 'REG2': 'RDX', 'REG3': 'RFLAGS'}, None,
+            {'REG0': 'R', 'REG1': 'RW', 'REG2': 'RW', 'REG3': 'W'})
+
+def imul(a, b):
+   rex, modRM = getREXAndModRM(a, b)
+   return I('imul {}, {}'.format(a.lower(), b.lower()), rex + '0faf' + modRM, 'IMUL_GPRv_GPRv', {'REG0': a, 'REG1': b, 'REG2': 'RFLAGS'}, None,
+            {'REG0': 'RW', 'REG1': 'R', 'REG2': 'W'})
+
+# mov a, qword ptr [base]; base must not be RSP, RBP, R12, or R13
+def load(a, base):
+   rex, modRM = getREXAndModRM(a, base)
+   return I('mov {}, qword ptr [{}]'.format(a.lower(), base.lower()), rex + '8b{:02x}'.format(int(modRM, 16) & 0x3f), 'MOV_GPRv_MEMv', {'REG0': a},
+            {'MEM0': 'qword ptr [{}]'.format(base)}, {'REG0': 'W', 'MEM0': 'R'})
+
+# mov qword ptr [base], a; base must not be RSP, RBP, R12, or R13
+def store(base, a):
+   rex, modRM = getREXAndModRM(a, base)
+   return I('mov qword ptr [{}], {}'.format(base.lower(), a.lower()), rex + '89{:02x}'.format(int(modRM, 16) & 0x3f), 'MOV_MEMv_GPRv', {'REG0': a},
+            {'MEM0': 'qword ptr [{}]'.format(base)}, {'REG0': 'R', 'MEM0': 'W'})
+
+def lfence():
+   return I('lfence', '0faee8', 'LFENCE')
+
+def mfence():
+   return I('mfence', '0faef0', 'MFENCE')
+
+# a and b must be XMM0 to XMM7
+def sqrtsd(a, b):
+   return I('sqrtsd {}, {}'.format(a.lower(), b.lower()), 'f20f51{:02x}'.format(0xc0 | (int(a[3:]) << 3) | int(b[3:])), 'SQRTSD_XMMsd_XMMsd',
+            {'REG0': a, 'REG1': b}, None, {'REG0': 'RW', 'REG1': 'R'})
+
+def vaddps(a, b, c):
+   return I('vaddps {}, {}, {}'.format(a.lower(), b.lower(), c.lower()), 'c5fc58c1', 'VADDPS_YMMqq_YMMqq_YMMqq', {'REG0': a, 'REG1': b, 'REG2': c}, None,
+            {'REG0': 'W', 'REG1': 'R', 'REG2': 'R'})
+
+def vaddpsZMM(a, b, c):
+   return I('vaddps {}, {}, {}'.format(a.lower(), b.lower(), c.lower()), '62f1744858c2', 'VADDPS_ZMMf32_MASKmskw_ZMMf32_ZMMf32_AVX512',
+            {'REG0': a, 'REG1': 'K0', 'REG2': b, 'REG3': c}, None, {'REG0': 'W', 'REG1': 'R', 'REG2': 'R', 'REG3': 'R'})
+
+# adds a branch to the start of the block
+def getLoop(disas):
+   return disas + [jnz(-(getCodeLength(disas) + 2))]
+
+def getCode(disas):
+   return bytes.fromhex(''.join(instrD.opcode for instrD in disas))
+
+def getCodeLength(disas):
+   return sum(len(instrD.opcode) // 2 for instrD in disas)
+
+# add rax, rbx; add rbx, rax; dec r15; jnz (the example from the README)
+def getReadmeLoop():
+   return getLoop([add('RAX', 'RBX'), add('RBX', 'RAX'), dec('R15')])
+
+def getLFenceLoop():
+   return getLoop([lfence(), add('RAX', 'RBX'), dec('R15')])
+
+def getDivLoop():
+   return getLoop([div('RCX'), dec('R15')])
+
+def getVectorLoop():
+   return getLoop([vaddps('YMM0', 'YMM1', 'YMM2'), vaddps('YMM3', 'YMM1', 'YMM2'), vaddps('YMM4', 'YMM1', 'YMM2'), dec('R15')])
+
+def getZMMLoop():
+   return getLoop([vaddpsZMM('ZMM5', 'ZMM6', 'ZMM7')] + getVectorLoop()[:-1])
+
+
+# Replaces the decoder (the XED library, or the xed binary) for raw code by a decoder that only knows the given instructions and jnz with an 8-bit
+# displacement, so that the tests do not depend on XED. The output contains one line with the offset and the bytes of each instruction, followed by
+# an error message in the format of XED if the code could not be decoded completely.
+class FakeDecoder:
+   def __init__(self, instructions):
+      self.instrForOpcode = {instrD.opcode: instrD for instrD in instructions if instrD.iform != 'JNZ_RELBRb'}
+      self.calls = [] # (length of the code, chip names)
+      self.nDecodedBytes = 0 # like XED, the decoder stops at the first instruction that cannot be decoded
+      self.patches = []
+
+   def __enter__(self):
+      from unittest import mock
+      import uiCA
+      self.patches = [mock.patch.object(uiCA, 'decodeRawBuffer', self.decodeRawBuffer), mock.patch.object(uiCA, 'parseXedOutput', self.parseOutput),
+                      mock.patch.object(uiCA, 'getXedLib', lambda: self)]
+      for patch in self.patches:
+         patch.start()
+      return self
+
+   def __exit__(self, *exc):
+      for patch in reversed(self.patches):
+         patch.stop()
+
+   def decodeRawBuffer(self, code, chipName):
+      return self.getXedOutputForChips(code, True, [chipName])[chipName]
+
+   def getXedOutputForChips(self, code, rawFile, chipNames):
+      self.calls.append((len(code), list(chipNames)))
+      lines = []
+      offset = 0
+      while offset < len(code):
+         if (code[offset] == 0x75) and (offset + 2 <= len(code)):
+            length = 2
+         else:
+            length = next((len(opcode) // 2 for opcode in self.instrForOpcode if code.startswith(bytes.fromhex(opcode), offset)), None)
+         if length is None:
+            lines.append('ERROR: GENERAL_ERROR Could not decode at offset: 0x{:x}'.format(offset))
+            break
+         lines.append('{:x} {}'.format(offset, code[offset:offset+length].hex()))
+         offset += length
+      self.nDecodedBytes += offset
+      output = '\n'.join(lines)
+      return {chipName: output for chipName in chipNames}
+
+   def parseOutput(self, output, iacaMarkers=False):
+      disas = []
+      for line in output.splitlines():
+         offset, opcode = line.split()
+         if opcode.startswith('75'):
+            rel8 = int(opcode[2:], 16) - (256 if int(opcode[2:], 16) >= 128 else 0)
+            disas.append(jnz(rel8, int(offset, 16) + 2 + rel8))
+         else:
+            disas.append(self.instrForOpcode[opcode])
+      return disas
+
+
+# Writes a minimal 64-bit ELF file with a .text section at textAddress that contains the functions (list of (name, code)), and a symbol table with
+# one entry per function
+def writeELF(filename, functions, textAddress=0x401000):
+   text = b''.join(code for _, code in functions)
+   strTab = bytearray(b'\0')
+   symTab = bytearray(24) # the first entry is reserved
+   offset = 0
+   for name, code in functions:
+      symTab += struct.pack('<IBBHQQ', len(strTab), 0x12, 0, 1, textAddress + offset, len(code)) # STB_GLOBAL, STT_FUNC, section 1
+      strTab += name.encode() + b'\0'
+      offset += len(code)
+   shStrTab = b'\0.text\0.symtab\0.strtab\0.shstrtab\0'
+
+   data = bytearray(64)
+   sections = [(0, 0, 0, 0, 0, 0, 0, 0)] # (name, type, flags, address, offset, size, link, entsize)
+   for name, shType, flags, address, content, link, entsize in [(1, 1, 0x6, textAddress, text, 0, 0), (7, 2, 0, 0, symTab, 3, 24),
+                                                                (15, 3, 0, 0, strTab, 0, 0), (23, 3, 0, 0, shStrTab, 0, 0)]:
+      sections.append((name, shType, flags, address, len(data), len(content), link, entsize))
+      data += content
+   shOffset = len(data)
+   for name, shType, flags, address, offset, size, link, entsize in sections:
+      info = 1 if (shType == 2) else 0 # for the symbol table: index of the first global symbol
+      data += struct.pack('<IIQQQQIIQQ', name, shType, flags, address, offset, size, link, info, 1, entsize)
+   data[0:64] = struct.pack('<4sBBBBB7sHHIQQQIHHHHHH', b'\x7fELF', 2, 1, 1, 0, 0, bytes(7), 2, 0x3e, 1, textAddress, 0, shOffset, 0, 64, 0, 0, 64,
+                            len(sections), len(sections) - 1)
+   with open(filename, 'wb') as f:
+      f.write(data)
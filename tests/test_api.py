@@ -0,0 +1,56 @@
+import json
+import os
+import tempfile
+import unittest
+
+from common import FakeDecoder, getCode, getDivLoop, getReadmeLoop, requiresSimulator
+
+
+@requiresSimulator
+class AnalyzeTest(unittest.TestCase):
+   def analyze(self, code, arch='SKL', options=None):
+      import uiCA
+      with FakeDecoder(getReadmeLoop() + getDivLoop()):
+         return uiCA.analyze(code, arch, options)
+
+   def testAnalyze(self):
+      import uiCA
+      from microArchConfigs import MicroArchConfigs
+      result = self.analyze(getCode(getReadmeLoop()))
+      self.assertEqual(result.throughput, uiCA.getThroughput(getReadmeLoop(), MicroArchConfigs['SKL'], 0, 'diff', False, False, False))
+      self.assertEqual([line['instruction'] for line in result.table], [instrD.asm for instrD in getReadmeLoop()])
+      for line in result.table:
+         self.assertIn('url', line)
+         self.assertIn('Notes', line)
+      self.assertTrue(result.bottlenecks)
+      self.assertTrue(all(isinstance(b, str) for b in result.bottlenecks))
+      self.assertIsNone(result.simulation)
+
+      self.assertEqual(self.analyze(getCode(getReadmeLoop()), MicroArchConfigs['SKL']), result)
+      self.assertEqual(self.analyze(getCode(getReadmeLoop()), options=uiCA.AnalysisOptions(details=False)),
+                       uiCA.AnalysisResult(result.throughput, [], [], None))
+
+   def testKeepSimulation(self):
+      import uiCA
+      result = self.analyze(getCode(getDivLoop()), options=uiCA.AnalysisOptions(alignmentOffset=5, keepSimulation=True))
+      self.assertEqual(result.simulation.TP, result.throughput)
+      with tempfile.TemporaryDirectory() as tmpDir:
+         filename = os.path.join(tmpDir, 'result.json')
+         result.simulation.writeJSON(filename)
+         with open(filename) as f:
+            self.assertIn('cycles', json.load(f))
+
+   def testErrors(self):
+      import uiCA
+      with self.assertRaises(ValueError):
+         self.analyze(getCode(getReadmeLoop()), 'NO_SUCH_ARCH')
+      with self.assertRaises(ValueError):
+         self.analyze(getCode(getReadmeLoop()), options=uiCA.AnalysisOptions(initPolicy='random'))
+      with self.assertRaises(uiCA.AnalysisError):
+         self.analyze(b'\xff\xff')
+      with self.assertRaises(uiCA.AnalysisError):
+         self.analyze(b'')
+
+
+if __name__ == '__main__':
+   unittest.main()
@@ -0,0 +1,90 @@
+import asyncio
+import time
+import unittest
+from unittest import mock
+
+from common import FakeDecoder, getCode, getDivLoop, getReadmeLoop, requiresSimulator
+
+slowAlignmentOffset = 63
+
+
+@requiresSimulator
+class AsyncAnalyzerTest(unittest.TestCase):
+   def setUp(self):
+      import asyncAnalyzer
+      # analyses with slowAlignmentOffset only stop when they are cancelled
+      analyzeDisas = asyncAnalyzer.analyzeDisas
+      def analyzeDisasOrWait(disas, uArchConfig, options, isCancelled=None):
+         if options.alignmentOffset == slowAlignmentOffset:
+            while not isCancelled():
+               time.sleep(0.001)
+            raise asyncAnalyzer.SimulationCancelledError()
+         return analyzeDisas(disas, uArchConfig, options, isCancelled)
+      patch = mock.patch.object(asyncAnalyzer, 'analyzeDisas', analyzeDisasOrWait)
+      patch.start()
+      self.addCleanup(patch.stop)
+
+   def getAnalyzer(self, maxConcurrency=1):
+      from asyncAnalyzer import AsyncAnalyzer
+      return AsyncAnalyzer(maxConcurrency, maxWorkers=1, executorType='thread')
+
+   def getSlowOptions(self):
+      from uiCA import AnalysisOptions
+      return AnalysisOptions(alignmentOffset=slowAlignmentOffset)
+
+   def testSameResultsAsAnalyze(self):
+      import uiCA
+      async def run():
+         async with self.getAnalyzer(2) as analyzer:
+            return await asyncio.gather(analyzer.analyze(getCode(getReadmeLoop()), 'SKL'), analyzer.analyzeDisas(getDivLoop(), 'HSW'))
+      with FakeDecoder(getReadmeLoop()):
+         results = asyncio.run(run())
+         self.assertEqual(results, [uiCA.analyze(getCode(getReadmeLoop()), 'SKL'), uiCA.analyzeDisas(getDivLoop(), uiCA.MicroArchConfigs['HSW'],
+                                                                                                     uiCA.AnalysisOptions())])
+
+   # after a timeout, the analysis is stopped, and the next request can use the worker
+   def testTimeout(self):
+      async def run():
+         async with self.getAnalyzer() as analyzer:
+            with self.assertRaises(asyncio.TimeoutError):
+               await analyzer.analyzeDisas(getReadmeLoop(), 'SKL', self.getSlowOptions(), timeout=0.05)
+            return await analyzer.analyzeDisas(getReadmeLoop(), 'SKL', timeout=60)
+      self.assertEqual(asyncio.run(run()).throughput, 2.0)
+
+   def testCancel(self):
+      async def run():
+         async with self.getAnalyzer() as analyzer:
+            task = asyncio.ensure_future(analyzer.analyzeDisas(getReadmeLoop(), 'SKL', self.getSlowOptions()))
+            await asyncio.sleep(0.05)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+               await task
+            return await analyzer.analyzeDisas(getReadmeLoop(), 'SKL', timeout=60)
+      self.assertEqual(asyncio.run(run()).throughput, 2.0)
+
+   def testClose(self):
+      import uiCA
+      async def run():
+         analyzer = self.getAnalyzer()
+         task = asyncio.ensure_future(analyzer.analyzeDisas(getReadmeLoop(), 'SKL', self.getSlowOptions()))
+         await asyncio.sleep(0.05)
+         await analyzer.close()
+         with self.assertRaises(uiCA.SimulationCancelledError):
+            await task
+         with self.assertRaises(RuntimeError):
+            await analyzer.analyzeDisas(getReadmeLoop(), 'SKL')
+      asyncio.run(run())
+
+   def testInvalidParameters(self):
+      import uiCA
+      async def run():
+         async with self.getAnalyzer() as analyzer:
+            with self.assertRaises(ValueError):
+               await analyzer.analyzeDisas(getReadmeLoop(), 'NO_SUCH_ARCH')
+            with self.assertRaises(ValueError):
+               await analyzer.analyzeDisas(getReadmeLoop(), 'SKL', uiCA.AnalysisOptions(keepSimulation=True))
+      asyncio.run(run())
+
+
+if __name__ == '__main__':
+   unittest.main()
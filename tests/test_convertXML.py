@@ -0,0 +1,89 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from common import repoDir, requiresSimulator
+
+instrXML = '''<instruction iform="{iform}" string="{string}" category="{category}" eosz="{eosz}">
+ <operand idx="1" name="REG0" type="reg"/><operand idx="2" type="flags" flag_CF="w" flag_ZF="w"/>
+ {archs}
+</instruction>
+'''
+archXML = '<architecture name="{arch}"><measurement uops="{uops}" ports="{ports}"><latency start_op="1" target_op="1" cycles="1"/></measurement></architecture>'
+
+def getXML(uopsForArch):
+   instrs = []
+   for iform, string, category, eosz in [('AND_GPRv_IMMb', 'AND (R64, I8)', 'LOGICAL', '3'), ('AND_GPRv_IMMb', 'AND (R32, I8)', 'LOGICAL', '2'),
+                                         ('ADD_GPRv_GPRv_01', 'ADD_01 (R64, R64)', 'BINARY', '3')]:
+      archs = ''.join(archXML.format(arch=arch, uops=uops, ports='{}*p0156'.format(uops)) for arch, uops in sorted(uopsForArch.items()))
+      instrs.append(instrXML.format(iform=iform, string=string, category=category, eosz=eosz, archs=archs))
+   return '<root><extension name="BASE">\n' + ''.join(instrs) + '</extension></root>\n'
+
+
+@requiresSimulator
+class ConvertXMLTest(unittest.TestCase):
+   def setUp(self):
+      self.tmpDir = tempfile.TemporaryDirectory()
+      self.path = os.path.join(self.tmpDir.name, 'instrData')
+
+   def tearDown(self):
+      self.tmpDir.cleanup()
+
+   def convert(self, uopsForArch):
+      xmlFile = os.path.join(self.tmpDir.name, 'instructions.xml')
+      with open(xmlFile, 'w') as f:
+         f.write(getXML(uopsForArch))
+      subprocess.check_call([sys.executable, os.path.join(repoDir, 'convertXML.py'), xmlFile], cwd=self.tmpDir.name)
+
+   def loadModule(self, arch):
+      module = {}
+      with open(os.path.join(self.path, arch + '.py')) as f:
+         exec(f.read(), module)
+      return module
+
+   def testConvert(self):
+      from instrDataFile import InstrDataFile
+      self.convert({'SKL': 1, 'HSW': 2})
+      instrDataFile = InstrDataFile(os.path.join(self.path, 'allArchs.bin'))
+      self.assertEqual(sorted(instrDataFile.getArchs()), ['HSW', 'SKL'])
+      for arch in ['HSW', 'SKL']:
+         module = self.loadModule(arch)
+         archData = instrDataFile.getArchData(arch)
+         self.assertEqual(sorted(module['instrData']), ['ADD_GPRv_GPRv_01', 'AND_GPRv_IMMb'])
+         for iform, instrDataList in module['instrData'].items():
+            self.assertEqual(len(archData.instrData[iform]), len(instrDataList))
+            for entry, binEntry in zip(instrDataList, archData.instrData[iform]):
+               self.assertEqual(dict(entry, perfData=None, attr=None), dict(binEntry, perfData=None, attr=None))
+               self.assertEqual(module['perfData'][entry['perfData']], archData.perfData[binEntry['perfData']])
+               self.assertEqual(module['attrData'][entry['attr']], archData.attrData[binEntry['attr']])
+            self.assertEqual(module['attrKeys'][iform], archData.attrKeys[iform])
+      self.assertEqual(self.loadModule('SKL')['perfData'][0], {'uops': 1, 'ports': {'0156': 1}, 'lat': {('REG0', 'REG0'): 1}})
+
+
+   # only the files of archs whose data changed are regenerated
+   def testIncrementalConversion(self):
+      self.convert({'SKL': 1, 'HSW': 1})
+      with open(os.path.join(self.path, 'manifest.json')) as f:
+         manifest = json.load(f)
+      self.assertEqual(sorted(manifest['rebuilt']), ['HSW', 'SKL'])
+      mtimeSKL = os.stat(os.path.join(self.path, 'SKL.py')).st_mtime_ns
+
+      self.convert({'SKL': 1, 'HSW': 1})
+      with open(os.path.join(self.path, 'manifest.json')) as f:
+         self.assertEqual(json.load(f), dict(manifest, rebuilt=[]))
+
+      self.convert({'SKL': 1, 'HSW': 2})
+      with open(os.path.join(self.path, 'manifest.json')) as f:
+         newManifest = json.load(f)
+      self.assertEqual(newManifest['rebuilt'], ['HSW'])
+      self.assertEqual(newManifest['archs']['SKL'], manifest['archs']['SKL'])
+      self.assertNotEqual(newManifest['digest'], manifest['digest'])
+      self.assertEqual(os.stat(os.path.join(self.path, 'SKL.py')).st_mtime_ns, mtimeSKL)
+      self.assertEqual(self.loadModule('HSW')['perfData'][0]['uops'], 2)
+
+
+if __name__ == '__main__':
+   unittest.main()
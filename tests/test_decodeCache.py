@@ -0,0 +1,63 @@
+import os
+import tempfile
+import unittest
+
+from common import FakeDecoder, getCode, getReadmeLoop, requiresSimulator
+
+
+@requiresSimulator
+class DecodeCacheTest(unittest.TestCase):
+   def setUp(self):
+      self.tmpDir = tempfile.TemporaryDirectory()
+      self.path = os.path.join(self.tmpDir.name, 'cache')
+
+   def tearDown(self):
+      self.tmpDir.cleanup()
+
+   def testRoundTrip(self):
+      from decodeCache import DecodeCache, getKey
+      cache = DecodeCache(self.path)
+      key = getKey(b'code', 'SKYLAKE')
+      self.assertNotEqual(key, getKey(b'cod', 'eSKYLAKE'))
+      self.assertIsNone(cache.get(key))
+      cache.put(key, getReadmeLoop())
+      self.assertEqual(DecodeCache(self.path).get(key), getReadmeLoop())
+
+      with open(cache.getFilename(key), 'wb') as f:
+         f.write(b'invalid')
+      self.assertIsNone(cache.get(key))
+
+   # the least recently used entries are removed
+   def testEviction(self):
+      from decodeCache import FileCache
+      cache = FileCache(self.path)
+      for i, key in enumerate(['a', 'b', 'c']):
+         cache.put(key, str(i) * 1000)
+         os.utime(cache.getFilename(key), (1000 + i, 1000 + i))
+      cache.get('a')
+      cache.maxSize = sum(os.path.getsize(cache.getFilename(key)) for key in ['a', 'c'])
+      cache.evict()
+      self.assertEqual([cache.get(key) for key in ['a', 'b', 'c']], ['0' * 1000, None, '2' * 1000])
+
+   def testDecodingWithCache(self):
+      import uiCA
+      from decodeCache import DecodeCache
+      from microArchConfigs import MicroArchConfigs
+      filename = os.path.join(self.tmpDir.name, 'code.bin')
+      with open(filename, 'wb') as f:
+         f.write(getCode(getReadmeLoop()))
+      cache = DecodeCache(self.path)
+      for _ in range(2):
+         with FakeDecoder(getReadmeLoop()) as decoder:
+            self.assertEqual(uiCA.getXedDisas(filename, True, MicroArchConfigs['SKL'], False, cache), getReadmeLoop())
+      self.assertEqual(decoder.calls, []) # the second time, the disassembly is taken from the cache
+
+      with open(filename, 'ab') as f:
+         f.write(getCode(getReadmeLoop()))
+      with FakeDecoder(getReadmeLoop()) as decoder:
+         self.assertEqual(len(uiCA.getXedDisas(filename, True, MicroArchConfigs['SKL'], False, cache)), 8)
+      self.assertEqual(len(decoder.calls), 1)
+
+
+if __name__ == '__main__':
+   unittest.main()
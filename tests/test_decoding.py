@@ -0,0 +1,118 @@
+import os
+import tempfile
+import unittest
+
+from common import FakeDecoder, getCode, getDivLoop, getReadmeLoop, repoDir, requiresSimulator, writeELF
+
+
+@requiresSimulator
+class XedLibTest(unittest.TestCase):
+   def setUp(self):
+      from xedLib import getXedLib
+      self.xedLib = getXedLib()
+      if self.xedLib is None:
+         self.skipTest('the XED library is not available')
+
+   def testSameOutputAsXedBinary(self):
+      import uiCA
+      if not os.path.isfile(os.path.join(repoDir, 'xed')):
+         self.skipTest('the xed binary is not available')
+      for code in [getCode(getReadmeLoop()), getCode(getReadmeLoop()) + b'\xff\xff']:
+         for chipName in ['SKYLAKE', 'HASWELL']:
+            self.assertEqual(uiCA.parseXedOutput(self.xedLib.getXedOutput(code, True, chipName)),
+                             uiCA.parseXedOutput(uiCA.runXedOnCode(code, chipName)))
+
+   def testDecodingError(self):
+      output = self.xedLib.getXedOutput(getCode(getReadmeLoop()) + b'\xff\xff', True, 'SKYLAKE')
+      self.assertIn('Could not decode at offset: 0xb', output)
+
+   def testSeveralChips(self):
+      code = getCode(getReadmeLoop())
+      outputs = self.xedLib.getXedOutputForChips(code, True, ['SKYLAKE', 'HASWELL', 'ICE_LAKE'])
+      self.assertEqual(outputs, {chipName: self.xedLib.getXedOutput(code, True, chipName) for chipName in ['SKYLAKE', 'HASWELL', 'ICE_LAKE']})
+      self.assertIsNone(self.xedLib.getXedOutputForChips(code, True, ['SKYLAKE', 'NO_SUCH_CHIP']))
+
+
+@requiresSimulator
+class DecodingTest(unittest.TestCase):
+   def setUp(self):
+      self.tmpDir = tempfile.TemporaryDirectory()
+
+   def tearDown(self):
+      self.tmpDir.cleanup()
+
+   def writeFile(self, name, data):
+      filename = os.path.join(self.tmpDir.name, name)
+      with open(filename, 'wb') as f:
+         f.write(data)
+      return filename
+
+   # for -arch all, the code is decoded only once for all chips
+   def testDecodingForSeveralArchs(self):
+      import uiCA
+      from microArchConfigs import MicroArchConfigs
+      filename = self.writeFile('code.bin', getCode(getReadmeLoop()))
+      uArchConfigs = [MicroArchConfigs[arch] for arch in ['SKL', 'KBL', 'HSW', 'ICL']]
+      with FakeDecoder(getReadmeLoop()) as decoder:
+         disasForChip = uiCA.getXedDisasForArchs(filename, True, uArchConfigs, False)
+      self.assertEqual(decoder.calls, [(11, ['HASWELL', 'ICE_LAKE', 'SKYLAKE'])])
+      self.assertEqual(sorted(disasForChip), ['HASWELL', 'ICE_LAKE', 'SKYLAKE'])
+      self.assertEqual(disasForChip['SKYLAKE'], getReadmeLoop())
+      self.assertIs(disasForChip['SKYLAKE'], disasForChip['HASWELL']) # the output is only parsed once
+
+   def testBatchDecoding(self):
+      import uiCA
+      from microArchConfigs import MicroArchConfigs
+      readmeCode = getCode(getReadmeLoop())
+      divCode = getCode(getDivLoop())
+      invalidCode = b'\xff\xff'
+      # the truncated jnz at the end of the block b'\x75' swallows the first byte of the next block
+      blocks = [readmeCode, invalidCode, b'', divCode, readmeCode[:4], readmeCode[4:], divCode + invalidCode, b'\x75', readmeCode, divCode]
+      expected = [getReadmeLoop(), None, [], getDivLoop(), None, None, None, None, getReadmeLoop(), getDivLoop()]
+      for maxBufferSize in [1024, 10]:
+         with FakeDecoder(getReadmeLoop() + getDivLoop()) as decoder:
+            self.assertEqual(uiCA.getXedDisasBatch(blocks, MicroArchConfigs['SKL'], maxBufferSize=maxBufferSize), expected)
+         self.assertLessEqual(decoder.nDecodedBytes, 3 * sum(len(block) for block in blocks))
+      with FakeDecoder(getReadmeLoop()):
+         self.assertEqual(uiCA.getXedDisasBatch([b'\x75', readmeCode], MicroArchConfigs['SKL']), [None, getReadmeLoop()])
+
+   # each block is decoded at most three times, even if many blocks cannot be decoded
+   def testBatchDecodingWithManyErrors(self):
+      import uiCA
+      from microArchConfigs import MicroArchConfigs
+      blocks = [(getCode(getReadmeLoop()) if (i % 3) else b'\xff\xff') for i in range(300)]
+      with FakeDecoder(getReadmeLoop()) as decoder:
+         disasList = uiCA.getXedDisasBatch(blocks, MicroArchConfigs['SKL'])
+      self.assertEqual([disas is None for disas in disasList], [(i % 3 == 0) for i in range(300)])
+      self.assertLessEqual(decoder.nDecodedBytes, 3 * sum(len(block) for block in blocks))
+
+   def testIACAMarkedRegions(self):
+      import uiCA
+      prefix = b'\x90' * 5
+      regions = [getCode(getReadmeLoop()), getCode(getDivLoop())]
+      code = prefix + b''.join(uiCA.iacaStartMarker + region + uiCA.iacaEndMarker for region in regions) + uiCA.iacaStartMarker
+      rawFile = self.writeFile('code.bin', code)
+      expected = [(regions[0], 13, 13), (regions[1], 40, 40)]
+      self.assertEqual(uiCA.findIACAMarkedRegions(rawFile, True), expected)
+      self.assertEqual(uiCA.findIACAMarkedRegions(rawFile, True, maxRegions=1), expected[:1])
+      self.assertEqual(uiCA.findIACAMarkedRegion(rawFile, True), (regions[0], 13))
+
+      elfFile = os.path.join(self.tmpDir.name, 'code.elf')
+      writeELF(elfFile, [('f', code)], textAddress=0x401000)
+      self.assertEqual(uiCA.findIACAMarkedRegions(elfFile, False), [(c, 0x401000 + a, o + 64) for c, a, o in expected])
+      self.assertIsNone(uiCA.findIACAMarkedRegions(rawFile, False))
+      self.assertEqual(uiCA.findIACAMarkedRegions(self.writeFile('empty.bin', b''), True), [])
+
+   # with -iacaMarkers, only the marked region is decoded; the branch targets refer to the addresses in the file
+   def testDecodingIACAMarkedRegion(self):
+      import uiCA
+      from microArchConfigs import MicroArchConfigs
+      rawFile = self.writeFile('code.bin', b'\xff' * 5 + uiCA.iacaStartMarker + getCode(getReadmeLoop()) + uiCA.iacaEndMarker + b'\xff')
+      with FakeDecoder(getReadmeLoop()) as decoder:
+         disas = uiCA.getXedDisas(rawFile, True, MicroArchConfigs['SKL'], True)
+      self.assertEqual(decoder.calls, [(11, ['SKYLAKE'])])
+      self.assertEqual([instrD.asm for instrD in disas], [instrD.asm for instrD in getReadmeLoop()[:-1]] + ['jnz 0xd'])
+
+
+if __name__ == '__main__':
+   unittest.main()
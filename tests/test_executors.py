@@ -0,0 +1,34 @@
+import unittest
+
+from common import getDivLoop, getLFenceLoop, getReadmeLoop, getVectorLoop, getZMMLoop, requiresSimulator
+
+
+@requiresSimulator
+class ExecutorTest(unittest.TestCase):
+   def getThroughputs(self, disasList, arch, executorType):
+      import uiCA
+      from microArchConfigs import MicroArchConfigs
+      return uiCA.runSimulations(disasList, MicroArchConfigs[arch], [0] * len(disasList), 'diff', False, False, False, executorType)
+
+   def testProcessAndThreadPool(self):
+      disasList = [getReadmeLoop(), getLFenceLoop(), getDivLoop(), getVectorLoop(), getReadmeLoop()[:-1]]
+      TPs = self.getThroughputs(disasList, 'SKL', 'process')
+      self.assertEqual(self.getThroughputs(disasList, 'SKL', 'thread'), TPs)
+      self.assertEqual(TPs[0], 2.0)
+
+   def testUnknownExecutorType(self):
+      import uiCA
+      with self.assertRaises(ValueError):
+         uiCA.getExecutor('fiber')
+
+   # the instruction data is shared by all threads; simulating code with zmm registers must not change the port data of the other vector
+   # instructions
+   def testZMMLoopOnThreadPool(self):
+      [vectorTP] = self.getThroughputs([getVectorLoop()], 'SKX', 'thread')
+      [zmmTP] = self.getThroughputs([getZMMLoop()], 'SKX', 'thread')
+      self.assertEqual(self.getThroughputs([getZMMLoop()] * 32, 'SKX', 'thread'), [zmmTP] * 32)
+      self.assertEqual(self.getThroughputs([getVectorLoop()] * 4, 'SKX', 'thread'), [vectorTP] * 4)
+
+
+if __name__ == '__main__':
+   unittest.main()
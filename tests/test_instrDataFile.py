@@ -0,0 +1,94 @@
+import os
+import tempfile
+import unittest
+from itertools import product
+from types import SimpleNamespace
+from unittest import mock
+
+from common import requiresSimulator
+
+
+@requiresSimulator
+class InstrDataFileTest(unittest.TestCase):
+   def setUp(self):
+      self.tmpDir = tempfile.TemporaryDirectory()
+      self.filename = os.path.join(self.tmpDir.name, 'test.bin')
+
+   def tearDown(self):
+      self.tmpDir.cleanup()
+
+   def testRoundTrip(self):
+      from instrDataFile import InstrDataFile, writeInstrDataFile
+      perfData = [{'uops': 1, 'ports': {'0156': 1}, 'lat': {('REG0', 'REG0'): 1}}, {'uops': 2, 'divC': 4}, {'uops': 1, 'ports': {'0156': 1},
+                  'lat': {('REG0', 'REG0'): 1}}]
+      instrData = {'ADD_GPRv_GPRv_01': [{'string': 'ADD_01 (R64, R64)', 'perfData': 0, 'attr': 0, 'flagsW': {'C', 'Z'}}], 'NOP': []}
+      writeInstrDataFile(self.filename, {'perfData': perfData, 'instrData': instrData})
+
+      instrDataFile = InstrDataFile(self.filename)
+      self.assertEqual([instrDataFile.tables['perfData'][i] for i in range(3)], perfData)
+      self.assertNotIn(3, instrDataFile.tables['perfData'])
+      self.assertIsNone(instrDataFile.tables['perfData'].get(-1))
+      self.assertEqual(instrDataFile.tables['instrData']['ADD_GPRv_GPRv_01'], instrData['ADD_GPRv_GPRv_01'])
+      self.assertEqual(instrDataFile.tables['instrData'].get('NOP'), [])
+      with self.assertRaises(KeyError):
+         instrDataFile.tables['instrData']['UD2']
+
+   # identical entries of different archs are only stored once
+   def testSharedFile(self):
+      from instrDataFile import InstrDataFile, computeAttrKeysDict, writeSharedInstrDataFile
+      perfData = {'SKL': [{'uops': 1, 'ports': {'0156': 1}}, {'uops': 2}], 'HSW': [{'uops': 2}, {'uops': 3}]}
+      attrData = {'SKL': [{'EOSZ': '3'}], 'HSW': [{}, {'EOSZ': '3'}]}
+      instrData = {'SKL': {'ADD_GPRv_GPRv_01': [{'string': 'ADD_01 (R64, R64)', 'perfData': 1, 'attr': 0}]},
+                   'HSW': {'ADD_GPRv_GPRv_01': [{'string': 'ADD_01 (R64, R64)', 'perfData': 0, 'attr': 1}],
+                           'IMUL_GPRv_GPRv': [{'string': 'IMUL (R64, R64)', 'perfData': 1, 'attr': 0}]}}
+      writeSharedInstrDataFile(self.filename, {arch: (instrData[arch], perfData[arch], attrData[arch],
+                                                      computeAttrKeysDict(instrData[arch], attrData[arch])) for arch in ['SKL', 'HSW']})
+
+      instrDataFile = InstrDataFile(self.filename)
+      self.assertEqual(sorted(instrDataFile.getArchs()), ['HSW', 'SKL'])
+      self.assertIn(2, instrDataFile.tables['perfData'])
+      self.assertNotIn(3, instrDataFile.tables['perfData'])
+      self.assertNotIn(2, instrDataFile.tables['attrData'])
+      for arch in ['SKL', 'HSW']:
+         archData = instrDataFile.getArchData(arch)
+         for iform, instrDataList in instrData[arch].items():
+            for entry, sharedEntry in zip(instrDataList, archData.instrData[iform]):
+               self.assertEqual(entry['string'], sharedEntry['string'])
+               self.assertEqual(perfData[arch][entry['perfData']], archData.perfData[sharedEntry['perfData']])
+               self.assertEqual(attrData[arch][entry['attr']], archData.attrData[sharedEntry['attr']])
+      self.assertIs(instrDataFile.getArchData('SKL').perfData, instrDataFile.getArchData('HSW').perfData)
+
+   def testInvalidFile(self):
+      from instrDataFile import InstrDataFile
+      with open(self.filename, 'wb') as f:
+         f.write(b'instrData = {}\n' * 4)
+      with self.assertRaises(ValueError):
+         InstrDataFile(self.filename)
+
+
+@requiresSimulator
+class GetInstrDataTest(unittest.TestCase):
+   # getInstrData must return the same entry as checking the entries in order, both with the relevant attributes from convertXML.py and without them
+   def testMatchesLinearSearch(self):
+      import uiCA
+      from disas import InstrDisas, matchAttributes
+      from instrDataFile import computeAttrKeysDict
+      from microArchConfigs import MicroArchConfigs
+      attrData = [{}, {'EOSZ': '3'}, {'EOSZ': '2'}, {'EOSZ': '3', 'IMMZERO': '1'}, {'REP': '2'}, {'IMMZERO': '0'}]
+      instrData = {'TEST' + str(i): [{'attr': a} for a in attrs] for i, attrs in enumerate([[1, 2], [3, 1, 2], [3, 4, 0], [0, 3], [4], [5, 1], []])}
+      for attrKeys in [None, computeAttrKeysDict(instrData, attrData)]:
+         archData = SimpleNamespace(instrData=instrData, attrData=attrData)
+         if attrKeys is not None:
+            archData.attrKeys = attrKeys
+         with mock.patch.object(uiCA, 'attrKeysCache', {}), mock.patch.object(uiCA, 'instrDataCache', {}):
+            for _ in range(2): # the second time, the results are taken from the cache
+               for iform, instrDataList in instrData.items():
+                  for eosz, immzero, rep in product([None, '1', '2', '3'], [None, '0', '1'], [None, '0', '2', '3']):
+                     instrAttr = {k: v for k, v in [('EOSZ', eosz), ('IMMZERO', immzero), ('REP', rep), ('MASK', '1')] if v is not None}
+                     instrD = InstrDisas('', '', iform, {}, {}, {}, instrAttr)
+                     expected = next((e for e in instrDataList if matchAttributes(instrAttr, attrData[e['attr']])), None)
+                     self.assertIs(uiCA.getInstrData(instrD, MicroArchConfigs['SKL'], archData), expected, (iform, instrAttr))
+
+
+if __name__ == '__main__':
+   unittest.main()
@@ -0,0 +1,138 @@
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+from common import FakeDecoder, getCode, getDivLoop, getReadmeLoop, jnz, requiresSimulator, writeELF
+
+
+# Runs the command-line interface with the fake decoder and the thread executor
+@requiresSimulator
+class MainTest(unittest.TestCase):
+   def setUp(self):
+      self.tmpDir = tempfile.TemporaryDirectory()
+      self.jsonFile = os.path.join(self.tmpDir.name, 'result.json')
+
+   def tearDown(self):
+      self.tmpDir.cleanup()
+
+   def writeFile(self, name, data):
+      filename = os.path.join(self.tmpDir.name, name)
+      with open(filename, 'wb') as f:
+         f.write(data)
+      return filename
+
+   # returns (exit code, output)
+   def runMain(self, *args):
+      import uiCA
+      output = io.StringIO()
+      exitCode = 0
+      with FakeDecoder(getReadmeLoop() + getDivLoop()), mock.patch.object(sys, 'argv', ['uiCA.py'] + list(args) + ['-executor', 'thread']):
+         with contextlib.redirect_stdout(output):
+            try:
+               uiCA.main()
+            except SystemExit as e:
+               exitCode = e.code
+      return (exitCode, output.getvalue())
+
+   def readJSON(self):
+      with open(self.jsonFile) as f:
+         return json.load(f)
+
+   def getThroughput(self, disas, alignmentOffset=0, arch='SKL'):
+      import uiCA
+      from microArchConfigs import MicroArchConfigs
+      return uiCA.getThroughput(disas, MicroArchConfigs[arch], alignmentOffset, 'diff', False, False, False)
+
+   def testAllIacaRegions(self):
+      import uiCA
+      regions = [getCode(getReadmeLoop()), b'\xff\xff', b'', getCode(getDivLoop())]
+      filename = self.writeFile('code.bin', b''.join(uiCA.iacaStartMarker + region + uiCA.iacaEndMarker for region in regions))
+      exitCode, output = self.runMain(filename, '-raw', '-arch', 'SKL', '-allIacaRegions', '-json', self.jsonFile)
+      self.assertEqual(exitCode, 0)
+      self.assertEqual(len(output.splitlines()), 4)
+      self.assertEqual(self.readJSON(), [{'fileOffset': 8, 'address': 8, 'throughput': self.getThroughput(getReadmeLoop())},
+                                         {'fileOffset': 35, 'address': 35, 'error': 'could not be decoded'},
+                                         {'fileOffset': 53, 'address': 53, 'error': 'no instructions found'},
+                                         {'fileOffset': 69, 'address': 69, 'throughput': self.getThroughput(getDivLoop())}])
+
+   def writeELF(self, name, functions):
+      filename = os.path.join(self.tmpDir.name, name)
+      writeELF(filename, functions, textAddress=0x401000)
+      return filename
+
+   def testLoops(self):
+      filename = self.writeELF('code.elf', [('f', getCode(getDivLoop()[:-1] + getReadmeLoop())), ('g', getCode(getDivLoop())), ('h', b'\xff\xff')])
+      exitCode, output = self.runMain(filename, '-arch', 'SKL', '-loops', '-json', self.jsonFile)
+      self.assertEqual(exitCode, 0)
+      self.assertEqual(output.splitlines()[0], 'f+0x6: {:.2f}'.format(self.getThroughput(getReadmeLoop(), 6)))
+      self.assertEqual(self.readJSON(), [{'function': 'f', 'offset': 6, 'address': 0x401006, 'throughput': self.getThroughput(getReadmeLoop(), 6)},
+                                         {'function': 'g', 'offset': 0, 'address': 0x401011, 'throughput': self.getThroughput(getDivLoop(), 17)}])
+
+   def testProfile(self):
+      # the last instruction of g is a branch that is not a loop branch; it is not simulated, but it is included in the number of instructions
+      filename = self.writeELF('code.elf', [('f', getCode(getDivLoop()[:-1] + getReadmeLoop())), ('g', getCode(getDivLoop()[:-1] + [jnz(0, 8)]))])
+      profile = self.writeFile('profile.txt', b'401000 10\n401006 30\n401009\n' + b'401009\n' * 9 + b'401014 6\n500000 5\ninvalid\n')
+      cacheHome = os.path.join(self.tmpDir.name, 'cache')
+      with mock.patch.dict(os.environ, {'XDG_CACHE_HOME': cacheHome}):
+         exitCode, output = self.runMain(filename, '-arch', 'SKL', '-profile', profile, '-json', self.jsonFile)
+      self.assertEqual(exitCode, 0)
+      self.assertFalse(os.path.exists(cacheHome)) # the results are only cached with -resultCache
+      loopTP = self.getThroughput(getReadmeLoop(), 6)
+      blockTP = self.getThroughput(getDivLoop()[:-1])
+      branchBlockTP = self.getThroughput(getDivLoop()[:-1], 0x11)
+      blocks = [{'function': 'f', 'offset': 6, 'address': 0x401006, 'hits': 40, 'instructions': 4, 'loop': True, 'throughput': loopTP,
+                 'cycles': loopTP * 40 / 4},
+                {'function': 'f', 'offset': 0, 'address': 0x401000, 'hits': 10, 'instructions': 2, 'loop': False, 'throughput': blockTP,
+                 'cycles': blockTP * 10 / 2},
+                {'function': 'g', 'offset': 0, 'address': 0x401011, 'hits': 6, 'instructions': 3, 'loop': False, 'throughput': branchBlockTP,
+                 'cycles': branchBlockTP * 6 / 3}]
+      blocks.sort(key=lambda b: -b['cycles'])
+      self.assertEqual(self.readJSON(), {'cycles': sum(b['cycles'] for b in blocks), 'totalHits': 61, 'coveredHits': 56, 'blocks': blocks})
+      self.assertTrue(output.startswith('Estimated cycles: {:.0f}'.format(sum(b['cycles'] for b in blocks))))
+
+   def testDiff(self):
+      readmeCode = getCode(getReadmeLoop())
+      divCode = getCode(getDivLoop())
+      oldFilename = self.writeELF('old.elf', [('f', readmeCode), ('g', divCode), ('h', readmeCode)])
+      newFilename = self.writeELF('new.elf', [('f', readmeCode), ('g', readmeCode), ('k', divCode)])
+      resultCache = os.path.join(self.tmpDir.name, 'results')
+      oldG = {'oldFunction': 'g', 'oldOffset': 0, 'oldAddress': 0x40100b, 'oldThroughput': self.getThroughput(getDivLoop(), 11)}
+      expected = [{'function': 'f', 'offset': 0, 'address': 0x401000, 'throughput': self.getThroughput(getReadmeLoop()), 'oldFunction': 'f',
+                   'oldOffset': 0, 'oldAddress': 0x401000, 'oldThroughput': self.getThroughput(getReadmeLoop()), 'changed': False},
+                  dict(oldG, function='g', offset=0, address=0x40100b, throughput=self.getThroughput(getReadmeLoop(), 11), changed=True),
+                  dict(oldG, function='k', offset=0, address=0x401016, throughput=self.getThroughput(getDivLoop(), 22), changed=True),
+                  {'oldFunction': 'h', 'oldOffset': 0, 'oldAddress': 0x401013}]
+      for _ in range(2): # the second time, the throughputs are taken from the result cache
+         exitCode, output = self.runMain(newFilename, '-diff', oldFilename, '-arch', 'SKL', '-resultCache', resultCache, '-json', self.jsonFile)
+         self.assertEqual(exitCode, 0)
+         self.assertEqual(output.splitlines()[0], 'Loops: 1 unchanged, 2 changed, 0 added, 1 removed')
+         self.assertEqual(self.readJSON(), expected)
+      self.assertEqual(len(os.listdir(resultCache)), 4)
+
+   def testCorpus(self):
+      readmeHex = getCode(getReadmeLoop()).hex()
+      lines = ['code,throughput', readmeHex + ',2.0', 'ffff,1.0', readmeHex + ',2.0', '', getCode(getDivLoop()).hex()]
+      filename = self.writeFile('corpus.csv', '\n'.join(lines).encode())
+      expected = [('2', getReadmeLoop()), ('3', None), ('4', getReadmeLoop()), ('6', getDivLoop())]
+      for ordering in [[], ['-unordered']]:
+         exitCode, output = self.runMain(filename, '-corpus', '-arch', 'SKL,HSW', '-json', self.jsonFile, *ordering)
+         self.assertEqual(exitCode, 0)
+         with open(self.jsonFile) as f:
+            records = sorted((json.loads(line) for line in f), key=lambda r: r['index'])
+         self.assertEqual([(r['index'], r['name']) for r in records], [(i, name) for i, (name, _) in enumerate(expected)])
+         for record, (_, disas) in zip(records, expected):
+            for arch in ['SKL', 'HSW']:
+               if disas is None:
+                  self.assertEqual(record[arch], {'error': 'could not be decoded'})
+               else:
+                  self.assertEqual(sorted(record[arch]), ['throughput', 'time'])
+                  self.assertEqual(record[arch]['throughput'], self.getThroughput(disas, arch=arch))
+
+
+if __name__ == '__main__':
+   unittest.main()
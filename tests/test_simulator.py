@@ -0,0 +1,129 @@
+import unittest
+from unittest import mock
+
+from common import (add, dec, div, getDivLoop, getLFenceLoop, getLoop, getReadmeLoop, getVectorLoop, imul, lfence, load, mfence, requiresSimulator, sqrtsd,
+                    store)
+
+
+@requiresSimulator
+class SimulatorTest(unittest.TestCase):
+   def simulate(self, disas, arch, detailedOutput=False):
+      import uiCA
+      from microArchConfigs import MicroArchConfigs
+      uArchConfig = MicroArchConfigs[arch]
+      instructions = uiCA.getInstructions(disas, uArchConfig, uiCA.getArchData(uArchConfig), 0)
+      return uiCA.simulate(instructions, uArchConfig, 0, 'diff', False, detailedOutput)
+
+   # simulates the code without stopping when the state becomes periodic
+   def simulateWithoutPeriodDetection(self, disas, arch, detailedOutput=False):
+      import uiCA
+      with mock.patch.object(uiCA.PipelineStateEncoder, 'getFingerprint', lambda *_: object()):
+         return self.simulate(disas, arch, detailedOutput)
+
+   def testPeriodicLoopStopsEarly(self):
+      for detailedOutput in [False, True]:
+         sim = self.simulate(getLFenceLoop(), 'SKL', detailedOutput)
+         self.assertLess(sim.clock, 500)
+         self.assertGreaterEqual(sim.lastRelevantRound - sim.firstRelevantRound, 10 if detailedOutput else 1)
+         self.assertEqual(sim.TP, self.simulateWithoutPeriodDetection(getLFenceLoop(), 'SKL', detailedOutput).TP)
+
+   # skipping the cycles in which the pipeline is idle must not change the simulation
+   def testCycleSkipping(self):
+      import uiCA
+      for disas in [getReadmeLoop(), getReadmeLoop()[:-1], getLFenceLoop(), getDivLoop(), getVectorLoop()]:
+         for arch in ['SKL', 'SNB']:
+            sim = self.simulate(disas, arch)
+            with mock.patch.object(uiCA.FrontEnd, 'getNextEventCycle', lambda *_: None):
+               simWithoutSkipping = self.simulate(disas, arch)
+            self.assertEqual((sim.TP, sim.clock), (simWithoutSkipping.TP, simWithoutSkipping.clock))
+
+   # if only the throughput is needed, the instruction instances of the rounds that have been retired are released
+   def testRetiredRoundsAreReleased(self):
+      sim = self.simulate(getReadmeLoop(), 'SKL')
+      self.assertGreaterEqual(min(instrI.rnd for instrI in sim.frontEnd.allGeneratedInstrInstances), sim.lastRelevantRound)
+      sim = self.simulate(getReadmeLoop(), 'SKL', detailedOutput=True)
+      self.assertEqual(min(instrI.rnd for instrI in sim.frontEnd.allGeneratedInstrInstances), 0)
+
+   # the throughput must not depend on whether the detailed outputs are computed
+   def testThroughputOnly(self):
+      for disas in [getReadmeLoop(), getReadmeLoop()[:-1], getLFenceLoop(), getDivLoop(), getVectorLoop()]:
+         for arch in ['SKL', 'HSW', 'ICL']:
+            self.assertEqual(self.simulate(disas, arch).TP, self.simulate(disas, arch, detailedOutput=True).TP)
+
+   # the scheduler only checks a uop that was not ready in a previous cycle again if the reason why it was not ready might no longer apply; the
+   # simulation must be the same as if all of these uops were checked in every cycle (without skipping idle cycles)
+   def testBlockedUopsMatchFullScan(self):
+      import uiCA
+      loops = [
+         getLoop([imul('RAX', 'RAX'), add('RBX', 'RAX'), imul('RCX', 'RBX'), dec('R15')]), # dependency chain
+         getDivLoop(), # divider
+         getLoop([sqrtsd('XMM0', 'XMM1'), sqrtsd('XMM2', 'XMM3'), sqrtsd('XMM4', 'XMM5'), dec('R15')]), # limited by the throughput of sqrtsd
+         getLoop([lfence(), load('RDX', 'RSI'), add('RAX', 'RDX'), dec('R15')]), # load fence
+         getLoop([mfence(), store('RDI', 'RDX'), load('RDX', 'RSI'), dec('R15')]), # store fence
+         getLoop([imul('RCX', 'RCX'), imul('RDX', 'RDX'), imul('RSI', 'RSI'), imul('RDI', 'RDI'), dec('R15')]), # port 1
+         getLoop([div('RCX')] + [add(reg, reg) for reg in ['R8', 'R9', 'R10', 'R11']] * 10 + [dec('R15')]), # full scheduler
+      ]
+      for disas in loops:
+         for arch in ['SKL', 'SNB', 'ICL']:
+            sim = self.simulate(disas, arch)
+            fullScan = lambda scheduler, nonReadyIdx, uop: scheduler.otherNonReadyUops.append((nonReadyIdx, uop))
+            with mock.patch.object(uiCA.Scheduler, 'addBlockedUop', fullScan), mock.patch.object(uiCA.FrontEnd, 'getNextEventCycle', lambda *_: None):
+               simFullScan = self.simulate(disas, arch)
+            self.assertEqual((sim.TP, sim.clock), (simFullScan.TP, simFullScan.clock), disas)
+
+   # loads that wait for the address or the data of a store are only processed again when this store is executed; the simulation must be the same
+   # as if all pending uops were processed again (in the order in which they were dispatched) in every cycle
+   def testPendingLoadsMatchFullScan(self):
+      import uiCA
+      regs = ['RAX', 'RCX', 'RDX', 'RSI', 'RDI', 'R8', 'R9', 'R10']
+      loops = [
+         getLoop([store('RAX', 'RBX'), load('RCX', 'RAX'), add('RBX', 'RCX'), dec('R15')]), # store forwarding
+         getLoop([div('RBX')] + [store(reg, 'RAX') for reg in regs[1:]] + [load('R11', reg) for reg in regs[1:]] + [dec('R15')]), # wait for the data
+         getLoop([store(reg, 'RBX') for reg in regs] * 4 + [load('R11', 'RAX'), add('RBX', 'R11'), dec('R15')]), # many stores in the store buffer
+      ]
+      def processAllPendingUops(scheduler, uopsDispatched):
+         scheduler.uopsWaitingForStoreBuffer.clear()
+         processPendingUops(scheduler, sorted(scheduler.pendingUops, key=lambda uop: (uop.dispatched, uop.idx)))
+      processPendingUops = uiCA.Scheduler.processPendingUops
+      for disas in loops:
+         for arch in ['SKL', 'SNB', 'ICL']:
+            sim = self.simulate(disas, arch)
+            with mock.patch.object(uiCA.Scheduler, 'processPendingUops', processAllPendingUops):
+               simFullScan = self.simulate(disas, arch)
+            self.assertEqual((sim.TP, sim.clock), (simFullScan.TP, simFullScan.clock), disas)
+
+   def testReadmeLoop(self):
+      for arch in ['SKL', 'HSW', 'ICL']:
+         self.assertEqual(self.simulate(getReadmeLoop(), arch).TP, 2.0)
+
+
+@requiresSimulator
+class TimeWheelTest(unittest.TestCase):
+   def testValuesInWindow(self):
+      from uiCA import TimeWheel
+      timeWheel = TimeWheel(4, 0, trackSum=True)
+      for cycle in range(10):
+         timeWheel[cycle] = cycle
+      self.assertEqual(timeWheel.getWindow(9), (6, 7, 8, 9))
+      self.assertEqual(timeWheel.getWindowSum(9), 30)
+      self.assertEqual(timeWheel.get(5), 0) # no longer in the window
+      timeWheel[8] = 1
+      self.assertEqual(timeWheel.getWindowSum(9), 23)
+      timeWheel[3] = 100 # older than the window; ignored
+      self.assertEqual(timeWheel.getWindowSum(9), 23)
+      self.assertEqual(timeWheel.getWindowSum(11), 10)
+      self.assertEqual(timeWheel.getWindowSum(100), 0)
+      self.assertEqual(timeWheel.getWindow(100), (0, 0, 0, 0))
+      with self.assertRaises(ValueError): # older than the end of the window
+         timeWheel.getWindowSum(99)
+
+   def testEmptyWindow(self):
+      from uiCA import TimeWheel
+      timeWheel = TimeWheel(0, 0, trackSum=True)
+      timeWheel[1] = 5
+      self.assertEqual(timeWheel.get(1), 0)
+      self.assertEqual(timeWheel.getWindowSum(1), 0)
+
+
+if __name__ == '__main__':
+   unittest.main()
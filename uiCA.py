@@ -1,20 +1,33 @@
 #!/usr/bin/env python3
 
+import gzip
+import hashlib
 import importlib
+import json
+import mmap
 import os
 import re
+import sys
+import tempfile
+import threading
+import time
+from bisect import bisect_right
 from collections import Counter, deque, namedtuple, OrderedDict
 from concurrent import futures
 from heapq import heappop, heappush
-from itertools import count, repeat
-from typing import List, Set, Dict, NamedTuple, Optional
+from itertools import accumulate, count, islice, repeat
+from queue import SimpleQueue
+from typing import Deque, List, Set, Dict, NamedTuple, Optional
 
 import random
-random.seed(0)
 
 from disas import *
 from x64_lib import *
+from decodeCache import DecodeCache, FileCache, getDefaultCacheDir, getKey
+from elfFile import getELFFunctions, getExecutableELFSectionHeaders
+from instrDataFile import InstrDataFile, computeAttrKeys
 from microArchConfigs import MicroArchConfig, MicroArchConfigs
+from xedLib import getXedLib, libNames
 from instrData.uArchInfo import allPorts, ALUPorts
 
 class UopProperties:
@@ -38,10 +51,8 @@ class UopProperties:
       return 'UopProperties(ports: {}, in: {}, out: {}, lat: {})'.format(self.possiblePorts, self.inputOperands, self.outputOperands, self.latencies)
 
 class Uop:
-   idx_iter = count()
-
    def __init__(self, prop, instrI):
-      self.idx = next(self.idx_iter)
+      self.idx = next(instrI.uopIdxIter)
       self.prop: UopProperties = prop
       self.instrI: InstrInstance = instrI
       self.fusedUop: Optional[FusedUop] = None # fused-domain uop that contains this uop
@@ -216,6 +227,73 @@ class RenamedOperand:
 
 AbstractValue = namedtuple('AbstractValue', ['base', 'offset'])
 
+# Ring buffer that stores values for the last nCycles cycles; values can only be stored for cycles that are not older than the last cycle for which a
+# value was stored. For all other cycles, get() returns the default value. If trackSum is True, the sum of the values in the window is maintained.
+class TimeWheel:
+   def __init__(self, nCycles, default=None, trackSum=False):
+      self.nCycles = nCycles
+      self.default = default
+      self.trackSum = trackSum
+      self.cycles = [None] * nCycles
+      self.values = [default] * nCycles
+      self.lastCycle = None
+      self.windowSum = 0
+
+   # moves the window such that it ends at cycle
+   def advance(self, cycle):
+      if (self.lastCycle is not None) and (cycle <= self.lastCycle):
+         return
+      if (self.lastCycle is None) or (cycle - self.lastCycle >= self.nCycles):
+         self.cycles = [None] * self.nCycles
+         self.values = [self.default] * self.nCycles
+         self.windowSum = 0
+      else:
+         for c in range(self.lastCycle + 1, cycle + 1):
+            slot = c % self.nCycles
+            if self.cycles[slot] is not None:
+               if self.trackSum:
+                  self.windowSum -= self.values[slot]
+               self.cycles[slot] = None
+               self.values[slot] = self.default
+      self.lastCycle = cycle
+
+   def __setitem__(self, cycle, value):
+      if not self.nCycles:
+         return
+      self.advance(cycle)
+      if cycle <= self.lastCycle - self.nCycles:
+         return
+      slot = cycle % self.nCycles
+      if self.trackSum:
+         if self.cycles[slot] == cycle:
+            self.windowSum -= self.values[slot]
+         self.windowSum += value
+      self.cycles[slot] = cycle
+      self.values[slot] = value
+
+   def get(self, cycle):
+      if not self.nCycles:
+         return self.default
+      slot = cycle % self.nCycles
+      if self.cycles[slot] == cycle:
+         return self.values[slot]
+      return self.default
+
+   # returns the sum of the values for the nCycles cycles up to (and including) lastCycle; lastCycle must not be older than the end of the current
+   # window (i.e., the last cycle for which a value was stored or the sum was requested), as the values before the window are no longer available
+   def getWindowSum(self, lastCycle):
+      if not self.nCycles:
+         return 0
+      if (self.lastCycle is not None) and (lastCycle < self.lastCycle):
+         raise ValueError('the window sum is only available for cycles >= {} (requested: {})'.format(self.lastCycle, lastCycle))
+      self.advance(lastCycle)
+      return self.windowSum
+
+   # returns the values for the nCycles cycles up to (and including) lastCycle
+   def getWindow(self, lastCycle):
+      return tuple(self.get(c) for c in range(lastCycle - self.nCycles + 1, lastCycle + 1))
+
+
 class Renamer:
    def __init__(self, IDQ, reorderBuffer, uArchConfig: MicroArchConfig, initPolicy):
       self.IDQ = IDQ
@@ -237,13 +315,17 @@ class Renamer:
          self.abstractValueDict['RBP'] = self.generateFreshAbstractValue()
       self.curInstrRndAbstractValueDict = {}
 
-      self.nGPRMoveElimInCycle = {}
+      # the number of eliminated moves in the last moveEliminationPipelineLength-1 cycles, and the number of multi-use entries in the last
+      # moveEliminationPipelineLength cycles
+      self.nGPRMoveElimInCycle = TimeWheel(uArchConfig.moveEliminationPipelineLength - 1, 0, trackSum=True)
       self.multiUseGPRDict = {}
-      self.multiUseGPRDictUseInCycle = {}
+      self.multiUseGPRDictUseInCycle = TimeWheel(uArchConfig.moveEliminationPipelineLength, 0)
 
-      self.nSIMDMoveElimInCycle = {}
+      # the number of eliminated moves in the last moveEliminationPipelineLength-1 cycles, and the number of multi-use entries in the last
+      # moveEliminationPipelineLength cycles
+      self.nSIMDMoveElimInCycle = TimeWheel(uArchConfig.moveEliminationPipelineLength - 1, 0, trackSum=True)
       self.multiUseSIMDDict = {}
-      self.multiUseSIMDDictUseInCycle = {}
+      self.multiUseSIMDDictUseInCycle = TimeWheel(uArchConfig.moveEliminationPipelineLength, 0)
 
       self.renamerActiveCycle = 0
 
@@ -293,8 +375,8 @@ class Renamer:
                      nGPRMoveElimPossible = 1
                   else:
                      nGPRMoveElimPossible = (self.uArchConfig.moveEliminationGPRSlots - nGPRMoveElim
-                           - sum(self.nGPRMoveElimInCycle.get(self.renamerActiveCycle - i, 0) for i in range(1, self.uArchConfig.moveEliminationPipelineLength))
-                           - self.multiUseGPRDictUseInCycle.get(self.renamerActiveCycle - self.uArchConfig.moveEliminationPipelineLength, 0))
+                           - self.nGPRMoveElimInCycle.getWindowSum(self.renamerActiveCycle - 1)
+                           - self.multiUseGPRDictUseInCycle.get(self.renamerActiveCycle - self.uArchConfig.moveEliminationPipelineLength))
                   if nGPRMoveElimPossible > 0:
                      uop.eliminated = True
                      nGPRMoveElim += 1
@@ -303,8 +385,8 @@ class Renamer:
                      nSIMDMoveElimPossible = 1
                   else:
                      nSIMDMoveElimPossible = (self.uArchConfig.moveEliminationSIMDSlots - nSIMDMoveElim
-                           - sum(self.nSIMDMoveElimInCycle.get(self.renamerActiveCycle - i, 0) for i in range(1, self.uArchConfig.moveEliminationPipelineLength))
-                           - self.multiUseSIMDDictUseInCycle.get(self.renamerActiveCycle - self.uArchConfig.moveEliminationPipelineLength, 0))
+                           - self.nSIMDMoveElimInCycle.getWindowSum(self.renamerActiveCycle - 1)
+                           - self.multiUseSIMDDictUseInCycle.get(self.renamerActiveCycle - self.uArchConfig.moveEliminationPipelineLength))
                   if nSIMDMoveElimPossible > 0:
                      uop.eliminated = True
                      nSIMDMoveElim += 1
@@ -408,6 +490,32 @@ class Renamer:
 
       return renamerUops
 
+   # returns the next cycle after clock in which uops can be issued (assuming that the reorder buffer and the scheduler are not full), or None if
+   # this is only possible after the reorder buffer has become empty
+   def getNextEventCycle(self, clock):
+      if not self.IDQ:
+         return None
+      firstUnfusedUop = self.IDQ[0].getUnfusedUops()[0]
+      if firstUnfusedUop.prop.isFirstUopOfInstr:
+         if firstUnfusedUop.prop.instr.regMergeUopPropertiesList and (self.lastRegMergeIssued != firstUnfusedUop):
+            return clock + 1
+         if firstUnfusedUop.prop.instr.isSerializingInstr and not self.reorderBuffer.isEmpty():
+            return None
+      return clock + 1
+
+   # equivalent to calling cycle() nCycles times if no uops can be issued in these cycles
+   def skipIdleCycles(self, nCycles):
+      self.cycle()
+      # after the first idle cycle, only the cycle counter changes; the entries for cycles that lie more than moveEliminationPipelineLength cycles
+      # in the past are never accessed
+      lastCycle = self.renamerActiveCycle + nCycles - 1
+      for cycle in range(max(self.renamerActiveCycle + 1, lastCycle - self.uArchConfig.moveEliminationPipelineLength), lastCycle + 1):
+         if self.multiUseGPRDict:
+            self.multiUseGPRDictUseInCycle[cycle] = len(self.multiUseGPRDict)
+         if self.multiUseSIMDDict:
+            self.multiUseSIMDDictUseInCycle[cycle] = len(self.multiUseSIMDDict)
+      self.renamerActiveCycle = lastCycle
+
    def getRenameDictKey(self, op):
       if isinstance(op, RegOperand):
          return getCanonicalReg(op.reg)
@@ -456,7 +564,7 @@ class Renamer:
 
 class FrontEnd:
    def __init__(self, instructions: List[Instr], reorderBuffer, scheduler, uArchConfig: MicroArchConfig,
-                unroll, alignmentOffset, initPolicy, perfEvents, simpleFrontEnd=False):
+                unroll, alignmentOffset, initPolicy, perfEvents, simpleFrontEnd=False, TPOnly=False):
       self.IDQ = deque()
       self.renamer = Renamer(self.IDQ, reorderBuffer, uArchConfig, initPolicy)
       self.reorderBuffer = reorderBuffer
@@ -465,18 +573,19 @@ class FrontEnd:
       self.unroll = unroll
       self.alignmentOffset = alignmentOffset
       self.perfEvents = perfEvents
+      self.TPOnly = TPOnly # if True, information that is only needed for the detailed outputs (e.g., perf. events, uop sources) is not recorded
 
-      self.MS = MicrocodeSequencer(self.uArchConfig)
+      self.MS = MicrocodeSequencer(self.uArchConfig, TPOnly)
 
       self.instructionQueue = deque()
       self.preDecoder = PreDecoder(self.instructionQueue, self.uArchConfig)
-      self.decoder = Decoder(self.instructionQueue, self.MS, self.uArchConfig)
+      self.decoder = Decoder(self.instructionQueue, self.MS, self.uArchConfig, TPOnly)
 
       self.RSPOffset = 0
 
-      self.allGeneratedInstrInstances: List[InstrInstance] = []
+      self.allGeneratedInstrInstances: Deque[InstrInstance] = deque()
 
-      self.DSB = DSB(self.MS, self.uArchConfig)
+      self.DSB = DSB(self.MS, self.uArchConfig, TPOnly)
       self.addressesInDSB = set()
 
       self.LSDUnrollCount = 1
@@ -486,10 +595,12 @@ class FrontEnd:
       else:
          self.uopSource = 'MITE'
 
+      # the uop indices only need to be unique within a simulation; thus, several simulations can run concurrently in the same process
+      uopIdxIter = count()
       if unroll or simpleFrontEnd:
-         self.cacheBlockGenerator = CacheBlockGenerator(instructions, True, self.alignmentOffset)
+         self.cacheBlockGenerator = CacheBlockGenerator(instructions, True, self.alignmentOffset, uopIdxIter)
       else:
-         self.cacheBlocksForNextRoundGenerator = CacheBlocksForNextRoundGenerator(instructions, self.alignmentOffset)
+         self.cacheBlocksForNextRoundGenerator = CacheBlocksForNextRoundGenerator(instructions, self.alignmentOffset, uopIdxIter)
          cacheBlocksForFirstRound = next(self.cacheBlocksForNextRoundGenerator)
 
          if self.uArchConfig.DSBBlockSize == 32:
@@ -522,15 +633,9 @@ class FrontEnd:
       self.reorderBuffer.cycle(clock, issueUops)
       self.scheduler.cycle(clock, issueUops)
 
-      if self.reorderBuffer.isFull():
-         self.perfEvents.setdefault(clock, {})['RBFull'] = 1
-      if self.scheduler.isFull():
-         self.perfEvents.setdefault(clock, {})['RSFull'] = 1
-      if len(self.instructionQueue) + self.uArchConfig.preDecodeWidth > self.uArchConfig.IQWidth:
-         self.perfEvents.setdefault(clock, {})['IQFull'] = 1
-
-      if len(self.IDQ) + self.uArchConfig.DSBWidth > self.uArchConfig.IDQWidth:
-         self.perfEvents.setdefault(clock, {})['IDQFull'] = 1
+      if not self.TPOnly:
+         self.addPerfEvents(clock)
+      if self.isIDQFull():
          return
 
       if self.uopSource is None:
@@ -583,8 +688,70 @@ class FrontEnd:
          for lamUop in newUops:
             self.addStackSyncUop(clock, lamUop.getUnfusedUops()[0])
             self.IDQ.append(lamUop)
-            lamUop.addedToIDQ = clock
+            if not self.TPOnly:
+               lamUop.addedToIDQ = clock
+
+
+   def addPerfEvents(self, clock):
+      if self.reorderBuffer.isFull():
+         self.perfEvents.setdefault(clock, {})['RBFull'] = 1
+      if self.scheduler.isFull():
+         self.perfEvents.setdefault(clock, {})['RSFull'] = 1
+      if len(self.instructionQueue) + self.uArchConfig.preDecodeWidth > self.uArchConfig.IQWidth:
+         self.perfEvents.setdefault(clock, {})['IQFull'] = 1
+      if self.isIDQFull():
+         self.perfEvents.setdefault(clock, {})['IDQFull'] = 1
 
+   def isIDQFull(self):
+      return len(self.IDQ) + self.uArchConfig.DSBWidth > self.uArchConfig.IDQWidth
+
+   # Returns the next cycle after clock in which a component of the pipeline can change its state in a way that is not covered by
+   # skipIdleCycles(), or None if no such cycle can be determined. Cheap checks come first, as most cycles are not idle.
+   def getNextEventCycle(self, clock):
+      nextCycles = []
+      for getNextCycle in [self.getNextIssueCycle, self.getNextFetchCycle, self.reorderBuffer.getNextEventCycle, self.scheduler.getNextEventCycle]:
+         nextCycle = getNextCycle(clock)
+         if nextCycle == clock + 1:
+            return nextCycle
+         if nextCycle is not None:
+            nextCycles.append(nextCycle)
+      return min(nextCycles, default=None)
+
+   def getNextIssueCycle(self, clock):
+      if self.reorderBuffer.isFull() or self.scheduler.isFull():
+         return None
+      return self.renamer.getNextEventCycle(clock)
+
+   def getNextFetchCycle(self, clock):
+      if self.isIDQFull():
+         return None
+      if self.uopSource is None:
+         return (clock + 1) if (len(self.IDQ) < self.uArchConfig.issueWidth) else None
+      if self.uopSource == 'LSD':
+         return (clock + 1) if (not self.IDQ) else None
+      if len(self.DSB.DSBBlockQueue) < 2 and len(self.preDecoder.B16BlockQueue) < 4:
+         return clock + 1
+      if self.MS.isBusy():
+         return clock + self.MS.stalled + 1
+      if self.uopSource == 'DSB':
+         return clock + 1
+      nextCycles = [c for c in [self.preDecoder.getNextEventCycle(clock), self.decoder.getNextEventCycle(clock)] if c is not None]
+      return min(nextCycles, default=None)
+
+   # equivalent to calling cycle() for the nCycles cycles after clock, provided that getNextEventCycle(clock) > clock + nCycles
+   def skipIdleCycles(self, clock, nCycles):
+      if not (self.reorderBuffer.isFull() or self.scheduler.isFull()):
+         self.renamer.skipIdleCycles(nCycles)
+      self.scheduler.skipIdleCycles(clock, nCycles)
+      if not self.TPOnly:
+         for cycle in range(clock + 1, clock + nCycles + 1):
+            self.addPerfEvents(cycle)
+      if self.isIDQFull() or (self.uopSource in [None, 'LSD']):
+         return
+      if self.MS.isBusy():
+         self.MS.stalled -= nCycles
+      else:
+         self.preDecoder.stalled = max(0, self.preDecoder.stalled - nCycles)
 
    def findCacheableAddresses(self, cacheBlocksForFirstRound):
       for cacheBlock in cacheBlocksForFirstRound:
@@ -674,9 +841,10 @@ class FrontEnd:
       if self.uopSource == 'LSD':
          for instrI in cacheBlock:
             self.IDQ.extend(instrI.uops)
-            instrI.source = 'LSD'
-            for uop in instrI.uops:
-               uop.uopSource = 'LSD'
+            if not self.TPOnly:
+               instrI.source = 'LSD'
+               for uop in instrI.uops:
+                  uop.uopSource = 'LSD'
       else:
          if self.uArchConfig.DSBBlockSize == 32:
             blocks = split64ByteBlockTo32ByteBlocks(cacheBlock)
@@ -685,12 +853,14 @@ class FrontEnd:
          for block in blocks:
             if not block: continue
             if block[0].address in self.addressesInDSB:
-               for instrI in block:
-                  instrI.source = 'DSB'
+               if not self.TPOnly:
+                  for instrI in block:
+                     instrI.source = 'DSB'
                self.DSB.DSBBlockQueue += self.getDSBBlocks(block)
             else:
-               for instrI in block:
-                  instrI.source = 'MITE'
+               if not self.TPOnly:
+                  for instrI in block:
+                     instrI.source = 'MITE'
                if self.uArchConfig.DSBBlockSize == 32:
                   B16Blocks = split32ByteBlockTo16ByteBlocks(block)
                else:
@@ -726,18 +896,20 @@ class FrontEnd:
          stackSyncUop = StackSyncUop(uop.instrI, self.uArchConfig)
          lamUop = LaminatedUop([FusedUop([stackSyncUop])])
          self.IDQ.append(lamUop)
-         lamUop.addedToIDQ = clock
-         lamUop.uopSource = 'SE'
+         if not self.TPOnly:
+            lamUop.addedToIDQ = clock
+            lamUop.uopSource = 'SE'
          uop.instrI.stackSyncUops.append(lamUop)
 
 
 DSBEntry = namedtuple('DSBEntry', ['instrI', 'uop', 'MSUops', 'requiresExtraEntry'])
 
 class DSB:
-   def __init__(self, MS, uArchConfig: MicroArchConfig):
+   def __init__(self, MS, uArchConfig: MicroArchConfig, TPOnly=False):
       self.MS = MS
       self.DSBBlockQueue = deque()
       self.uArchConfig = uArchConfig
+      self.TPOnly = TPOnly
 
    def cycle(self):
       DSBBlock = self.DSBBlockQueue[0]
@@ -791,7 +963,8 @@ class DSB:
 
          if entry.uop:
             retList.append((entry.instrI, entry.uop))
-            entry.uop.uopSource = 'DSB'
+            if not self.TPOnly:
+               entry.uop.uopSource = 'DSB'
          if entry.MSUops:
             self.MS.addUops(entry.MSUops, 'DSB')
             return retList
@@ -802,8 +975,9 @@ class DSB:
 
 
 class MicrocodeSequencer:
-   def __init__(self, uArchConfig: MicroArchConfig):
+   def __init__(self, uArchConfig: MicroArchConfig, TPOnly=False):
       self.uArchConfig = uArchConfig
+      self.TPOnly = TPOnly
       self.uopQueue = deque()
       self.stalled = 0
       self.postStall = 0
@@ -821,8 +995,9 @@ class MicrocodeSequencer:
 
    def addUops(self, uops, prevUopSource):
       self.uopQueue.extend(uops)
-      for lamUop in uops:
-         lamUop.uopSource = 'MS'
+      if not self.TPOnly:
+         for lamUop in uops:
+            lamUop.uopSource = 'MS'
       if prevUopSource == 'MITE':
          self.stalled = 1
          self.postStall = 1
@@ -835,10 +1010,11 @@ class MicrocodeSequencer:
 
 
 class Decoder:
-   def __init__(self, instructionQueue, MS: MicrocodeSequencer, uArchConfig: MicroArchConfig):
+   def __init__(self, instructionQueue, MS: MicrocodeSequencer, uArchConfig: MicroArchConfig, TPOnly=False):
       self.instructionQueue = instructionQueue
       self.MS = MS
       self.uArchConfig = uArchConfig
+      self.TPOnly = TPOnly
 
    def cycle(self, clock):
       uopsList = []
@@ -848,7 +1024,8 @@ class Decoder:
          instrI: InstrInstance = self.instructionQueue[0]
          if instrI.instr.macroFusedWithPrevInstr:
             self.instructionQueue.popleft()
-            instrI.removedFromIQ = clock
+            if not self.TPOnly:
+               instrI.removedFromIQ = clock
             continue
          if instrI.predecoded + self.uArchConfig.predecodeDecodeDelay > clock:
             break
@@ -860,12 +1037,14 @@ class Decoder:
             if (len(self.instructionQueue) <= 1) or (self.instructionQueue[1].predecoded + self.uArchConfig.predecodeDecodeDelay > clock):
                break
          self.instructionQueue.popleft()
-         instrI.removedFromIQ = clock
+         if not self.TPOnly:
+            instrI.removedFromIQ = clock
 
          if instrI.instr.uopsMITE:
             for lamUop in instrI.uops[:instrI.instr.uopsMITE]:
                uopsList.append((instrI, lamUop))
-               lamUop.uopSource = 'MITE'
+               if not self.TPOnly:
+                  lamUop.uopSource = 'MITE'
          else:
             uopsList.append((instrI, None))
 
@@ -885,6 +1064,20 @@ class Decoder:
 
       return uopsList
 
+   # returns the next cycle after clock in which an instruction can be decoded, or None if this requires further instructions from the predecoder
+   def getNextEventCycle(self, clock):
+      if not self.instructionQueue:
+         return None
+      instrI = self.instructionQueue[0]
+      if instrI.instr.macroFusedWithPrevInstr:
+         return clock + 1
+      nextCycle = max(clock + 1, instrI.predecoded + self.uArchConfig.predecodeDecodeDelay)
+      if instrI.instr.macroFusibleWith:
+         if len(self.instructionQueue) <= 1:
+            return None
+         nextCycle = max(nextCycle, self.instructionQueue[1].predecoded + self.uArchConfig.predecodeDecodeDelay)
+      return nextCycle
+
    def isEmpty(self):
       return (not self.instructionQueue)
 
@@ -938,6 +1131,16 @@ class PreDecoder:
 
       self.stalled = max(0, self.stalled-1)
 
+   # returns the next cycle after clock in which the predecoder is not stalled and can make progress, or None if this depends on other components
+   def getNextEventCycle(self, clock):
+      if self.stalled:
+         return clock + self.stalled + 1
+      if self.preDecQueue:
+         return clock + 1
+      if (self.B16BlockQueue or self.partialInstrI) and len(self.instructionQueue) + self.uArchConfig.preDecodeWidth <= self.uArchConfig.IQWidth:
+         return clock + 1
+      return None
+
    def isEmpty(self):
       return (not self.B16BlockQueue) and (not self.preDecQueue) and (not self.partialInstrI)
 
@@ -973,6 +1176,15 @@ class ReorderBuffer:
          else:
             break
 
+   # returns the next cycle after clock in which uops can be retired, or None if this depends on other components
+   def getNextEventCycle(self, clock):
+      if not self.uops:
+         return None
+      executedCycles = [u.executed for u in self.uops[0].getUnfusedUops()]
+      if None in executedCycles:
+         return None
+      return max(clock, max(executedCycles)) + 1
+
    def addUops(self, clock, newUops):
       for fusedUop in newUops:
          self.uops.append(fusedUop)
@@ -986,7 +1198,7 @@ class Scheduler:
       self.uArchConfig = uArchConfig
       self.uops = set()
       self.portUsage = {p:0  for p in allPorts[self.uArchConfig.name]}
-      self.portUsageAtStartOfCycle = {}
+      self.portUsageAtStartOfCycle = TimeWheel(2) # only the current and the previous cycle are accessed
       self.nextP23Port = '2'
       self.nextP49Port = '4'
       self.nextP78Port = '7'
@@ -994,9 +1206,17 @@ class Scheduler:
       self.divBusy = 0
       self.readyQueue = {p:[] for p in allPorts[self.uArchConfig.name]}
       self.readyDivUops = []
+      self.random = random.Random(0) # for simplePortAssignment; each simulation has its own generator, so that the results are reproducible
       self.uopsReadyInCycle = {}
-      self.nonReadyUops = [] # uops not yet added to uopsReadyInCycle (in order)
+      # uops not yet added to uopsReadyInCycle, as (nonReadyIdx, uop) pairs; nonReadyIdx determines the order in which the uops are checked
+      self.nonReadyIdxIter = count()
+      self.newNonReadyUops = [] # not checked yet
+      self.uopsBlockedByResource = dict() # instrStr -> uops that are blocked until blockedResources[instrStr] is 0
+      self.uopsBlockedByLoadFence = dict() # fence uop -> uops that are blocked until the fence uop is removed from pendingLoadFenceUops
+      self.uopsBlockedByStoreFence = dict() # fence uop -> uops that are blocked until the fence uop is removed from pendingStoreFenceUops
+      self.otherNonReadyUops = [] # checked in every cycle
       self.pendingUops = set() # dispatched, but not finished uops
+      self.uopsWaitingForStoreBuffer = dict() # StoreBufferEntry -> pending load uops that wait for the address and data of this entry
       self.pendingStoreFenceUops = deque()
       self.storeUopsSinceLastStoreFence = []
       self.pendingLoadFenceUops = deque()
@@ -1018,8 +1238,8 @@ class Scheduler:
          del self.uopsReadyInCycle[clock]
 
       self.addNewUops(clock, newUops)
-      self.dispatchUops(clock)
-      self.processPendingUops()
+      uopsDispatched = self.dispatchUops(clock)
+      self.processPendingUops(uopsDispatched)
       self.processNonReadyUops(clock)
       self.processPendingFences(clock)
       self.updateBlockedResources()
@@ -1058,10 +1278,15 @@ class Scheduler:
       for uop in self.uopsDispatchedInPrevCycle:
          self.portUsage[uop.actualPort] -= 1
       self.uopsDispatchedInPrevCycle = uopsDispatched
+      return uopsDispatched
 
 
-   def processPendingUops(self):
-      for uop in list(self.pendingUops):
+   # determines the finish times of the uops dispatched in the current cycle; loads that depend on a store buffer entry for which the address or
+   # the data is not yet known are only processed again after this is no longer the case
+   def processPendingUops(self, uopsDispatched):
+      uopsToProcess = deque(uopsDispatched)
+      while uopsToProcess:
+         uop = uopsToProcess.popleft()
          finishTime = uop.dispatched + 2
          if uop.prop.isFirstUopOfInstr and (uop.prop.instr.TP is not None):
             finishTime = max(finishTime, uop.dispatched + uop.prop.instr.TP)
@@ -1074,6 +1299,7 @@ class Scheduler:
                break
             finishTime = max(finishTime, readyCycle)
          if notFinished:
+            self.uopsWaitingForStoreBuffer.setdefault(uop.storeBufferEntry, []).append(uop)
             continue
 
          if uop.prop.isStoreAddressUop:
@@ -1084,6 +1310,10 @@ class Scheduler:
             dataReady = uop.dispatched + 1 # ToDo
             uop.storeBufferEntry.dataReadyCycle = dataReady
             finishTime = max(finishTime, dataReady)
+         if uop.prop.isStoreAddressUop or uop.prop.isStoreDataUop:
+            sb = uop.storeBufferEntry
+            if (sb.addressReadyCycle is not None) and (sb.dataReadyCycle is not None):
+               uopsToProcess.extend(self.uopsWaitingForStoreBuffer.pop(sb, []))
 
          for depUop in self.dependentUops.pop(uop, []):
             self.checkDependingUopsExecuted(depUop)
@@ -1101,18 +1331,114 @@ class Scheduler:
                del uopsSinceLastFence[:]
 
 
+   # only checks the uops for which the reason why they were not ready in a previous cycle might no longer apply
    def processNonReadyUops(self, clock):
-      newReadyUops = set()
-      for uop in self.nonReadyUops:
-         if self.checkUopReady(clock, uop):
-            newReadyUops.add(uop)
-      self.nonReadyUops = [u for u in self.nonReadyUops if (u not in newReadyUops)]
+      uopsToCheck = self.newNonReadyUops + self.otherNonReadyUops
+      self.newNonReadyUops = []
+      self.otherNonReadyUops = []
+      for resource in list(self.uopsBlockedByResource.keys()):
+         if self.blockedResources.get(resource, 0) == 0:
+            uopsToCheck.extend(self.uopsBlockedByResource.pop(resource))
+      for pendingFenceUops, uopsBlockedByFence in [(self.pendingLoadFenceUops, self.uopsBlockedByLoadFence),
+                                                  (self.pendingStoreFenceUops, self.uopsBlockedByStoreFence)]:
+         for fenceUop in list(uopsBlockedByFence.keys()):
+            if (not pendingFenceUops) or (pendingFenceUops[0] != fenceUop):
+               uopsToCheck.extend(uopsBlockedByFence.pop(fenceUop))
+      uopsToCheck.sort(key=lambda x: x[0])
+
+      for nonReadyIdx, uop in uopsToCheck:
+         if not self.checkUopReady(clock, uop):
+            self.addBlockedUop(nonReadyIdx, uop)
+
+   # adds a uop for which checkUopReady() failed to the list that corresponds to the first check that failed
+   def addBlockedUop(self, nonReadyIdx, uop):
+      if uop.prop.instr.isLoadSerializing or uop.prop.instr.isStoreSerializing:
+         if uop.prop.isFirstUopOfInstr:
+            self.otherNonReadyUops.append((nonReadyIdx, uop))
+            return
+      else:
+         if uop.prop.isLoadUop and self.pendingLoadFenceUops and self.pendingLoadFenceUops[0].idx < uop.idx:
+            self.uopsBlockedByLoadFence.setdefault(self.pendingLoadFenceUops[0], []).append((nonReadyIdx, uop))
+            return
+         if (uop.prop.isStoreDataUop or uop.prop.isStoreAddressUop) and self.pendingStoreFenceUops and self.pendingStoreFenceUops[0].idx < uop.idx:
+            self.uopsBlockedByStoreFence.setdefault(self.pendingStoreFenceUops[0], []).append((nonReadyIdx, uop))
+            return
+      if uop.prop.isFirstUopOfInstr and self.blockedResources.get(uop.prop.instr.instrStr, 0) > 0:
+         self.uopsBlockedByResource.setdefault(uop.prop.instr.instrStr, []).append((nonReadyIdx, uop))
+         return
+      self.otherNonReadyUops.append((nonReadyIdx, uop))
+
+   # returns the uops not yet added to uopsReadyInCycle in the order in which they are checked
+   def getNonReadyUops(self):
+      nonReadyUops = self.newNonReadyUops + self.otherNonReadyUops
+      for uopsBlocked in [self.uopsBlockedByResource, self.uopsBlockedByLoadFence, self.uopsBlockedByStoreFence]:
+         for uops in uopsBlocked.values():
+            nonReadyUops.extend(uops)
+      return [uop for _, uop in sorted(nonReadyUops, key=lambda x: x[0])]
 
 
    def updateBlockedResources(self):
       for r in self.blockedResources.keys():
          self.blockedResources[r] = max(0, self.blockedResources[r] - 1)
 
+   # returns the next cycle after clock in which uops can be dispatched, can finish, or can become ready, or None if this depends on other components
+   def getNextEventCycle(self, clock):
+      if self.uopsDispatchedInPrevCycle or any(self.readyQueue.values()):
+         return clock + 1
+
+      nextCycles = []
+      if self.readyDivUops:
+         nextCycles.append(clock + max(1, self.divBusy))
+      if self.uopsReadyInCycle:
+         nextCycles.append(min(self.uopsReadyInCycle.keys()))
+      for queue in [self.pendingLoadFenceUops, self.pendingStoreFenceUops]:
+         if queue and (queue[0].executed is not None):
+            nextCycles.append(max(clock + 1, queue[0].executed))
+      for resource in self.uopsBlockedByResource.keys():
+         nextCycles.append(clock + self.blockedResources.get(resource, 0) + 1)
+      for _, uop in self.otherNonReadyUops:
+         nextCycle = self.getNextReadyCheckCycle(clock, uop)
+         if nextCycle is not None:
+            nextCycles.append(nextCycle)
+      return min(nextCycles, default=None)
+
+   # returns the first cycle after clock in which checkUopReady() might succeed if no other uop changes its state, or None if this is not possible
+   def getNextReadyCheckCycle(self, clock, uop):
+      nextCycle = clock + 1
+      if uop.prop.instr.isLoadSerializing or uop.prop.instr.isStoreSerializing:
+         if uop.prop.isFirstUopOfInstr:
+            if uop.prop.instr.isLoadSerializing:
+               pendingFenceUops, uopsSinceLastFence = self.pendingLoadFenceUops, self.loadUopsSinceLastLoadFence
+            else:
+               pendingFenceUops, uopsSinceLastFence = self.pendingStoreFenceUops, self.storeUopsSinceLastStoreFence
+            if pendingFenceUops[0] != uop:
+               return None
+            for uop2 in uopsSinceLastFence:
+               if uop2.executed is None:
+                  return None
+               nextCycle = max(nextCycle, uop2.executed)
+      else:
+         if uop.prop.isLoadUop and self.pendingLoadFenceUops and self.pendingLoadFenceUops[0].idx < uop.idx:
+            return None
+         if (uop.prop.isStoreDataUop or uop.prop.isStoreAddressUop) and self.pendingStoreFenceUops and self.pendingStoreFenceUops[0].idx < uop.idx:
+            return None
+
+      if uop.prop.isFirstUopOfInstr:
+         nextCycle = max(nextCycle, clock + self.blockedResources.get(uop.prop.instr.instrStr, 0) + 1)
+
+      if any((renInpOp.getReadyCycle() is None) for renInpOp in uop.renamedInputOperands):
+         return None
+      return nextCycle
+
+   # equivalent to calling cycle() without new uops for the nCycles cycles after clock, provided that getNextEventCycle(clock) > clock + nCycles
+   def skipIdleCycles(self, clock, nCycles):
+      self.divBusy = max(0, self.divBusy - nCycles)
+      portUsage = dict(self.portUsage)
+      for cycle in range(max(clock + 1, clock + nCycles - 1), clock + nCycles + 1):
+         self.portUsageAtStartOfCycle[cycle] = portUsage
+      for r in self.blockedResources.keys():
+         self.blockedResources[r] = max(0, self.blockedResources[r] - nCycles)
+
    # adds ready uops to self.uopsReadyInCycle
    def checkUopReady(self, clock, uop):
       if uop.readyForDispatch is not None:
@@ -1162,9 +1488,9 @@ class Scheduler:
             if len(uop.prop.possiblePorts) == 1:
                port = uop.prop.possiblePorts[0]
             elif self.uArchConfig.simplePortAssignment:
-               port = random.choice(uop.prop.possiblePorts)
+               port = self.random.choice(uop.prop.possiblePorts)
             elif len(allPorts[self.uArchConfig.name]) == 10:
-               applicablePortUsages = [(p,u) for p, u in self.portUsageAtStartOfCycle.get(clock-1, self.portUsageAtStartOfCycle[clock]).items()
+               applicablePortUsages = [(p,u) for p, u in (self.portUsageAtStartOfCycle.get(clock-1) or self.portUsageAtStartOfCycle.get(clock)).items()
                                        if p in uop.prop.possiblePorts]
                sortedPortUsages = sorted(applicablePortUsages, key=lambda x: (x[1], -int(x[0])))
                minPortUsage = sortedPortUsages[0][1]
@@ -1190,7 +1516,7 @@ class Scheduler:
                else:
                   port = sortedPorts[nPC % len(sortedPorts)]
             elif len(allPorts[self.uArchConfig.name]) == 8:
-               applicablePortUsages = [(p,u) for p, u in self.portUsageAtStartOfCycle[clock].items() if p in uop.prop.possiblePorts]
+               applicablePortUsages = [(p,u) for p, u in self.portUsageAtStartOfCycle.get(clock).items() if p in uop.prop.possiblePorts]
                minPort, minPortUsage = min(applicablePortUsages, key=lambda x: (x[1], -int(x[0]))) # port with minimum usage so far
 
                if uop.prop.possiblePorts == ['2', '3']:
@@ -1206,7 +1532,7 @@ class Scheduler:
                   else:
                      port = min2Port
             else:
-               applicablePortUsages = [(p,u) for p, u in self.portUsageAtStartOfCycle[clock].items() if p in uop.prop.possiblePorts]
+               applicablePortUsages = [(p,u) for p, u in self.portUsageAtStartOfCycle.get(clock).items() if p in uop.prop.possiblePorts]
                minPort, minPortUsage = min(applicablePortUsages, key=lambda x: (x[1], int(x[0])))
 
                if uop.prop.possiblePorts == ['2', '3']:
@@ -1242,13 +1568,13 @@ class Scheduler:
 
    # checks if uop depends on a uop for which the finish time has not been determined yet;
    # in this case, it is added to self.dependentUops for this uop;
-   # otherwise, it is added to self.nonReadyUops
+   # otherwise, it is added to self.newNonReadyUops
    def checkDependingUopsExecuted(self, uop):
       for renInpOp in uop.renamedInputOperands:
          if (renInpOp.getReadyCycle() is None) and renInpOp.uop and (renInpOp.uop.executed is None):
             self.dependentUops.setdefault(renInpOp.uop, []).append(uop)
             return
-      self.nonReadyUops.append(uop)
+      self.newNonReadyUops.append((next(self.nonReadyIdxIter), uop))
 
    def getReadyForDispatchCycle(self, clock, uop):
       opReadyCycle = -1
@@ -1266,6 +1592,218 @@ class Scheduler:
       return max(clock + 1, readyCycle)
 
 
+# Computes a signature of the state of the pipeline at the end of a given clock cycle in which the instructions of a given round have been retired.
+# All cycles are stored relative to the clock cycle, and all rounds relative to the given round. Only the parts of the state that can still influence
+# the simulation are included; cycles that lie so far in the past that they are equivalent for the remaining simulation are clamped, and abstract
+# values are renamed in the order in which they are encountered. Thus, if the signatures for two round boundaries are equal, the simulation will
+# behave in the same way after both boundaries.
+class PipelineStateEncoder:
+   def __init__(self, instructions: List[Instr], uArchConfig: MicroArchConfig, unroll):
+      self.uArchConfig = uArchConfig
+      self.unroll = unroll
+      self.instrPos = {instr: i for i, instr in enumerate(instructions)}
+      self.propKey = {} # UopProperties -> key
+      self.pseudoOpKey = {} # PseudoOperand -> key
+      # a dispatched uop that has not yet been executed is waiting for a store buffer entry; dispatch cycles that lie more than maxUopDelay cycles in
+      # the past are then equivalent
+      self.maxUopDelay = 5
+      for instrPos, instr in enumerate(instructions):
+         self.maxUopDelay = max(self.maxUopDelay, instr.TP or 0)
+         for propList, kind in [(instr.UopPropertiesList, 'u'), (instr.regMergeUopPropertiesList, 'm')]:
+            for propIdx, prop in enumerate(propList):
+               self.propKey[prop] = (instrPos, kind, propIdx)
+               self.maxUopDelay = max([self.maxUopDelay] + list(prop.latencies.values()))
+               for opIdx, op in enumerate(prop.outputOperands):
+                  if isinstance(op, PseudoOperand):
+                     self.pseudoOpKey[op] = (instrPos, propIdx, opIdx)
+
+   # A cheap necessary condition for the equality of the signatures; it consists mainly of the occupancy of the different buffers and of the
+   # port assignment of the uops in the scheduler
+   def getFingerprint(self, frontEnd, reorderBuffer, scheduler):
+      return (frontEnd.uopSource, len(frontEnd.IDQ), len(reorderBuffer.uops), len(scheduler.uops), len(scheduler.pendingUops), scheduler.divBusy,
+              tuple(scheduler.portUsage.values()), tuple(len(q) for q in scheduler.readyQueue.values()),
+              tuple(uop.actualPort for uop in scheduler.getNonReadyUops()))
+
+   def getSignature(self, clock, rnd, frontEnd, reorderBuffer, scheduler):
+      self.clock = clock
+      self.rnd = rnd
+      self.uops = {} # uop -> key
+      self.storeBufferEntries = {} # StoreBufferEntry -> canonical ID
+      self.abstractValueBases = {} # base -> (canonical ID, offset of first occurrence)
+
+      # the store buffer and the register state of the renamer are encoded first, so that abstract values are always renamed in the same order
+      renamer = frontEnd.renamer
+      renamerSig = (
+         tuple((k, self.encodeAbstractValue(v)) for k, v in sorted(renamer.abstractValueDict.items())),
+         tuple((k, self.encodeAbstractValue(v)) for k, v in sorted(renamer.curInstrRndAbstractValueDict.items())),
+         tuple((self.encodeStoreBufferKey(k), self.encodeStoreBufferEntry(e))
+               for k, e in sorted(renamer.storeBufferEntryDict.items(), key=lambda x: x[1].uops[0].idx) if not self.isPastStoreBufferEntry(e)),
+         self.encodeStoreBufferEntry(renamer.curStoreBufferEntry),
+         tuple((k, self.encodeRenamedOperand(v)) for k, v in sorted(renamer.renameDict.items(), key=lambda x: str(x[0]))),
+         tuple((k, self.encodeRenamedOperand(v)) for k, v in sorted(renamer.curInstrRndRenameDict.items(), key=lambda x: str(x[0]))),
+         tuple(sorted((self.pseudoOpKey[k], self.encodeRenamedOperand(v)) for k, v in renamer.curInstrPseudoOpDict.items())),
+         tuple(sorted(((self.encodeRenamedOperand(k), tuple(sorted(v))) for k, v in renamer.multiUseGPRDict.items()), key=repr)),
+         tuple(sorted(((self.encodeRenamedOperand(k), tuple(sorted(v))) for k, v in renamer.multiUseSIMDDict.items()), key=repr)),
+         renamer.nGPRMoveElimInCycle.getWindow(renamer.renamerActiveCycle),
+         renamer.nSIMDMoveElimInCycle.getWindow(renamer.renamerActiveCycle),
+         renamer.multiUseGPRDictUseInCycle.getWindow(renamer.renamerActiveCycle),
+         renamer.multiUseSIMDDictUseInCycle.getWindow(renamer.renamerActiveCycle),
+         self.encodeUop(renamer.lastRegMergeIssued) if (renamer.lastRegMergeIssued and renamer.lastRegMergeIssued.fusedUop.issued is None) else None,
+      )
+
+      # the IDQ contains consecutive laminated uops in program order; thus, it is determined by its first and last entry, and its length
+      IDQ = frontEnd.IDQ
+      preDecoder = frontEnd.preDecoder
+      frontEndSig = (
+         frontEnd.uopSource,
+         frontEnd.RSPOffset,
+         self.encodeInstrInstance(frontEnd.allGeneratedInstrInstances[-1]) if frontEnd.allGeneratedInstrInstances else None,
+         (len(IDQ), self.encodeLamUop(IDQ[0]), self.encodeLamUop(IDQ[-1])) if IDQ else None,
+         tuple((self.encodeInstrInstance(instrI), self.encodeCycle(instrI.predecoded)) for instrI in frontEnd.instructionQueue),
+         (frontEnd.MS.stalled, frontEnd.MS.postStall, tuple(self.encodeLamUop(lamUop) for lamUop in frontEnd.MS.uopQueue)),
+         tuple(tuple(self.encodeDSBEntry(entry) for entry in block) for block in frontEnd.DSB.DSBBlockQueue),
+         tuple(tuple(self.encodeInstrInstance(instrI) for instrI in block) for block in preDecoder.B16BlockQueue),
+         tuple(self.encodeInstrInstance(instrI) for instrI in (preDecoder.curBlock or [])),
+         tuple(self.encodeInstrInstance(instrI) for instrI in preDecoder.preDecQueue),
+         self.encodeInstrInstance(preDecoder.partialInstrI) if preDecoder.partialInstrI else None,
+         preDecoder.stalled,
+         preDecoder.nonStalledPredecCyclesForCurBlock,
+      )
+
+      # likewise, for the reorder buffer, it is sufficient to know the positions of the uops that have not yet been executed
+      reorderBufferSig = (len(reorderBuffer.uops), self.encodeLamUop(reorderBuffer.uops[0]) if reorderBuffer.uops else None,
+                          tuple((i, self.encodeUop(uop)) for i, fusedUop in enumerate(reorderBuffer.uops) for uop in fusedUop.getUnfusedUops()
+                                if (uop.executed is None) or (uop.executed > clock)))
+
+      uopsAfterClock = lambda uops: tuple(sorted(self.encodeUop(u) for u in uops if (u.executed is None) or (u.executed > clock)))
+      schedulerSig = (
+         tuple(self.encodeUop(uop) for uop in sorted(scheduler.uops, key=lambda u: u.idx)),
+         tuple(sorted(scheduler.portUsage.items())),
+         tuple(sorted((scheduler.portUsageAtStartOfCycle.get(clock) or {}).items())),
+         scheduler.nextP23Port, scheduler.nextP49Port, scheduler.nextP78Port,
+         tuple(uop.actualPort for uop in scheduler.uopsDispatchedInPrevCycle),
+         scheduler.divBusy,
+         tuple((p, tuple(self.encodeUop(u) for _, u in sorted(q))) for p, q in sorted(scheduler.readyQueue.items())),
+         tuple(self.encodeUop(u) for _, u in sorted(scheduler.readyDivUops)),
+         tuple(sorted((c - clock, tuple(self.encodeUop(u) for u in sorted(uops, key=lambda u: u.idx)))
+                      for c, uops in scheduler.uopsReadyInCycle.items())),
+         tuple(self.encodeUop(uop) for uop in scheduler.getNonReadyUops()),
+         tuple(self.encodeUop(uop) for uop in sorted(scheduler.pendingUops, key=lambda u: u.idx)),
+         tuple(self.encodeUop(uop) for uop in scheduler.pendingStoreFenceUops),
+         tuple(self.encodeUop(uop) for uop in scheduler.pendingLoadFenceUops),
+         uopsAfterClock(scheduler.storeUopsSinceLastStoreFence),
+         uopsAfterClock(scheduler.loadUopsSinceLastLoadFence),
+         tuple(sorted((r, c) for r, c in scheduler.blockedResources.items() if c > 0)),
+         tuple((self.encodeUop(uop), tuple(self.encodeUop(u) for u in depUops))
+               for uop, depUops in sorted(scheduler.dependentUops.items(), key=lambda x: x[0].idx)),
+      )
+
+      # the states of all uops that are referenced above (this might add further uops, e.g., via renamed operands)
+      uopTable = []
+      encodedUops = set()
+      while len(encodedUops) < len(self.uops):
+         for uop in sorted(self.uops.keys() - encodedUops, key=lambda u: u.idx):
+            encodedUops.add(uop)
+            uopTable.append((uop.idx, self.encodeUopState(uop)))
+      uopTable = tuple(s for _, s in sorted(uopTable)) # sorted by idx, so that the relative order of the uops is part of the signature
+
+      return (renamerSig, frontEndSig, reorderBufferSig, schedulerSig, uopTable)
+
+   def encodeCycle(self, cycle):
+      if cycle is None:
+         return None
+      return cycle - self.clock
+
+   # cycles before min(clock+minDelta, cycle) are equivalent for the remaining simulation
+   def encodeClampedCycle(self, cycle, minDelta):
+      if cycle is None:
+         return None
+      return max(minDelta, cycle - self.clock)
+
+   def encodeInstrInstance(self, instrI):
+      address = (instrI.address % 64) if self.unroll else instrI.address
+      return (instrI.rnd - self.rnd, self.instrPos[instrI.instr], address)
+
+   def encodeUop(self, uop):
+      if uop is None:
+         return None
+      key = self.uops.get(uop)
+      if key is None:
+         if isinstance(uop, StackSyncUop):
+            key = (uop.instrI.rnd - self.rnd, self.instrPos[uop.prop.instr], 's')
+         else:
+            key = (uop.instrI.rnd - self.rnd,) + self.propKey[uop.prop]
+         self.uops[uop] = key
+      return key
+
+   def encodeLamUop(self, lamUop):
+      return self.encodeUop(lamUop.getUnfusedUops()[0])
+
+   def encodeDSBEntry(self, entry):
+      if entry is None:
+         return None
+      return (self.encodeInstrInstance(entry.instrI), self.encodeLamUop(entry.uop) if entry.uop else None,
+              tuple(self.encodeLamUop(lamUop) for lamUop in entry.MSUops), entry.requiresExtraEntry)
+
+   def encodeUopState(self, uop: Uop):
+      key = self.uops[uop]
+      if uop.executed is not None:
+         # only relevant for the retirement and for fences
+         return (key, self.encodeClampedCycle(uop.executed, 0))
+      if uop.dispatched is not None:
+         return (key, self.encodeClampedCycle(uop.dispatched, -self.maxUopDelay), self.encodeStoreBufferEntry(uop.storeBufferEntry))
+      if uop.readyForDispatch is not None:
+         # the ready cycle is stored in the scheduler
+         return (key, uop.actualPort)
+      if uop.fusedUop.issued is not None:
+         # the issue cycle is only relevant for determining when the uop becomes ready
+         return (key, uop.actualPort, self.encodeClampedCycle(uop.fusedUop.issued, -self.uArchConfig.issueDispatchDelay - 2),
+                 tuple(self.encodeRenamedOperand(op) for op in uop.renamedInputOperands), self.encodeStoreBufferEntry(uop.storeBufferEntry))
+      return (key,)
+
+   def encodeRenamedOperand(self, renOp: RenamedOperand):
+      readyCycle = renOp.getReadyCycle()
+      if readyCycle is not None:
+         # ready cycles before clock-1 cannot influence uops that are issued or become ready after clock
+         return max(-1, readyCycle - self.clock)
+      return (self.encodeUop(renOp.uop), renOp.uop.renamedOutputOperands.index(renOp))
+
+   def isPastStoreBufferEntry(self, entry: StoreBufferEntry):
+      return all((c is not None) and (c - self.clock < -4) for c in [entry.addressReadyCycle, entry.dataReadyCycle])
+
+   def encodeStoreBufferEntry(self, entry: StoreBufferEntry):
+      if entry is None:
+         return None
+      if entry not in self.storeBufferEntries:
+         self.storeBufferEntries[entry] = (len(self.storeBufferEntries), self.encodeStoreBufferKey(entry.abstractAddress),
+                                           self.encodeClampedCycle(entry.addressReadyCycle, -4), self.encodeClampedCycle(entry.dataReadyCycle, -4))
+      return self.storeBufferEntries[entry]
+
+   def encodeStoreBufferKey(self, key):
+      if key is None:
+         return None
+      base, index, scale, displacement = key
+      return (self.encodeAbstractValue(base), self.encodeAbstractValue(index), scale, displacement)
+
+   def encodeAbstractValue(self, absVal: AbstractValue):
+      if absVal is None:
+         return None
+      if absVal.base not in self.abstractValueBases:
+         self.abstractValueBases[absVal.base] = (len(self.abstractValueBases), absVal.offset)
+      ID, firstOffset = self.abstractValueBases[absVal.base]
+      return (ID, absVal.offset - firstOffset)
+
+
+# Adds the round boundary (rnd, clock) to the list of previous boundaries with the same state, and checks whether the last three boundaries are
+# equally spaced (both w.r.t. the round and the clock cycle), and whether the first boundary is at least minRounds rounds before the current one
+def isPeriodic(roundBoundaries, rnd, clock, minRounds):
+   roundBoundaries.append((rnd, clock))
+   if len(roundBoundaries) < 3:
+      return False
+   (rnd0, clock0), (rnd1, clock1), (rnd2, clock2) = roundBoundaries[-3:]
+   return (rnd2 - rnd1 == rnd1 - rnd0) and (clock2 - clock1 == clock1 - clock0) and (rnd2 - roundBoundaries[0][0] >= minRounds)
+
+
 # must only be called once for a given list of instructions
 def adjustLatenciesAndAddMergeUops(instructions, uArchConfig: MicroArchConfig):
    prevWriteToReg = dict() # reg -> instr
@@ -1471,15 +2009,777 @@ def computeUopProperties(instructions):
       instr.UopPropertiesList[-1].isLastUopOfInstr = True
 
 
-def getXedDisas(filename, rawFile, uArchConfig: MicroArchConfig, iacaMarkers):
+def runXed(filename, rawFile, chipName):
    xedBinary = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'xed')
-   output = subprocess.check_output([xedBinary, '-64', '-v', '4', '-isa-set', '-chip-check', uArchConfig.XEDName,
-                                     ('-ir' if rawFile else '-i'), filename], stderr=subprocess.DEVNULL).decode()
-   if 'ERROR: GENERAL_ERROR Could not decode at offset:' in output:
-      print('\n'.join(l for l in output.splitlines() if 'ERROR: GENERAL_ERROR Could not decode at offset:' in l))
+   return subprocess.check_output([xedBinary, '-64', '-v', '4', '-isa-set', '-chip-check', chipName, ('-ir' if rawFile else '-i'), filename],
+                                  stderr=subprocess.DEVNULL).decode()
+
+
+# Identifies the decoder; cache entries that were created with a different xed binary/library or disas.py are not used
+def getDecoderId():
+   uiCADir = os.path.dirname(os.path.realpath(__file__))
+   return getFileStatsId([os.path.join(uiCADir, name) for name in ['xed', 'disas.py'] + libNames])
+
+# Identifies the simulator and the instruction data; used for caching simulation results
+def getSimulatorId():
+   uiCADir = os.path.dirname(os.path.realpath(__file__))
+   import instrData
+   instrDataFiles = [os.path.join(path, name) for path in instrData.__path__ for name in sorted(os.listdir(path)) if not name.startswith('__')]
+   return getFileStatsId([os.path.join(uiCADir, name) for name in ['uiCA.py', 'microArchConfigs.py', 'x64_lib.py']] + instrDataFiles)
+
+def getFileStatsId(files):
+   fileStats = []
+   for file in files:
+      if os.path.isfile(file):
+         stat = os.stat(file)
+         fileStats.append((file, stat.st_size, stat.st_mtime_ns))
+   return repr(fileStats)
+
+
+# Returns a dict XEDName -> disassembly; the code is decoded only once for each distinct XED chip
+def getXedDisasForArchs(filename, rawFile, uArchConfigs: List[MicroArchConfig], iacaMarkers, cache: Optional[DecodeCache]=None):
+   chipNames = sorted({uArchConfig.XEDName for uArchConfig in uArchConfigs})
+   if iacaMarkers:
+      region = findIACAMarkedRegion(filename, rawFile)
+      if region is not None:
+         code, address = region
+         disasForChip = getXedDisasForCode(code, None, True, chipNames, False, cache)
+         return {chipName: relocateBranchTargets(disas, address) for chipName, disas in disasForChip.items()}
+   with open(filename, 'rb') as f:
+      code = f.read()
+   return getXedDisasForCode(code, filename, rawFile, chipNames, iacaMarkers, cache)
+
+
+# filename: file that contains code; can be None if rawFile is True
+def getXedDisasForCode(code, filename, rawFile, chipNames, iacaMarkers, cache: Optional[DecodeCache]=None):
+   disasForChip = {}
+   cacheKeys = {}
+   if cache is not None:
+      decoderId = getDecoderId()
+      for chipName in chipNames:
+         cacheKeys[chipName] = getKey(code, chipName, str(rawFile), str(iacaMarkers), decoderId)
+         disas = cache.get(cacheKeys[chipName])
+         if disas is not None:
+            disasForChip[chipName] = disas
+   missingChipNames = [chipName for chipName in chipNames if chipName not in disasForChip]
+   if not missingChipNames:
+      return disasForChip
+
+   outputs = None
+   xedLib = getXedLib()
+   if xedLib is not None:
+      outputs = xedLib.getXedOutputForChips(code, rawFile, missingChipNames)
+   if outputs is None:
+      # fall back to the xed binary
+      with futures.ThreadPoolExecutor(len(missingChipNames)) as executor:
+         if filename is not None:
+            outputs = dict(zip(missingChipNames, executor.map(runXed, repeat(filename), repeat(rawFile), missingChipNames)))
+         else:
+            outputs = dict(zip(missingChipNames, executor.map(runXedOnCode, repeat(code), missingChipNames)))
+
+   disasForOutput = {}
+   for chipName in missingChipNames:
+      output = outputs[chipName]
+      if 'ERROR: GENERAL_ERROR Could not decode at offset:' in output:
+         print('\n'.join(l for l in output.splitlines() if 'ERROR: GENERAL_ERROR Could not decode at offset:' in l))
+         exit(1)
+      if output not in disasForOutput:
+         disasForOutput[output] = parseXedOutput(output, iacaMarkers)
+      disasForChip[chipName] = disasForOutput[output]
+      if cache is not None:
+         cache.put(cacheKeys[chipName], disasForChip[chipName])
+   return disasForChip
+
+
+iacaStartMarker = bytes.fromhex('BB6F000000646790') # mov ebx, 111; fs addr32 nop
+iacaEndMarker = bytes.fromhex('BBDE000000646790') # mov ebx, 222; fs addr32 nop
+
+# Finds the code between the first IACA start marker and the following end marker, without disassembling the file. Returns (code, address), or
+# None if there are no such markers in an executable section (in this case, the whole file needs to be disassembled).
+def findIACAMarkedRegion(filename, rawFile):
+   regions = findIACAMarkedRegions(filename, rawFile, maxRegions=1)
+   if not regions:
+      return None
+   code, address, _ = regions[0]
+   return (code, address)
+
+
+# Returns a list of (code, address, file offset) for the regions between IACA start and end markers in the executable sections, or None if the
+# format of the file is not supported
+def findIACAMarkedRegions(filename, rawFile, maxRegions=None):
+   regions = []
+   with open(filename, 'rb') as f:
+      if os.fstat(f.fileno()).st_size == 0:
+         return regions
+      with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+         if rawFile:
+            sections = [(0, 0, len(data))]
+         else:
+            sectionHeaders = getExecutableELFSectionHeaders(data)
+            if sectionHeaders is None:
+               return None
+            sections = [(address, offset, size) for _, address, offset, size in sectionHeaders]
+         for address, offset, size in sections:
+            searchStart = offset
+            while True:
+               start = data.find(iacaStartMarker, searchStart, offset+size)
+               if start < 0:
+                  break
+               codeStart = start + len(iacaStartMarker)
+               end = data.find(iacaEndMarker, codeStart, offset+size)
+               if end < 0:
+                  break
+               regions.append((data[codeStart:end], address + codeStart - offset, codeStart))
+               if len(regions) == maxRegions:
+                  return regions
+               searchStart = end + len(iacaEndMarker)
+   return regions
+
+
+# Adds delta to the targets of relative branches in the asm strings (the targets are absolute addresses)
+def relocateBranchTargets(disas: List[InstrDisas], delta):
+   if delta == 0:
+      return disas
+   relocatedDisas = []
+   for instrD in disas:
+      if 'RELBR' in instrD.iform:
+         target = re.search(r'0x([0-9a-f]+)$', instrD.asm)
+         if target:
+            instrD = instrD._replace(asm=instrD.asm[:target.start()] + hex((int(target.group(1), 16) + delta) % 2**64))
+      relocatedDisas.append(instrD)
+   return relocatedDisas
+
+
+def getXedDisas(filename, rawFile, uArchConfig: MicroArchConfig, iacaMarkers, cache: Optional[DecodeCache]=None):
+   return getXedDisasForArchs(filename, rawFile, [uArchConfig], iacaMarkers, cache)[uArchConfig.XEDName]
+
+
+# Disassembles a list of raw blocks (bytes); the blocks are concatenated, so that they are decoded with only a few decoder passes. Returns a list
+# with the disassembly of each block, or None for blocks that could not be decoded (e.g., if they contain invalid instructions, or if the last
+# instruction crosses the end of the block).
+def getXedDisasBatch(blocks: List[bytes], uArchConfig: MicroArchConfig, cache: Optional[DecodeCache]=None, maxBufferSize=1024*1024):
+   results: List[Optional[List[InstrDisas]]] = [None] * len(blocks)
+   for i, block in enumerate(blocks):
+      if not block:
+         results[i] = []
+
+   cacheKeys = {}
+   if cache is not None:
+      # the same keys as for raw files with the same content
+      decoderId = getDecoderId()
+      for i, block in enumerate(blocks):
+         if block:
+            cacheKeys[i] = getKey(block, uArchConfig.XEDName, str(True), str(False), decoderId)
+            results[i] = cache.get(cacheKeys[i])
+   pending = [i for i, block in enumerate(blocks) if block and (results[i] is None)]
+   decoded = set(pending)
+
+   # If the decoding fails in the first block of a pass, this block cannot be decoded, and the blocks after it are decoded in another pass. If it
+   # fails in a later block, the last instruction of a previous block might have crossed into this block; the blocks before it are then decoded
+   # again in a separate pass (as parseXedOutput expects the output of a successful run), and the blocks starting with it in another pass. As the
+   # decoder stops at the first error, each block is decoded at most three times (unless an instruction crosses several short blocks). If the last
+   # instruction of a block crosses the end of the block, the blocks after it are decoded again. The size of a pass is limited to maxBufferSize
+   # bytes, so that the input is not copied again in full for each error.
+   groups = deque([pending]) if pending else deque()
+   while groups:
+      group = groups.popleft()
+      bufferSize = 0
+      for n, i in enumerate(group):
+         bufferSize += len(blocks[i])
+         if (bufferSize > maxBufferSize) and (n > 0):
+            groups.appendleft(group[n:])
+            group = group[:n]
+            break
+      blockStarts = []
+      buffer = bytearray()
+      for i in group:
+         blockStarts.append(len(buffer))
+         buffer.extend(blocks[i])
+      blockEnds = blockStarts[1:] + [len(buffer)]
+
+      output = decodeRawBuffer(bytes(buffer), uArchConfig.XEDName)
+      errorMatch = re.search(r'Could not decode at offset: 0x([0-9a-fA-F]+)', output)
+      if errorMatch:
+         errorBlock = sum(1 for start in blockStarts if start <= int(errorMatch.group(1), 16)) - 1
+         remainingGroups = [group[1:]] if (errorBlock == 0) else [group[:errorBlock], group[errorBlock:]]
+         for remainingGroup in remainingGroups:
+            if remainingGroup:
+               groups.append(remainingGroup)
+         continue
+
+      disasList = parseXedOutput(output, False)
+      blockIdx = 0
+      blockDisas = []
+      offset = 0
+      for instrD in disasList:
+         if offset == blockEnds[blockIdx]:
+            # branch targets refer to the concatenated buffer
+            results[group[blockIdx]] = relocateBranchTargets(blockDisas, -blockStarts[blockIdx])
+            blockIdx += 1
+            blockDisas = []
+         blockDisas.append(instrD)
+         offset += len(instrD.opcode) // 2
+         if offset > blockEnds[blockIdx]:
+            break
+      if not (offset == blockEnds[blockIdx] == len(buffer)):
+         # the last instruction crosses the end of the block; the blocks after it are decoded again
+         if group[blockIdx+1:]:
+            groups.append(group[blockIdx+1:])
+         continue
+      results[group[blockIdx]] = relocateBranchTargets(blockDisas, -blockStarts[blockIdx])
+
+   if cache is not None:
+      for i in sorted(decoded):
+         if results[i] is not None:
+            cache.put(cacheKeys[i], results[i])
+   return results
+
+
+def decodeRawBuffer(code: bytes, chipName):
+   xedLib = getXedLib()
+   if xedLib is not None:
+      return xedLib.getXedOutput(code, True, chipName)
+   return runXedOnCode(code, chipName)
+
+
+def runXedOnCode(code: bytes, chipName):
+   with tempfile.TemporaryDirectory() as tmpDir:
+      filename = os.path.join(tmpDir, 'code.bin')
+      with open(filename, 'wb') as f:
+         f.write(code)
+      return runXed(filename, True, chipName)
+
+
+# Analyzes all regions between IACA markers; the regions are decoded in one pass, and simulated in parallel. Returns a list with one dict per
+# region.
+def analyzeIACAMarkedRegions(filename, rawFile, uArchConfig: MicroArchConfig, alignmentOffset, initPolicy, noMicroFusion, noMacroFusion,
+                             simpleFrontEnd, executorType=None):
+   regions = findIACAMarkedRegions(filename, rawFile)
+   if regions is None:
+      print('Unsupported file format')
+      exit(1)
+   disasList = getXedDisasBatch([code for code, _, _ in regions], uArchConfig)
+
+   results = []
+   simulatedRegions = []
+   for (code, address, fileOffset), disas in zip(regions, disasList):
+      result = {'fileOffset': fileOffset, 'address': address}
+      if disas is None:
+         result['error'] = 'could not be decoded'
+      elif not disas:
+         result['error'] = 'no instructions found'
+      else:
+         simulatedRegions.append((result, relocateBranchTargets(disas, address)))
+      results.append(result)
+
+   TPList = runSimulations([disas for _, disas in simulatedRegions], uArchConfig, repeat(alignmentOffset), initPolicy, noMicroFusion, noMacroFusion,
+                           simpleFrontEnd, executorType)
+   for (result, _), TP in zip(simulatedRegions, TPList):
+      result['throughput'] = TP
+   return results
+
+
+# Analyzes the innermost loops of the functions of an ELF file (i.e., loops formed by conditional branches to preceding instructions of the same
+# function that do not contain other such loops). The functions are decoded in one pass, and the loops are simulated in parallel, with the
+# alignment offsets of their actual addresses. Returns a list with one dict per loop.
+def analyzeLoops(filename, uArchConfig: MicroArchConfig, initPolicy, noMicroFusion, noMacroFusion, simpleFrontEnd, executorType=None):
+   loops = getLoops(filename, uArchConfig)
+   results = [result for result, _ in loops]
+   TPList = runSimulations([disas for _, disas in loops], uArchConfig, [result['address'] % 64 for result in results], initPolicy, noMicroFusion,
+                           noMacroFusion, simpleFrontEnd, executorType)
+   for result, TP in zip(results, TPList):
+      result['throughput'] = TP
+   return results
+
+
+# Returns a list of (dict with the location of the loop, disassembly) for the innermost loops of the functions of an ELF file
+def getLoops(filename, uArchConfig: MicroArchConfig, cache: Optional[DecodeCache]=None):
+   with open(filename, 'rb') as f:
+      data = f.read()
+   functions = getELFFunctions(data)
+   if functions is None:
+      print('Unsupported file format')
       exit(1)
+   disasList = getXedDisasBatch([code for _, _, code in functions], uArchConfig, cache)
 
-   return parseXedOutput(output, iacaMarkers)
+   loops = []
+   for (name, address, _), disas in zip(functions, disasList):
+      if disas is None:
+         continue
+      instrOffsets = [0] + list(accumulate(len(instrD.opcode) // 2 for instrD in disas))
+      for start, end in findInnermostLoops(disas, instrOffsets):
+         loopAddress = address + instrOffsets[start]
+         loops.append(({'function': name, 'offset': instrOffsets[start], 'address': loopAddress},
+                       relocateBranchTargets(disas[start:end+1], address)))
+   return loops
+
+
+# Compares the innermost loops of two versions of an ELF file. A loop of the new version is matched with the loop of the old version that has the
+# same position among the loops of the function with the same name; loops without such a counterpart are matched with a loop of the old version
+# with the same bytes, if there is one. Loops with the same bytes and alignment offset are simulated only once, and the throughputs are looked up
+# in (and added to) the result cache. Returns a list with one dict per loop.
+def analyzeLoopDiff(oldFilename, newFilename, uArchConfig: MicroArchConfig, initPolicy, noMicroFusion, noMacroFusion, simpleFrontEnd,
+                    decodeCache: Optional[DecodeCache]=None, resultCache: Optional[FileCache]=None, executorType=None):
+   oldLoops = getLoops(oldFilename, uArchConfig, decodeCache)
+   newLoops = getLoops(newFilename, uArchConfig, decodeCache)
+
+   def getLoopKeys(loops):
+      nLoopsInFunction = Counter()
+      nameKeys = []
+      for result, _ in loops:
+         nameKeys.append((result['function'], nLoopsInFunction[result['function']]))
+         nLoopsInFunction[result['function']] += 1
+      return nameKeys
+
+   oldIdxForNameKey = {key: i for i, key in enumerate(getLoopKeys(oldLoops))}
+   oldIdxForBytes = {}
+   for i, (_, disas) in enumerate(oldLoops):
+      oldIdxForBytes.setdefault(''.join(instrD.opcode for instrD in disas), i)
+
+   matchedOldIdx = []
+   for nameKey, (_, disas) in zip(getLoopKeys(newLoops), newLoops):
+      oldIdx = oldIdxForNameKey.get(nameKey)
+      if oldIdx is None:
+         oldIdx = oldIdxForBytes.get(''.join(instrD.opcode for instrD in disas))
+      matchedOldIdx.append(oldIdx)
+
+   # throughputs are only needed for the loops of the old version that have a counterpart
+   usedOldIdx = sorted({i for i in matchedOldIdx if i is not None})
+   simIdxForKey = {}
+   simDisasList = []
+   simAlignmentOffsets = []
+   def getSimIdx(result, disas):
+      key = (''.join(instrD.opcode for instrD in disas), result['address'] % 64)
+      if key not in simIdxForKey:
+         simIdxForKey[key] = len(simDisasList)
+         simDisasList.append(disas)
+         simAlignmentOffsets.append(result['address'] % 64)
+      return simIdxForKey[key]
+   oldSimIdx = {i: getSimIdx(*oldLoops[i]) for i in usedOldIdx}
+   newSimIdx = [getSimIdx(result, disas) for result, disas in newLoops]
+
+   TPList = runCachedSimulations(simDisasList, uArchConfig, simAlignmentOffsets, initPolicy, noMicroFusion, noMacroFusion, simpleFrontEnd,
+                                 resultCache, executorType)
+
+   results = []
+   for (result, _), oldIdx, simIdx in zip(newLoops, matchedOldIdx, newSimIdx):
+      result = dict(result, throughput=TPList[simIdx])
+      if oldIdx is not None:
+         oldResult = oldLoops[oldIdx][0]
+         result.update(oldFunction=oldResult['function'], oldOffset=oldResult['offset'], oldAddress=oldResult['address'],
+                       oldThroughput=TPList[oldSimIdx[oldIdx]])
+         result['changed'] = (oldSimIdx[oldIdx] != simIdx)
+      results.append(result)
+   for i in sorted(set(range(len(oldLoops))) - set(usedOldIdx)):
+      oldResult = oldLoops[i][0]
+      results.append({'oldFunction': oldResult['function'], 'oldOffset': oldResult['offset'], 'oldAddress': oldResult['address']})
+   return results
+
+
+# Reads a profile with one sample per line, in the format "<address> [<count>]", where the address is in hex (e.g., the output of
+# "perf script -F ip"); lines that do not have this format are ignored. Returns a Counter address -> number of hits.
+def readProfile(filename):
+   hits = Counter()
+   with open(filename) as f:
+      for line in f:
+         fields = line.split()
+         try:
+            hits[int(fields[0], 16)] += (int(fields[1]) if len(fields) > 1 else 1)
+         except (IndexError, ValueError):
+            continue
+   return hits
+
+
+# Estimates the number of cycles that the code of an ELF file needs for a profile. The basic blocks that contain the sampled addresses are weighted
+# by their number of hits, and the topK blocks with the highest weight are simulated in parallel. Assuming that the hits are proportional to the
+# number of times the instructions were executed, the number of cycles of a block is estimated as its throughput times its number of hits divided
+# by its number of instructions. Returns a dict with the total estimate, and one entry per simulated block.
+def analyzeProfile(filename, profileFilename, uArchConfig: MicroArchConfig, topK, initPolicy, noMicroFusion, noMacroFusion, simpleFrontEnd,
+                   cache: Optional[FileCache]=None, executorType=None):
+   hits = readProfile(profileFilename)
+   with open(filename, 'rb') as f:
+      data = f.read()
+   functions = getELFFunctions(data)
+   if functions is None:
+      print('Unsupported file format')
+      exit(1)
+   functions.sort(key=lambda f: f[1])
+   functionStarts = [address for _, address, _ in functions]
+
+   hitsForFunction = {} # function index -> list of (offset, hits)
+   for address, nHits in hits.items():
+      funcIdx = bisect_right(functionStarts, address) - 1
+      if (funcIdx >= 0) and (address < functionStarts[funcIdx] + len(functions[funcIdx][2])):
+         hitsForFunction.setdefault(funcIdx, []).append((address - functionStarts[funcIdx], nHits))
+
+   hotFunctions = sorted(hitsForFunction)
+   disasList = getXedDisasBatch([functions[funcIdx][2] for funcIdx in hotFunctions], uArchConfig)
+
+   blocks = [] # (weight, function index, offset of first instruction, disassembly)
+   for funcIdx, disas in zip(hotFunctions, disasList):
+      if disas is None:
+         continue
+      instrOffsets = [0] + list(accumulate(len(instrD.opcode) // 2 for instrD in disas))
+      basicBlocks = getBasicBlocks(disas, instrOffsets)
+      blockStarts = [instrOffsets[start] for start, _ in basicBlocks]
+      weights = [0] * len(basicBlocks)
+      for offset, nHits in hitsForFunction[funcIdx]:
+         weights[bisect_right(blockStarts, offset) - 1] += nHits
+      for (start, end), weight in zip(basicBlocks, weights):
+         if weight > 0:
+            blocks.append((weight, funcIdx, instrOffsets[start], relocateBranchTargets(disas[start:end+1], functionStarts[funcIdx])))
+   blocks.sort(key=lambda b: (-b[0], b[1], b[2]))
+   blocks = blocks[:topK]
+
+   results = []
+   simDisasList = []
+   for weight, funcIdx, offset, disas in blocks:
+      address = functionStarts[funcIdx] + offset
+      nInstructions = len(disas) # the hits include the hits of a branch that is not simulated
+      if not (isLoopBranch(disas[-1], address)) and isBranch(disas[-1]):
+         disas = disas[:-1] # the block is simulated in unrolled mode
+      if not disas:
+         continue
+      results.append({'function': functions[funcIdx][0], 'offset': offset, 'address': address, 'hits': weight, 'instructions': nInstructions,
+                      'loop': isBranch(disas[-1])})
+      simDisasList.append(disas)
+
+   TPList = runCachedSimulations(simDisasList, uArchConfig, [result['address'] % 64 for result in results], initPolicy, noMicroFusion,
+                                 noMacroFusion, simpleFrontEnd, cache, executorType)
+   for result, TP in zip(results, TPList):
+      result['throughput'] = TP
+      result['cycles'] = TP * result['hits'] / result['instructions']
+   results.sort(key=lambda r: -r['cycles'])
+
+   totalHits = sum(hits.values())
+   return {'cycles': sum(r['cycles'] for r in results), 'totalHits': totalHits, 'coveredHits': sum(r['hits'] for r in results), 'blocks': results}
+
+
+def isBranch(instrD: InstrDisas):
+   return instrD.iform.startswith(('J', 'LOOP', 'RET', 'CALL'))
+
+# Returns True if instrD is a conditional branch to address
+def isLoopBranch(instrD: InstrDisas, address):
+   if not ('RELBR' in instrD.iform and ((instrD.iform.startswith('J') and not instrD.iform.startswith('JMP')) or instrD.iform.startswith('LOOP'))):
+      return False
+   target = re.search(r'0x([0-9a-f]+)$', instrD.asm)
+   return (target is not None) and (int(target.group(1), 16) == address)
+
+# Returns a list of (index of first instruction, index of last instruction) for the basic blocks; the branch targets need to be relative to the
+# same base as instrOffsets
+def getBasicBlocks(disas: List[InstrDisas], instrOffsets):
+   instrIdxForOffset = {offset: i for i, offset in enumerate(instrOffsets)}
+   leaders = {0}
+   for i, instrD in enumerate(disas):
+      if isBranch(instrD):
+         leaders.add(i+1)
+         target = re.search(r'0x([0-9a-f]+)$', instrD.asm)
+         if ('RELBR' in instrD.iform) and target and (int(target.group(1), 16) in instrIdxForOffset):
+            leaders.add(instrIdxForOffset[int(target.group(1), 16)])
+   leaders = sorted(l for l in leaders if l < len(disas))
+   return list(zip(leaders, [l-1 for l in leaders[1:]] + [len(disas)-1]))
+
+
+# Like runSimulations, but the throughputs are looked up in (and added to) cache, if it is not None
+def runCachedSimulations(disasList, uArchConfig: MicroArchConfig, alignmentOffsets, initPolicy, noMicroFusion, noMacroFusion, simpleFrontEnd,
+                         cache: Optional[FileCache]=None, executorType=None):
+   alignmentOffsets = list(alignmentOffsets)
+   TPList = [None] * len(disasList)
+   cacheKeys = []
+   if cache is not None:
+      simulatorId = getSimulatorId()
+      for i, (disas, alignmentOffset) in enumerate(zip(disasList, alignmentOffsets)):
+         # the asm strings are not part of the key (except for the information that is used by getInstructions), so that the entries can be reused
+         # for code at different addresses
+         disasKey = repr([tuple(d)[1:] + ('{k0}' in d.asm,) for d in disas])
+         cacheKeys.append(getKey(disasKey, uArchConfig.name, str(alignmentOffset), initPolicy, str(noMicroFusion),
+                                 str(noMacroFusion), str(simpleFrontEnd), simulatorId))
+         TPList[i] = cache.get(cacheKeys[i])
+   missing = [i for i, TP in enumerate(TPList) if TP is None]
+   missingTPList = runSimulations([disasList[i] for i in missing], uArchConfig, [alignmentOffsets[i] for i in missing], initPolicy, noMicroFusion,
+                                  noMacroFusion, simpleFrontEnd, executorType)
+   for i, TP in zip(missing, missingTPList):
+      TPList[i] = TP
+      if cache is not None:
+         cache.put(cacheKeys[i], TP)
+   return TPList
+
+
+# Returns a list of (index of first instruction, index of branch instruction) for the innermost loops; instrOffsets contains the offsets of the
+# instructions, and the branch targets need to be relative to the same base.
+def findInnermostLoops(disas: List[InstrDisas], instrOffsets):
+   instrIdxForOffset = {offset: i for i, offset in enumerate(instrOffsets)}
+   loops = []
+   for i, instrD in enumerate(disas):
+      if not ('RELBR' in instrD.iform and ((instrD.iform.startswith('J') and not instrD.iform.startswith('JMP')) or instrD.iform.startswith('LOOP'))):
+         continue
+      target = re.search(r'0x([0-9a-f]+)$', instrD.asm)
+      if target:
+         targetIdx = instrIdxForOffset.get(int(target.group(1), 16))
+         if (targetIdx is not None) and (targetIdx <= i):
+            loops.append((targetIdx, i))
+   return [(s, e) for s, e in loops if not any((s <= s2) and (e2 <= e) and ((s2, e2) != (s, e)) for s2, e2 in loops)]
+
+
+# Like runSimulation, but without printing anything; used for the simulations that are run in parallel
+def getThroughput(disas: List[InstrDisas], uArchConfig: MicroArchConfig, alignmentOffset, initPolicy, noMicroFusion, noMacroFusion, simpleFrontEnd):
+   instructions = getInstructions(disas, uArchConfig, getArchData(uArchConfig), alignmentOffset, noMicroFusion, noMacroFusion)
+   if not instructions:
+      raise AnalysisError('No instructions found')
+   return simulate(instructions, uArchConfig, alignmentOffset, initPolicy, simpleFrontEnd).TP
+
+
+# Returns True if the interpreter does not use a global interpreter lock (free-threaded builds of CPython 3.13 and later)
+def isFreeThreaded():
+   isGILEnabled = getattr(sys, '_is_gil_enabled', None)
+   return (isGILEnabled is not None) and (not isGILEnabled())
+
+
+# Returns an executor for running simulations in parallel. executorType can be 'process', 'thread', or None; for None, a thread pool is used on
+# free-threaded interpreters, and a process pool otherwise. With a thread pool, the initializer is called only once, as all threads share the
+# instruction data.
+def getExecutor(executorType=None, maxWorkers=None, initializer=None, initargs=()):
+   if executorType is None:
+      executorType = 'thread' if isFreeThreaded() else 'process'
+   if executorType == 'thread':
+      if initializer is not None:
+         initializer(*initargs)
+      return futures.ThreadPoolExecutor(maxWorkers or os.cpu_count() or 1)
+   elif executorType == 'process':
+      return futures.ProcessPoolExecutor(maxWorkers, initializer=initializer, initargs=initargs)
+   raise ValueError('Unsupported executor type: {}'.format(executorType))
+
+
+# Simulates the code in disasList in parallel (see getExecutor), and returns the list of throughputs; the instruction data is loaded only once per
+# worker process
+def runSimulations(disasList, uArchConfig: MicroArchConfig, alignmentOffsets, initPolicy, noMicroFusion, noMacroFusion, simpleFrontEnd,
+                   executorType=None):
+   if not disasList:
+      return []
+   chunksize = max(1, len(disasList) // (4 * (os.cpu_count() or 1)))
+   with getExecutor(executorType, initializer=getArchData, initargs=(uArchConfig,)) as executor:
+      return list(executor.map(getThroughput, disasList, repeat(uArchConfig), alignmentOffsets, repeat(initPolicy), repeat(noMicroFusion),
+                               repeat(noMacroFusion), repeat(simpleFrontEnd), chunksize=chunksize))
+
+
+# Reads a corpus of basic blocks: path can be a directory with one file per block, a CSV file in the format of the BHive benchmark suite (with the
+# code in hex in the first column; lines that do not start with hex code are ignored), or '-' for a CSV file that is read from stdin. Files can be
+# gzip-compressed. Yields (name, code); the name is the filename for directories, and the line number for CSV files.
+def readCorpus(path):
+   if os.path.isdir(path):
+      for entry in sorted(os.scandir(path), key=lambda e: e.name):
+         if entry.is_file():
+            with open(entry.path, 'rb') as f:
+               code = f.read()
+            if code[:2] == b'\x1f\x8b':
+               code = gzip.decompress(code)
+            yield (entry.name, code)
+      return
+
+   if path == '-':
+      f = sys.stdin.buffer
+   else:
+      f = open(path, 'rb')
+   try:
+      if f.peek(2)[:2] == b'\x1f\x8b':
+         f = gzip.GzipFile(fileobj=f)
+      for lineNr, line in enumerate(f, 1):
+         hexCode = line.split(b',', 1)[0].strip()
+         try:
+            code = bytes.fromhex(hexCode.decode())
+         except ValueError:
+            continue
+         if code:
+            yield (str(lineNr), code)
+   finally:
+      if path != '-':
+         f.close()
+
+
+def initCorpusWorker(uArchConfigs: List[MicroArchConfig]):
+   for uArchConfig in uArchConfigs:
+      getArchData(uArchConfig)
+
+# Returns a dict with the throughput, the bottlenecks (if computeBottlenecks is True), and the time for the simulation
+def simulateCorpusBlock(disas, uArchConfig: MicroArchConfig, alignmentOffset, initPolicy, noMicroFusion, noMacroFusion, simpleFrontEnd,
+                        computeBottlenecks):
+   startTime = time.perf_counter()
+   instructions = getInstructions(disas, uArchConfig, getArchData(uArchConfig), alignmentOffset, noMicroFusion, noMacroFusion)
+   if not instructions:
+      raise AnalysisError('No instructions found')
+   sim = simulate(instructions, uArchConfig, alignmentOffset, initPolicy, simpleFrontEnd, detailedOutput=computeBottlenecks)
+   bottlenecks = sim.getBottlenecks() if computeBottlenecks else None
+   result = {'throughput': sim.TP, 'time': round(time.perf_counter() - startTime, 6)}
+   if computeBottlenecks:
+      result['bottlenecks'] = bottlenecks
+   return result
+
+
+# Analyzes a corpus of basic blocks (an iterable of (name, code)) for the given microarchitectures. The blocks are decoded in batches of chunkSize
+# blocks, and simulated on a process pool; blocks with the same code are only simulated once. Yields one dict per block with the results for each
+# microarchitecture, either in the input order, or as soon as they are available. At most maxPending blocks are in progress at the same time, so
+# the memory usage does not depend on the size of the corpus (except for the identifiers and results of the recently seen blocks that are kept
+# for detecting duplicates, which are limited to maxDedup entries).
+def analyzeCorpus(blocks, uArchConfigs: List[MicroArchConfig], alignmentOffset=0, initPolicy='diff', noMicroFusion=False, noMacroFusion=False,
+                  simpleFrontEnd=False, computeBottlenecks=False, inOrder=True, maxWorkers=None, chunkSize=256, maxPending=4096, maxDedup=1000000,
+                  executorType=None):
+   blockIter = iter(blocks)
+   # entries: [index, name, {arch: future or result}, {arch: key in resultForCode}, number of futures that are not done (only in unordered mode)]
+   nPending = 0
+   pending = deque() # in-order mode: entries in the input order
+   readyEntries = deque() # unordered mode: entries for which all futures are done
+   entriesForFuture = {} # unordered mode: future -> entries that wait for it
+   doneFutures = SimpleQueue() # unordered mode: futures that are done, but for which the entries have not been updated yet
+   resultForCode = OrderedDict() # (sha256 of code, arch) -> future, which is replaced by its result once it has been retrieved
+   with getExecutor(executorType, maxWorkers, initializer=initCorpusWorker, initargs=(uArchConfigs,)) as executor:
+      def submitChunk(chunk, startIdx):
+         nonlocal nPending
+         uArchConfigForChip = {uArchConfig.XEDName: uArchConfig for uArchConfig in uArchConfigs}
+         disasForChip = {chipName: getXedDisasBatch([code for _, code in chunk], uArchConfig) for chipName, uArchConfig in uArchConfigForChip.items()}
+         for i, (name, code) in enumerate(chunk):
+            codeHash = hashlib.sha256(code).digest()
+            results = {}
+            keys = {}
+            for uArchConfig in uArchConfigs:
+               disas = disasForChip[uArchConfig.XEDName][i]
+               if disas is None:
+                  results[uArchConfig.name] = {'error': 'could not be decoded'}
+                  continue
+               if not disas:
+                  results[uArchConfig.name] = {'error': 'no instructions found'}
+                  continue
+               key = (codeHash, uArchConfig.name)
+               result = resultForCode.get(key)
+               if result is None:
+                  result = executor.submit(simulateCorpusBlock, disas, uArchConfig, alignmentOffset, initPolicy, noMicroFusion, noMacroFusion,
+                                           simpleFrontEnd, computeBottlenecks)
+                  resultForCode[key] = result
+                  if len(resultForCode) > maxDedup:
+                     resultForCode.popitem(last=False)
+               else:
+                  resultForCode.move_to_end(key)
+               results[uArchConfig.name] = result
+               keys[uArchConfig.name] = key
+            entry = [startIdx + i, name, results, keys, 0]
+            nPending += 1
+            if inOrder:
+               pending.append(entry)
+               continue
+            # a future can be shared by several entries (and by several microarchitectures of one entry)
+            entryFutures = {r for r in results.values() if isinstance(r, futures.Future)}
+            entry[4] = len(entryFutures)
+            for future in entryFutures:
+               if future not in entriesForFuture:
+                  entriesForFuture[future] = []
+                  future.add_done_callback(doneFutures.put)
+               entriesForFuture[future].append(entry)
+            if not entryFutures:
+               readyEntries.append(entry)
+
+      def isDone(entry):
+         return all((not isinstance(r, futures.Future)) or r.done() for r in entry[2].values())
+
+      def getRecord(entry):
+         nonlocal nPending
+         nPending -= 1
+         idx, name, results, keys, _ = entry
+         record = {'index': idx, 'name': name}
+         for arch, r in results.items():
+            if isinstance(r, futures.Future):
+               future = r
+               try:
+                  r = future.result()
+               except Exception as e:
+                  r = {'error': repr(e)}
+               if resultForCode.get(keys[arch]) is future:
+                  resultForCode[keys[arch]] = r # the future is no longer needed for duplicates
+            record[arch] = r
+         return record
+
+      nextIdx = 0
+      exhausted = False
+      while nPending or not exhausted:
+         # backpressure: new blocks are only read if not too many blocks are in progress
+         while (not exhausted) and (nPending < maxPending):
+            chunk = list(islice(blockIter, chunkSize))
+            if not chunk:
+               exhausted = True
+               break
+            submitChunk(chunk, nextIdx)
+            nextIdx += len(chunk)
+         if not nPending:
+            continue
+
+         if inOrder:
+            if not isDone(pending[0]):
+               futures.wait([r for r in pending[0][2].values() if isinstance(r, futures.Future)])
+            while pending and isDone(pending[0]):
+               yield getRecord(pending.popleft())
+         else:
+            # each future is only taken from the queue once (when it is done), so that the entries are not checked repeatedly
+            while not readyEntries:
+               for entry in entriesForFuture.pop(doneFutures.get()):
+                  entry[4] -= 1
+                  if not entry[4]:
+                     readyEntries.append(entry)
+            while readyEntries:
+               yield getRecord(readyEntries.popleft())
+
+
+archDataCache = {}
+instrDataFileCache = {}
+archDataLock = threading.Lock() # the data is only loaded once if several threads need it at the same time
+
+# Returns the instruction data for the microarchitecture. The binary file with the data for all microarchitectures (instrData/allArchs.bin) is used
+# if it is available, as it is memory-mapped and only the entries that are actually needed are decoded; otherwise, the data is imported from
+# instrData/<ARCH>.py.
+def getArchData(uArchConfig: MicroArchConfig):
+   archData = archDataCache.get(uArchConfig.name)
+   if archData is not None:
+      return archData
+   with archDataLock:
+      archData = archDataCache.get(uArchConfig.name)
+      if archData is not None:
+         return archData
+      import instrData
+      for path in instrData.__path__:
+         binFile = os.path.join(path, 'allArchs.bin')
+         if os.path.isfile(binFile):
+            instrDataFile = instrDataFileCache.get(binFile)
+            if instrDataFile is None:
+               instrDataFile = InstrDataFile(binFile)
+               instrDataFileCache[binFile] = instrDataFile
+            if uArchConfig.name in instrDataFile.getArchs():
+               archData = instrDataFile.getArchData(uArchConfig.name)
+               break
+      else:
+         archData = importlib.import_module('instrData.'+uArchConfig.name)
+      archDataCache[uArchConfig.name] = archData
+   return archData
+
+
+attrKeysCache = {} # (arch, iform) -> (entries of archData.instrData for iform, attributes that are relevant for these entries)
+instrDataCache = {} # (arch, iform, values of the relevant attributes) -> matching entry of archData.instrData (or None)
+
+# Returns the first entry of archData.instrData for the iform of instrD whose attributes match the attributes of instrD, or None if there is no such
+# entry. As the result only depends on the values of the attributes that occur in the entries for the iform (see computeAttrKeys), the entries are
+# only searched once for each combination of these values that actually occurs. The relevant attributes are generated by convertXML.py; for
+# instruction data without them, they are computed here.
+def getInstrData(instrD: InstrDisas, uArchConfig: MicroArchConfig, archData):
+   instrDataList, attrKeys = attrKeysCache.get((uArchConfig.name, instrD.iform), (None, None))
+   if instrDataList is None:
+      instrDataList = archData.instrData.get(instrD.iform, [])
+      if hasattr(archData, 'attrKeys'):
+         attrKeys = archData.attrKeys.get(instrD.iform)
+      if attrKeys is None:
+         attrKeys = computeAttrKeys(instrDataList, archData.attrData)
+      attrKeysCache[(uArchConfig.name, instrD.iform)] = (instrDataList, attrKeys)
+
+   key = (uArchConfig.name, instrD.iform, tuple(instrD.attributes.get(k) for k in attrKeys))
+   if key not in instrDataCache:
+      instrDataCache[key] = next((instrData for instrData in instrDataList if matchAttributes(instrD.attributes, archData.attrData[instrData['attr']])),
+                                 None)
+   return instrDataCache[key]
 
 
 def getInstructions(disas: List[InstrDisas], uArchConfig: MicroArchConfig, archData, alignmentOffset, noMicroFusion=False, noMacroFusion=False):
@@ -1511,179 +2811,179 @@ def getInstructions(disas: List[InstrDisas], uArchConfig: MicroArchConfig, archD
       isStoreSerializing = (instrD.iform in ['MFENCE', 'SFENCE'])
 
       instruction = None
-      for instrData in archData.instrData.get(instrD.iform, []):
-         if matchAttributes(instrD.attributes, archData.attrData[instrData['attr']]):
-            perfData = archData.perfData[instrData['perfData']]
-            uops = perfData.get('uops', 0)
-            retireSlots = perfData.get('retSlots', 1)
-            uopsMITE = perfData.get('uopsMITE', 1)
-            uopsMS = perfData.get('uopsMS', 0)
-            latData = perfData.get('lat', dict())
-            portData = perfData.get('ports', {})
-            divCycles = perfData.get('divC', 0)
-            complexDecoder = perfData.get('complDec', False)
-            nAvailableSimpleDecoders = perfData.get('sDec', uArchConfig.nDecoders)
-            hasLockPrefix = ('locked' in instrData)
-            TP = perfData.get('TP')
-            if sameReg:
-               uops = perfData.get('uops_SR', uops)
-               retireSlots = perfData.get('retSlots_SR', retireSlots)
-               uopsMITE = perfData.get('uopsMITE_SR', uopsMITE)
-               uopsMS = perfData.get('uopsMS_SR', uopsMS)
-               latData = perfData.get('lat_SR', latData)
-               portData = perfData.get('ports_SR', portData)
-               divCycles = perfData.get('divC_SR',divCycles)
-               complexDecoder = perfData.get('complDec_SR', complexDecoder)
-               nAvailableSimpleDecoders = perfData.get('sDec_SR', nAvailableSimpleDecoders)
-               TP = perfData.get('TP_SR', TP)
-            if usesIndexedAddr:
-               uops = perfData.get('uops_I', uops)
-               retireSlots = perfData.get('retSlots_I', retireSlots)
-               uopsMITE = perfData.get('uopsMITE_I', uopsMITE)
-               uopsMS = perfData.get('uopsMS_I', uopsMS)
-               portData = perfData.get('ports_I', portData)
-               divCycles = perfData.get('divC_I',divCycles)
-               complexDecoder = perfData.get('complDec_I', complexDecoder)
-               nAvailableSimpleDecoders = perfData.get('sDec_I', nAvailableSimpleDecoders)
-               TP = perfData.get('TP_I', TP)
-
-            instrInputRegOperands = [(n,r) for n, r in instrD.regOperands.items() if (not 'IP' in r)
-                                        and (not 'STACK' in r)
-                                        and (not 'RFLAGS' in r)
-                                        and ((r != 'K0') or ('{k0}' in instrD.asm)) # otherwise, K0 indicates unmasked operations
-                                        and (('R' in instrD.rw[n]) or any(n==k[0] for k in latData.keys()))]
-            instrInputMemOperands = [(n,m) for n, m in instrD.memOperands.items() if ('R' in instrD.rw[n]) or ('CW' in instrD.rw[n])]
-
-            instrOutputRegOperands = [(n, r) for n, r in instrD.regOperands.items() if (not 'IP' in r) and (not 'STACK' in r) and (not 'RFLAGS' in r)
-                                                                                          and ('W' in instrD.rw[n])]
-            instrOutputMemOperands = [(n, m) for n, m in instrD.memOperands.items() if 'W' in instrD.rw[n]]
-
-            instrFlagOperands = [n for n, r in instrD.regOperands.items() if r == 'RFLAGS']
-            instrFlagOperand = instrFlagOperands[0] if instrFlagOperands else None
-
-            movzxSpecialCase = ((not uArchConfig.movzxHigh8AliasCanBeEliminated) and (instrData['string'] in ['MOVZX (R64, R8l)', 'MOVZX (R32, R8l)'])
-                                   and (instrInputRegOperands[0][1] in ['SPL', 'BPL', 'SIL', 'DIL', 'R12B', 'R13B', 'R14B', 'R15B']))
-            mayBeEliminated = (('MOV' in instrData['string']) and (not movzxSpecialCase) and (not uops) and (len(instrInputRegOperands) == 1)
-                                                                                                        and (len(instrOutputRegOperands) == 1))
-            if mayBeEliminated or movzxSpecialCase:
-               uops = perfData.get('uops_SR', uops)
-               portData = perfData.get('ports_SR', portData)
-               latData = perfData.get('lat_SR', latData)
-
-            inputRegOperands = []
-            inputFlagOperands = []
-            inputMemOperands = []
-            outputRegOperands = []
-            outputFlagOperands = []
-            outputMemOperands = []
-            memAddrOperands = []
-            agenOperands = []
-
-            outputOperandsDict = dict()
-            for n, r in instrOutputRegOperands:
-               regOp = RegOperand(r)
-               outputRegOperands.append(regOp)
-               outputOperandsDict[n] = [regOp]
-            if instrFlagOperand is not None:
-               flagsW = instrData.get('flagsW', '')
-               if 'C' in flagsW:
-                  flagOp = FlagOperand('C')
-                  outputFlagOperands.append(flagOp)
-               if any((flag in flagsW) for flag in 'SPAZO'):
-                  flagOp = FlagOperand('SPAZO')
-                  outputFlagOperands.append(flagOp)
-               if outputFlagOperands:
-                  outputOperandsDict[instrFlagOperand] = outputFlagOperands
-            for n, m in instrOutputMemOperands:
-               memOp = MemOperand(getMemAddr(m))
-               outputMemOperands.append(memOp)
-               outputOperandsDict[n] = [memOp]
-
-            latencies = dict()
-            for inpN, inpR in instrInputRegOperands:
-               if (not mayBeEliminated) and all(latData.get((inpN, o), 1) == 0 for o in outputOperandsDict.keys()): # e.g., zero idioms
-                  continue
-               regOp = RegOperand(inpR)
-               inputRegOperands.append(regOp)
+      instrData = getInstrData(instrD, uArchConfig, archData)
+      if instrData is not None:
+         perfData = archData.perfData[instrData['perfData']]
+         uops = perfData.get('uops', 0)
+         retireSlots = perfData.get('retSlots', 1)
+         uopsMITE = perfData.get('uopsMITE', 1)
+         uopsMS = perfData.get('uopsMS', 0)
+         latData = perfData.get('lat', dict())
+         portData = perfData.get('ports', {})
+         divCycles = perfData.get('divC', 0)
+         complexDecoder = perfData.get('complDec', False)
+         nAvailableSimpleDecoders = perfData.get('sDec', uArchConfig.nDecoders)
+         hasLockPrefix = ('locked' in instrData)
+         TP = perfData.get('TP')
+         if sameReg:
+            uops = perfData.get('uops_SR', uops)
+            retireSlots = perfData.get('retSlots_SR', retireSlots)
+            uopsMITE = perfData.get('uopsMITE_SR', uopsMITE)
+            uopsMS = perfData.get('uopsMS_SR', uopsMS)
+            latData = perfData.get('lat_SR', latData)
+            portData = perfData.get('ports_SR', portData)
+            divCycles = perfData.get('divC_SR',divCycles)
+            complexDecoder = perfData.get('complDec_SR', complexDecoder)
+            nAvailableSimpleDecoders = perfData.get('sDec_SR', nAvailableSimpleDecoders)
+            TP = perfData.get('TP_SR', TP)
+         if usesIndexedAddr:
+            uops = perfData.get('uops_I', uops)
+            retireSlots = perfData.get('retSlots_I', retireSlots)
+            uopsMITE = perfData.get('uopsMITE_I', uopsMITE)
+            uopsMS = perfData.get('uopsMS_I', uopsMS)
+            portData = perfData.get('ports_I', portData)
+            divCycles = perfData.get('divC_I',divCycles)
+            complexDecoder = perfData.get('complDec_I', complexDecoder)
+            nAvailableSimpleDecoders = perfData.get('sDec_I', nAvailableSimpleDecoders)
+            TP = perfData.get('TP_I', TP)
+
+         instrInputRegOperands = [(n,r) for n, r in instrD.regOperands.items() if (not 'IP' in r)
+                                     and (not 'STACK' in r)
+                                     and (not 'RFLAGS' in r)
+                                     and ((r != 'K0') or ('{k0}' in instrD.asm)) # otherwise, K0 indicates unmasked operations
+                                     and (('R' in instrD.rw[n]) or any(n==k[0] for k in latData.keys()))]
+         instrInputMemOperands = [(n,m) for n, m in instrD.memOperands.items() if ('R' in instrD.rw[n]) or ('CW' in instrD.rw[n])]
+
+         instrOutputRegOperands = [(n, r) for n, r in instrD.regOperands.items() if (not 'IP' in r) and (not 'STACK' in r) and (not 'RFLAGS' in r)
+                                                                                       and ('W' in instrD.rw[n])]
+         instrOutputMemOperands = [(n, m) for n, m in instrD.memOperands.items() if 'W' in instrD.rw[n]]
+
+         instrFlagOperands = [n for n, r in instrD.regOperands.items() if r == 'RFLAGS']
+         instrFlagOperand = instrFlagOperands[0] if instrFlagOperands else None
+
+         movzxSpecialCase = ((not uArchConfig.movzxHigh8AliasCanBeEliminated) and (instrData['string'] in ['MOVZX (R64, R8l)', 'MOVZX (R32, R8l)'])
+                                and (instrInputRegOperands[0][1] in ['SPL', 'BPL', 'SIL', 'DIL', 'R12B', 'R13B', 'R14B', 'R15B']))
+         mayBeEliminated = (('MOV' in instrData['string']) and (not movzxSpecialCase) and (not uops) and (len(instrInputRegOperands) == 1)
+                                                                                                     and (len(instrOutputRegOperands) == 1))
+         if mayBeEliminated or movzxSpecialCase:
+            uops = perfData.get('uops_SR', uops)
+            portData = perfData.get('ports_SR', portData)
+            latData = perfData.get('lat_SR', latData)
+
+         inputRegOperands = []
+         inputFlagOperands = []
+         inputMemOperands = []
+         outputRegOperands = []
+         outputFlagOperands = []
+         outputMemOperands = []
+         memAddrOperands = []
+         agenOperands = []
+
+         outputOperandsDict = dict()
+         for n, r in instrOutputRegOperands:
+            regOp = RegOperand(r)
+            outputRegOperands.append(regOp)
+            outputOperandsDict[n] = [regOp]
+         if instrFlagOperand is not None:
+            flagsW = instrData.get('flagsW', '')
+            if 'C' in flagsW:
+               flagOp = FlagOperand('C')
+               outputFlagOperands.append(flagOp)
+            if any((flag in flagsW) for flag in 'SPAZO'):
+               flagOp = FlagOperand('SPAZO')
+               outputFlagOperands.append(flagOp)
+            if outputFlagOperands:
+               outputOperandsDict[instrFlagOperand] = outputFlagOperands
+         for n, m in instrOutputMemOperands:
+            memOp = MemOperand(getMemAddr(m))
+            outputMemOperands.append(memOp)
+            outputOperandsDict[n] = [memOp]
+
+         latencies = dict()
+         for inpN, inpR in instrInputRegOperands:
+            if (not mayBeEliminated) and all(latData.get((inpN, o), 1) == 0 for o in outputOperandsDict.keys()): # e.g., zero idioms
+               continue
+            regOp = RegOperand(inpR)
+            inputRegOperands.append(regOp)
+            for outN, outOps in outputOperandsDict.items():
+               for outOp in outOps:
+                  latencies[(regOp, outOp)] = latData.get((inpN, outN), 1)
+
+         if instrFlagOperand is not None:
+            flagsR = instrData.get('flagsR', '')
+            if 'C' in flagsR:
+               flagOp = FlagOperand('C')
+               inputFlagOperands.append(flagOp)
+            if any((flag in flagsR) for flag in 'SPAZO'):
+               flagOp = FlagOperand('SPAZO')
+               inputFlagOperands.append(flagOp)
+            for flagOp in inputFlagOperands:
+               for outN, outOps in outputOperandsDict.items():
+                  for outOp in outOps:
+                     latencies[(flagOp, outOp)] = latData.get((instrFlagOperand, outN), 1)
+
+         for inpN, inpM in instrInputMemOperands:
+            memOp = MemOperand(getMemAddr(inpM))
+            if 'AGEN' in inpN:
+               agenOperands.append(memOp)
+            else:
+               inputMemOperands.append(memOp)
                for outN, outOps in outputOperandsDict.items():
                   for outOp in outOps:
-                     latencies[(regOp, outOp)] = latData.get((inpN, outN), 1)
-
-            if instrFlagOperand is not None:
-               flagsR = instrData.get('flagsR', '')
-               if 'C' in flagsR:
-                  flagOp = FlagOperand('C')
-                  inputFlagOperands.append(flagOp)
-               if any((flag in flagsR) for flag in 'SPAZO'):
-                  flagOp = FlagOperand('SPAZO')
-                  inputFlagOperands.append(flagOp)
-               for flagOp in inputFlagOperands:
-                  for outN, outOps in outputOperandsDict.items():
-                     for outOp in outOps:
-                        latencies[(flagOp, outOp)] = latData.get((instrFlagOperand, outN), 1)
-
-            for inpN, inpM in instrInputMemOperands:
-               memOp = MemOperand(getMemAddr(inpM))
+                     latencies[(memOp, outOp)] = latData.get((inpN, outN, 'mem'), 1)
+
+         allMemOperands = set(instrInputMemOperands + instrOutputMemOperands)
+         for inpN, inpM in allMemOperands:
+            memAddr = getMemAddr(inpM)
+            for reg, addrType in [(memAddr.base, 'addr'), (memAddr.index, 'addrI')]:
+               if (reg is None) or ('IP' in reg): continue
+               regOp = RegOperand(reg)
+               if (reg == 'RSP') and implicitRSPChange and (len(allMemOperands) == 1 or inpN == 'MEM1'):
+                  regOp.isImplicitStackOperand = True
                if 'AGEN' in inpN:
-                  agenOperands.append(memOp)
+                  inputRegOperands.append(regOp)
                else:
-                  inputMemOperands.append(memOp)
-                  for outN, outOps in outputOperandsDict.items():
-                     for outOp in outOps:
-                        latencies[(memOp, outOp)] = latData.get((inpN, outN, 'mem'), 1)
-
-            allMemOperands = set(instrInputMemOperands + instrOutputMemOperands)
-            for inpN, inpM in allMemOperands:
-               memAddr = getMemAddr(inpM)
-               for reg, addrType in [(memAddr.base, 'addr'), (memAddr.index, 'addrI')]:
-                  if (reg is None) or ('IP' in reg): continue
-                  regOp = RegOperand(reg)
-                  if (reg == 'RSP') and implicitRSPChange and (len(allMemOperands) == 1 or inpN == 'MEM1'):
-                     regOp.isImplicitStackOperand = True
-                  if 'AGEN' in inpN:
-                     inputRegOperands.append(regOp)
-                  else:
-                     memAddrOperands.append(regOp)
-                  for outN, outOps in outputOperandsDict.items():
-                     for outOp in outOps:
-                        latencies[(regOp, outOp)] = latData.get((inpN, outN, addrType), 1)
-
-            if (not complexDecoder) and (uopsMS or (uopsMITE + uopsMS > 1)):
+                  memAddrOperands.append(regOp)
+               for outN, outOps in outputOperandsDict.items():
+                  for outOp in outOps:
+                     latencies[(regOp, outOp)] = latData.get((inpN, outN, addrType), 1)
+
+         if (not complexDecoder) and (uopsMS or (uopsMITE + uopsMS > 1)):
+            complexDecoder = True
+
+         if instrData['string'] in ['POP (R16)', 'POP (R64)'] and instrD.opcode.endswith('5C'):
+            complexDecoder |= uArchConfig.pop5CRequiresComplexDecoder
+            if uArchConfig.pop5CEndsDecodeGroup:
+               nAvailableSimpleDecoders = 0
+
+         if zmmRegistersInUse and any(('MM' in reg) for reg in instrD.regOperands.values()):
+            # if an instruction uses zmm registers, port 1 is not available for other vector instructions
+            portData = dict(portData) # portData belongs to the shared instruction data
+            for p, u in list(portData.items()):
+               if ('1' in p) and (p != '1'):
+                  del portData[p]
+                  newP = p.replace('1', '')
+                  portData[newP] = portData.get(newP, 0) + u
+
+         if noMicroFusion:
+            retireSlots = max(uops, uopsMITE + uopsMS)
+            uopsMITE = retireSlots - uopsMS
+            if uopsMITE > 4:
+               uopsMS += uopsMITE - 4
+               uopsMITE = 4
+            if uopsMITE > 1:
                complexDecoder = True
+               nAvailableSimpleDecoders = min([5-uopsMITE, nAvailableSimpleDecoders, 0 if uopsMS else 3])
 
-            if instrData['string'] in ['POP (R16)', 'POP (R64)'] and instrD.opcode.endswith('5C'):
-               complexDecoder |= uArchConfig.pop5CRequiresComplexDecoder
-               if uArchConfig.pop5CEndsDecodeGroup:
-                  nAvailableSimpleDecoders = 0
-
-            if zmmRegistersInUse and any(('MM' in reg) for reg in instrD.regOperands.values()):
-               # if an instruction uses zmm registers, port 1 is not available for other vector instructions
-               for p, u in list(portData.items()):
-                  if ('1' in p) and (p != '1'):
-                     del portData[p]
-                     newP = p.replace('1', '')
-                     portData[newP] = portData.get(newP, 0) + u
-
-            if noMicroFusion:
-               retireSlots = max(uops, uopsMITE + uopsMS)
-               uopsMITE = retireSlots - uopsMS
-               if uopsMITE > 4:
-                  uopsMS += uopsMITE - 4
-                  uopsMITE = 4
-               if uopsMITE > 1:
-                  complexDecoder = True
-                  nAvailableSimpleDecoders = min([5-uopsMITE, nAvailableSimpleDecoders, 0 if uopsMS else 3])
-
-            macroFusibleWith = instrData.get('macroFusible', set())
-            if noMacroFusion:
-               macroFusibleWith = set()
-
-            instruction = Instr(instrD.asm, instrD.opcode, posNominalOpcode, instrData['string'], portData, uops, retireSlots, uopsMITE, uopsMS, divCycles,
-                                inputRegOperands, inputFlagOperands, inputMemOperands, outputRegOperands, outputFlagOperands, outputMemOperands,
-                                memAddrOperands, agenOperands, latencies, TP, immediate, lcpStall, implicitRSPChange, mayBeEliminated, complexDecoder,
-                                nAvailableSimpleDecoders, hasLockPrefix, isBranchInstr, isSerializingInstr, isLoadSerializing, isStoreSerializing,
-                                macroFusibleWith)
-            break
+         macroFusibleWith = instrData.get('macroFusible', set())
+         if noMacroFusion:
+            macroFusibleWith = set()
+
+         instruction = Instr(instrD.asm, instrD.opcode, posNominalOpcode, instrData['string'], portData, uops, retireSlots, uopsMITE, uopsMS, divCycles,
+                             inputRegOperands, inputFlagOperands, inputMemOperands, outputRegOperands, outputFlagOperands, outputMemOperands,
+                             memAddrOperands, agenOperands, latencies, TP, immediate, lcpStall, implicitRSPChange, mayBeEliminated, complexDecoder,
+                             nAvailableSimpleDecoders, hasLockPrefix, isBranchInstr, isSerializingInstr, isLoadSerializing, isStoreSerializing,
+                             macroFusibleWith)
 
       if instruction is None:
          instruction = UnknownInstr(instrD.asm, instrD.opcode, posNominalOpcode)
@@ -1724,10 +3024,11 @@ def getInstructions(disas: List[InstrDisas], uArchConfig: MicroArchConfig, archD
 
 
 class InstrInstance:
-   def __init__(self, instr, address, rnd):
+   def __init__(self, instr, address, rnd, uopIdxIter):
       self.instr = instr
       self.address = address
       self.rnd = rnd
+      self.uopIdxIter = uopIdxIter # shared by all instruction instances of a simulation
       self.uops: List[LaminatedUop] = self.__generateUops()
       self.regMergeUops: List[LaminatedUop] = []
       self.stackSyncUops: List[LaminatedUop] = []
@@ -1780,12 +3081,12 @@ def instrInstanceCrosses16ByteBoundary(instrI):
    return (instrI.address % 16) + instrLen > 16
 
 # returns list of instrInstances corresponding to the next 64-Byte cache block
-def CacheBlockGenerator(instructions, unroll, alignmentOffset):
+def CacheBlockGenerator(instructions, unroll, alignmentOffset, uopIdxIter):
    cacheBlock = []
    nextAddr = alignmentOffset
    for rnd in count():
       for instr in instructions:
-         cacheBlock.append(InstrInstance(instr, nextAddr, rnd))
+         cacheBlock.append(InstrInstance(instr, nextAddr, rnd, uopIdxIter))
 
          if (not unroll) and instr == instructions[-1]:
             yield cacheBlock
@@ -1801,10 +3102,10 @@ def CacheBlockGenerator(instructions, unroll, alignmentOffset):
 
 
 # returns cache blocks for one round (without unrolling)
-def CacheBlocksForNextRoundGenerator(instructions, alignmentOffset):
+def CacheBlocksForNextRoundGenerator(instructions, alignmentOffset, uopIdxIter):
    cacheBlocks = []
    prevRnd = 0
-   for cacheBlock in CacheBlockGenerator(instructions, False, alignmentOffset):
+   for cacheBlock in CacheBlockGenerator(instructions, False, alignmentOffset, uopIdxIter):
       curRnd = cacheBlock[-1].rnd
       if prevRnd != curRnd:
          yield cacheBlocks
@@ -2011,8 +3312,6 @@ def writeHtmlFile(filename, title, head, body, includeDOCTYPE=True):
 
 
 def generateHTMLTraceTable(filename, instructions, instrInstances, lastRelevantRound, maxCycle):
-   import json
-
    tableDataForRnd = []
    prevRnd = -1
    prevInstrI = None
@@ -2254,7 +3553,6 @@ def generateJSONOutput(filename, instructions: List[Instr], frontEnd: FrontEnd,
                if (uop.executed is not None) and (uop.executed <= maxCycle):
                   cycles[uop.executed].setdefault('executed', []).append(unfusedUopDict)
 
-   import json
    jsonStr = json.dumps({'parameters': parameters, 'instructions': instrList, 'cycles': cycles}, sort_keys=True)
 
    with open(filename, 'w') as f:
@@ -2268,14 +3566,64 @@ def getURL(instrStr):
    return 'https://www.uops.info/html-instr/' + canonicalizeInstrString(instrStr) + '.html'
 
 
-# Returns the throughput
-def runSimulation(disas: List[InstrDisas], uArchConfig: MicroArchConfig, alignmentOffset, initPolicy, noMicroFusion, noMacroFusion, simpleFrontEnd,
-                  printDetails=False, traceFile=None, graphFile=None, jsonFile=None):
-   instructions = getInstructions(disas, uArchConfig, importlib.import_module('instrData.'+uArchConfig.name), alignmentOffset, noMicroFusion, noMacroFusion)
-   if not instructions:
-      print('no instructions found')
-      exit(1)
+# Result of a simulation; the instruction instances are only available if the simulation was run with detailedOutput
+class Simulation:
+   def __init__(self, instructions: List[Instr], uArchConfig: MicroArchConfig, frontEnd: FrontEnd, perfEvents: Dict[int, Dict[str, int]], TP,
+                firstRelevantRound, lastRelevantRound, clock):
+      self.instructions = instructions
+      self.uArchConfig = uArchConfig
+      self.frontEnd = frontEnd
+      self.perfEvents = perfEvents
+      self.TP = TP
+      self.firstRelevantRound = firstRelevantRound
+      self.lastRelevantRound = lastRelevantRound
+      self.clock = clock
+
+   def getRelevantInstrInstances(self):
+      return [instrI for instrI in self.frontEnd.allGeneratedInstrInstances if self.firstRelevantRound <= instrI.rnd <= self.lastRelevantRound]
+
+   def getBottlenecks(self):
+      return sorted(getBottlenecks(self.TP, self.perfEvents, self.getRelevantInstrInstances(), self.uArchConfig,
+                                   self.lastRelevantRound - self.firstRelevantRound + 1))
 
+   def getTableLineData(self):
+      relevantInstrInstancesForInstr = {instr: [] for instr in self.instructions}
+      for instrI in self.getRelevantInstrInstances():
+         relevantInstrInstancesForInstr[instrI.instr].append(instrI)
+
+      tableLineData = []
+      for instr in self.instructions:
+         instrInstances = relevantInstrInstancesForInstr[instr]
+         if any(instrI.regMergeUops for instrI in instrInstances):
+            uops = [instrI.regMergeUops for instrI in instrInstances]
+            tableLineData.append(TableLineData('<Register Merge Uop>', None, None, uops))
+         if any(instrI.stackSyncUops for instrI in instrInstances):
+            uops = [instrI.stackSyncUops for instrI in instrInstances]
+            tableLineData.append(TableLineData('<Stack Sync Uop>', None, None, uops))
+
+         uops = [instrI.uops for instrI in instrInstances]
+         url = None
+         if not isinstance(instr, UnknownInstr):
+            url = getURL(instr.instrStr)
+         tableLineData.append(TableLineData(instr.asm, instr, url, uops))
+      return tableLineData
+
+   def writeHTMLTrace(self, filename):
+      #ToDo: use TableLineData instead
+      generateHTMLTraceTable(filename, self.instructions, self.frontEnd.allGeneratedInstrInstances, self.lastRelevantRound, self.clock-1)
+
+   def writeHTMLGraph(self, filename):
+      generateHTMLGraph(filename, self.instructions, self.frontEnd.allGeneratedInstrInstances, self.uArchConfig, self.clock-1)
+
+   def writeJSON(self, filename):
+      generateJSONOutput(filename, self.instructions, self.frontEnd, self.uArchConfig, self.clock-1)
+
+
+# Simulates the instructions (which must not be empty) until the throughput can be determined; the simulation does not use any global state, and
+# does not generate any output. If detailedOutput is False, only the throughput is computed. isCancelled (if not None) is called in every
+# simulated cycle; if it returns True, the simulation is stopped with a SimulationCancelledError.
+def simulate(instructions: List[Instr], uArchConfig: MicroArchConfig, alignmentOffset, initPolicy, simpleFrontEnd, detailedOutput=False,
+             isCancelled=None):
    computeUopProperties(instructions)
    adjustLatenciesAndAddMergeUops(instructions, uArchConfig)
 
@@ -2285,88 +3633,226 @@ def runSimulation(disas: List[InstrDisas], uArchConfig: MicroArchConfig, alignme
 
    perfEvents: Dict[int, Dict[str, int]] = {}
    unroll = (not instructions[-1].isBranchInstr)
-   frontEnd = FrontEnd(instructions, rb, scheduler, uArchConfig, unroll, alignmentOffset, initPolicy, perfEvents, simpleFrontEnd)
+   frontEnd = FrontEnd(instructions, rb, scheduler, uArchConfig, unroll, alignmentOffset, initPolicy, perfEvents, simpleFrontEnd,
+                       TPOnly=(not detailedOutput))
+
+   lastApplicableInstr = [instr for instr in instructions if not instr.macroFusedWithPrevInstr][-1] # ignore macro-fused instr.
+
+   # The simulation is stopped as soon as the state of the pipeline at the end of a round has been observed to repeat twice with the same period.
+   # If detailed outputs are requested, the simulation continues until the periodic part contains enough rounds to average over. To limit the
+   # overhead for loops that take long to become periodic, the signature is only computed for every samplingInterval-th round, where the
+   # interval grows over time; a period then shows up as a multiple of the sampling interval.
+   # In practice, this only shortens the simulation of loops whose throughput is limited by the front end, by fences or other serializing
+   # instructions, or by the divider. For most other loops, in particular for loops with instructions that can use several ports, the port
+   # assignment does not become periodic within the first 500 cycles (even though the number of uops waiting for each port is bounded), and the
+   # simulation runs as long as without this check.
+   stateEncoder = None
+   if not uArchConfig.simplePortAssignment: # otherwise, the simulation depends on the state of the random number generator
+      stateEncoder = PipelineStateEncoder(instructions, uArchConfig, unroll)
+   minPeriodicRounds = 10 if detailedOutput else 1
+   roundBoundariesForFingerprint = {} # fingerprint -> list of (round, clock) for the round boundaries with this fingerprint
+   roundBoundariesForSignature = {} # signature -> list of (round, clock) for the round boundaries with this signature
+   samplingInterval = 1
+   periodicRounds = None
+
+   # The outputs other than the throughput need the instruction instances and uops of the relevant rounds, which are only known at the end of the
+   # simulation; the trace, the graph, and the JSON output even need all rounds. Otherwise, the instruction instances and uops of rounds that have
+   # been retired are released, and for each round, only the retire cycle and the retire index of the last uop of the last instruction are kept.
+   retainRetiredRounds = detailedOutput
+   lastRetiredForRound = [] # (retired, retireIdx) of the last fused-domain uop of lastApplicableInstr
 
    clock = 0
    rnd = 0
-   uopsForRound = []
    while True:
+      if (isCancelled is not None) and isCancelled():
+         raise SimulationCancelledError()
       frontEnd.cycle(clock)
+      completedRnd = None
       while retireQueue:
          fusedUop = retireQueue.popleft()
-         for uop in fusedUop.getUnfusedUops():
-            instr = uop.prop.instr
-            rnd = uop.instrI.rnd
-            if rnd >= len(uopsForRound):
-               uopsForRound.append({instr: [] for instr in instructions})
-            uopsForRound[rnd][instr].append(fusedUop)
-            break
+         unfusedUops = fusedUop.getUnfusedUops()
+         instr = unfusedUops[0].prop.instr
+         rnd = unfusedUops[0].instrI.rnd
+         if rnd >= len(lastRetiredForRound):
+            lastRetiredForRound.append(None)
+         if instr == lastApplicableInstr:
+            lastRetiredForRound[rnd] = (fusedUop.retired, fusedUop.retireIdx)
+            if unfusedUops[-1].prop.isLastUopOfInstr and (rnd % samplingInterval == 0):
+               if rnd >= 32 * samplingInterval:
+                  samplingInterval *= 2
+               if completedRnd is None:
+                  completedRnd = rnd
+         if not retainRetiredRounds:
+            # the input operands of retired uops are no longer accessed; removing them breaks the chain of references to the uops of
+            # earlier rounds
+            for uop in unfusedUops:
+               uop.renamedInputOperands = []
+            allGeneratedInstrInstances = frontEnd.allGeneratedInstrInstances
+            while allGeneratedInstrInstances and (allGeneratedInstrInstances[0].rnd < rnd):
+               allGeneratedInstrInstances.popleft()
+      if (completedRnd is not None) and (stateEncoder is not None):
+         # the (more expensive) signature is only computed if the fingerprint has already been observed to be periodic
+         fingerprint = stateEncoder.getFingerprint(frontEnd, rb, scheduler)
+         if isPeriodic(roundBoundariesForFingerprint.setdefault(fingerprint, []), completedRnd, clock, 1):
+            signature = stateEncoder.getSignature(clock, completedRnd, frontEnd, rb, scheduler)
+            roundBoundaries = roundBoundariesForSignature.setdefault(signature, [])
+            if isPeriodic(roundBoundaries, completedRnd, clock, minPeriodicRounds):
+               periodicRounds = (roundBoundaries[0][0], completedRnd)
+               break
       if rnd >= 10 and clock > 500:
          break
-      clock += 1
 
-   lastApplicableInstr = [instr for instr in instructions if not instr.macroFusedWithPrevInstr][-1] # ignore macro-fused instr.
-   firstRelevantRound = len(uopsForRound) // 2
-   lastRelevantRound = len(uopsForRound) - 2 # last round may be incomplete, thus -2
-   if lastRelevantRound - firstRelevantRound > 10:
-      for rnd in range(lastRelevantRound, lastRelevantRound - 5, -1):
-         if uopsForRound[firstRelevantRound][lastApplicableInstr][-1].retireIdx == uopsForRound[rnd][lastApplicableInstr][-1].retireIdx:
-            lastRelevantRound = rnd
-            break
+      # cycles in which no component can change its state (except for counters) are skipped; the cycle in which the simulation would be stopped
+      # above is not skipped
+      nextClock = frontEnd.getNextEventCycle(clock)
+      if nextClock is None:
+         nextClock = clock + 1
+      if clock <= 500:
+         nextClock = min(nextClock, 501)
+      if nextClock > clock + 1:
+         frontEnd.skipIdleCycles(clock, nextClock - clock - 1)
+      clock = nextClock
+
+   if periodicRounds is not None:
+      firstRelevantRound, lastRelevantRound = periodicRounds
+   else:
+      firstRelevantRound = len(lastRetiredForRound) // 2
+      lastRelevantRound = len(lastRetiredForRound) - 2 # last round may be incomplete, thus -2
+      if lastRelevantRound - firstRelevantRound > 10:
+         for rnd in range(lastRelevantRound, lastRelevantRound - 5, -1):
+            if lastRetiredForRound[firstRelevantRound][1] == lastRetiredForRound[rnd][1]:
+               lastRelevantRound = rnd
+               break
 
-   uopsForRelRound = uopsForRound[firstRelevantRound:(lastRelevantRound+1)]
+   TP = round((lastRetiredForRound[lastRelevantRound][0] - lastRetiredForRound[firstRelevantRound][0]) / (lastRelevantRound - firstRelevantRound), 2)
+   #print('number of iterations: n={:.2f}'.format(lastRelevantRound - firstRelevantRound))
+   #print('cycle which last instruction of last iteration retired: t={:.2f}'.format(lastRetiredForRound[lastRelevantRound][0]))
+   #print('cycle which last instruction of n/2 iteration retired: t\'={:.2f}'.format(lastRetiredForRound[firstRelevantRound][0]))
+   return Simulation(instructions, uArchConfig, frontEnd, perfEvents, TP, firstRelevantRound, lastRelevantRound, clock)
 
-   TP = round((uopsForRelRound[-1][lastApplicableInstr][-1].retired - uopsForRelRound[0][lastApplicableInstr][-1].retired) / (len(uopsForRelRound)-1), 2)
-   #print('number of iterations: n={:.2f}'.format((len(uopsForRelRound)-1)))
-   #print('cycle which last instruction of last iteration retired: t={:.2f}'.format(uopsForRelRound[-1][lastApplicableInstr][-1].retired))
-   #print('cycle which last instruction of n/2 iteration retired: t\'={:.2f}'.format(uopsForRelRound[0][lastApplicableInstr][-1].retired))
+
+# Returns the throughput
+# If bottlenecks is not None, the bottlenecks are appended to this list.
+def runSimulation(disas: List[InstrDisas], uArchConfig: MicroArchConfig, alignmentOffset, initPolicy, noMicroFusion, noMacroFusion, simpleFrontEnd,
+                  printDetails=False, traceFile=None, graphFile=None, jsonFile=None, bottlenecks: Optional[List[str]]=None):
+   instructions = getInstructions(disas, uArchConfig, getArchData(uArchConfig), alignmentOffset, noMicroFusion, noMacroFusion)
+   if not instructions:
+      print('no instructions found')
+      exit(1)
+
+   # if only the throughput is needed, information that is only used by the detailed outputs is not recorded
+   detailedOutput = printDetails or traceFile or graphFile or jsonFile or (bottlenecks is not None)
+   sim = simulate(instructions, uArchConfig, alignmentOffset, initPolicy, simpleFrontEnd, detailedOutput)
+   TP = sim.TP
    print()
+   if bottlenecks is not None:
+      bottlenecks.extend(sim.getBottlenecks())
+
    if printDetails:
       print('printDetails: Throughput (in cycles per iteration): {:.2f}'.format(TP))
 
-      relevantInstrInstances = []
-      relevantInstrInstancesForInstr = {instr: [] for instr in instructions}
-      for instrI in frontEnd.allGeneratedInstrInstances:
-         if firstRelevantRound <= instrI.rnd <= lastRelevantRound:
-            relevantInstrInstances.append(instrI)
-            relevantInstrInstancesForInstr[instrI.instr].append(instrI)
-
-      tableLineData = []
-      for instr in instructions:
-         instrInstances = relevantInstrInstancesForInstr[instr]
-         if any(instrI.regMergeUops for instrI in instrInstances):
-            uops = [instrI.regMergeUops for instrI in instrInstances]
-            tableLineData.append(TableLineData('<Register Merge Uop>', None, None, uops))
-         if any(instrI.stackSyncUops for instrI in instrInstances):
-            uops = [instrI.stackSyncUops for instrI in instrInstances]
-            tableLineData.append(TableLineData('<Stack Sync Uop>', None, None, uops))
-
-         uops = [instrI.uops for instrI in instrInstances]
-         url = None
-         if not isinstance(instr, UnknownInstr):
-            url = getURL(instr.instrStr)
-         tableLineData.append(TableLineData(instr.asm, instr, url, uops))
+      tableLineData = sim.getTableLineData()
 
-      bottlenecks = getBottlenecks(TP, perfEvents, relevantInstrInstances, uArchConfig, lastRelevantRound - firstRelevantRound + 1)
+      bottlenecks = sim.getBottlenecks()
       if bottlenecks:
-         print('Bottleneck' + ('s' if len(bottlenecks) > 1 else '') + ': ' + ', '.join(sorted(bottlenecks)))
+         print('Bottleneck' + ('s' if len(bottlenecks) > 1 else '') + ': ' + ', '.join(bottlenecks))
 
       print('')
       printUopsTable(tableLineData, uArchConfig)
 
    if traceFile is not None:
-      #ToDo: use TableLineData instead
-      generateHTMLTraceTable(traceFile, instructions, frontEnd.allGeneratedInstrInstances, lastRelevantRound, clock-1)
+      sim.writeHTMLTrace(traceFile)
 
    if graphFile is not None:
-      generateHTMLGraph(graphFile, instructions, frontEnd.allGeneratedInstrInstances, uArchConfig, clock-1)
+      sim.writeHTMLGraph(graphFile)
 
    if jsonFile is not None:
-      generateJSONOutput(jsonFile, instructions, frontEnd, uArchConfig, clock-1)
+      sim.writeJSON(jsonFile)
 
    return TP
 
 
+class AnalysisError(Exception):
+   pass
+
+class SimulationCancelledError(Exception):
+   pass
+
+
+class AnalysisOptions(NamedTuple):
+   alignmentOffset: int = 0
+   initPolicy: str = 'diff'
+   noMicroFusion: bool = False
+   noMacroFusion: bool = False
+   simpleFrontEnd: bool = False
+   details: bool = True # if False, only the throughput is computed
+   keepSimulation: bool = False # if True, the result contains the simulation, which can be used for generating the trace, graph, and JSON outputs
+
+
+class AnalysisResult(NamedTuple):
+   throughput: float
+   bottlenecks: List[str]
+   table: List[Dict[str, object]] # one dict per line of the uops table, with the instruction (or uop) string, its URL, and the table columns
+   simulation: Optional[Simulation]
+
+
+# Returns the MicroArchConfig for arch (the name of a microarchitecture, or a MicroArchConfig); raises a ValueError for invalid parameters
+def checkAnalysisParameters(arch, options: AnalysisOptions) -> MicroArchConfig:
+   if isinstance(arch, MicroArchConfig):
+      uArchConfig = arch
+   elif arch in MicroArchConfigs:
+      uArchConfig = MicroArchConfigs[arch]
+   else:
+      raise ValueError('Unsupported microarchitecture: {}'.format(arch))
+   if not options.initPolicy in ['diff', 'same', 'stack']:
+      raise ValueError('Unsupported -initPolicy: {}'.format(options.initPolicy))
+   return uArchConfig
+
+
+# Library interface: analyzes the machine code for arch (the name of a microarchitecture, or a MicroArchConfig). In contrast to runSimulation, it
+# does not print anything, and raises an exception instead of exiting; as each call uses its own state, it can be called from several threads.
+def analyze(code: bytes, arch, options: Optional[AnalysisOptions]=None) -> AnalysisResult:
+   if options is None:
+      options = AnalysisOptions()
+   uArchConfig = checkAnalysisParameters(arch, options)
+   return analyzeDisas(decodeCode(code, uArchConfig), uArchConfig, options)
+
+
+# Decodes the code; raises an AnalysisError instead of exiting if this is not possible
+def decodeCode(code: bytes, uArchConfig: MicroArchConfig) -> List[InstrDisas]:
+   try:
+      disas = getXedDisasBatch([bytes(code)], uArchConfig)[0]
+   except (OSError, subprocess.CalledProcessError) as e:
+      raise AnalysisError('Decoding failed: {}'.format(e)) from e
+   if disas is None:
+      raise AnalysisError('The code could not be decoded')
+   return disas
+
+
+# Like analyze, but for code that has already been decoded; isCancelled is passed to simulate
+def analyzeDisas(disas: List[InstrDisas], uArchConfig: MicroArchConfig, options: AnalysisOptions, isCancelled=None) -> AnalysisResult:
+   instructions = getInstructions(disas, uArchConfig, getArchData(uArchConfig), options.alignmentOffset, options.noMicroFusion,
+                                  options.noMacroFusion)
+   if not instructions:
+      raise AnalysisError('No instructions found')
+
+   sim = simulate(instructions, uArchConfig, options.alignmentOffset, options.initPolicy, options.simpleFrontEnd,
+                  detailedOutput=(options.details or options.keepSimulation), isCancelled=isCancelled)
+
+   bottlenecks = []
+   table = []
+   if options.details:
+      bottlenecks = sim.getBottlenecks()
+      tableLineData = sim.getTableLineData()
+      columns = getUopsTableColumns(tableLineData, uArchConfig)
+      for i, tld in enumerate(tableLineData):
+         line = {'instruction': tld.string, 'url': tld.url}
+         line.update((k, (v[i] or '') if (k == 'Notes') else v[i]) for k, v in columns.items())
+         table.append(line)
+
+   return AnalysisResult(sim.TP, bottlenecks, table, sim if options.keepSimulation else None)
+
+
 # Disassembles a binary and finds for each instruction the corresponding entry in the XML file.
 # With the -iacaMarkers option, only the parts of the code that are between the IACA markers are considered.
 def main():
@@ -2375,6 +3861,16 @@ def main():
    parser = argparse.ArgumentParser(description='Disassembler')
    parser.add_argument('filename', help='File to be disassembled')
    parser.add_argument('-iacaMarkers', help='Use IACA markers', action='store_true')
+   parser.add_argument('-allIacaRegions', help='Analyze all regions between IACA markers', action='store_true')
+   parser.add_argument('-loops', help='Analyze all innermost loops of an ELF file', action='store_true')
+   parser.add_argument('-corpus', help='Analyze a corpus of basic blocks; the filename can be a directory with one file per block, a CSV file in the '
+                                       'format of BHive (with the code in hex in the first column), or "-" for stdin; files can be gzip-compressed. '
+                                       'The results are written as JSON lines. -arch can be a comma-separated list.', action='store_true')
+   parser.add_argument('-unordered', help='With -corpus, output the results as soon as they are available', action='store_true')
+   parser.add_argument('-bottlenecks', help='With -corpus, also output the bottlenecks', action='store_true')
+   parser.add_argument('-diff', help='Compare the innermost loops of an ELF file with those of an older version of the file', metavar='OLD_FILE')
+   parser.add_argument('-profile', help='Estimate the cycles of an ELF file for a profile with lines of the form "<address in hex> [<count>]"')
+   parser.add_argument('-topK', help='Number of basic blocks that are simulated with -profile; default: 20', type=int, default=20)
    parser.add_argument('-raw', help='raw file', action='store_true')
    parser.add_argument('-arch', help='Microarchitecture; Possible values: all, ' + ', '.join(allMicroArchs), default='all')
    parser.add_argument('-trace', help='HTML trace', nargs='?', const='trace.html')
@@ -2390,8 +3886,31 @@ def main():
                                            '"same" (they all have the same value), '
                                            '"stack" (they all have the same value, except for the stack and base pointers); '
                                            'default: "diff"', default='diff')
+   parser.add_argument('-decodeCache', help='Cache the disassembly of input files in the specified directory (or in ' + getDefaultCacheDir() + ')',
+                       nargs='?', const=getDefaultCacheDir())
+   parser.add_argument('-resultCache', help='Cache the simulation results of -profile and -diff in the specified directory (or in ' +
+                                            getDefaultCacheDir('results') + ')', nargs='?', const=getDefaultCacheDir('results'))
+   parser.add_argument('-executor', help='Run parallel simulations in a process pool or in a thread pool; default: thread pool on free-threaded '
+                                         'Python builds, process pool otherwise', choices=['process', 'thread'])
    args = parser.parse_args()
 
+   if args.corpus:
+      if (args.raw or args.iacaMarkers or args.allIacaRegions or args.loops or args.profile or args.diff or args.trace or args.graph or args.TPonly
+            or (args.alignmentOffset == 'all')):
+         print('Unsupported parameter combination')
+         exit(1)
+      archs = allMicroArchs if (args.arch == 'all') else args.arch.split(',')
+      if not all(arch in MicroArchConfigs for arch in archs):
+         print('Unsupported microarchitecture')
+         exit(1)
+      outFile = open(args.json, 'w') if args.json else sys.stdout
+      for record in analyzeCorpus(readCorpus(args.filename), [MicroArchConfigs[arch] for arch in archs], int(args.alignmentOffset), args.initPolicy,
+                                  args.noMicroFusion, args.noMacroFusion, args.simpleFrontEnd, args.bottlenecks, not args.unordered,
+                                  executorType=args.executor):
+         outFile.write(json.dumps(record) + '\n')
+         outFile.flush()
+      exit(0)
+
    if not args.arch in list(MicroArchConfigs) + ['all']:
       print('Unsupported microarchitecture')
       exit(1)
@@ -2399,13 +3918,17 @@ def main():
       print('Unsupported -initPolicy')
       exit(1)
 
+   decodeCache = DecodeCache(args.decodeCache) if args.decodeCache else None
+   resultCache = FileCache(args.resultCache) if args.resultCache else None
+
    if args.arch == 'all':
-      if args.TPonly or args.trace or args.graph or args.json or (args.alignmentOffset == 'all'):
+      if args.allIacaRegions or args.loops or args.profile or args.diff or args.TPonly or args.trace or args.graph or args.json or (args.alignmentOffset == 'all'):
          print('Unsupported parameter combination')
          exit(1)
-      disasList = [getXedDisas(args.filename, args.raw, MicroArchConfigs[uArch], args.iacaMarkers) for uArch in allMicroArchs]
       uArchConfigsList = [MicroArchConfigs[uArch] for uArch in allMicroArchs]
-      with futures.ProcessPoolExecutor() as executor:
+      disasForChip = getXedDisasForArchs(args.filename, args.raw, uArchConfigsList, args.iacaMarkers, decodeCache)
+      disasList = [disasForChip[uArchConfig.XEDName] for uArchConfig in uArchConfigsList]
+      with getExecutor(args.executor) as executor:
          TPList = list(executor.map(runSimulation, disasList, uArchConfigsList, repeat(int(args.alignmentOffset)), repeat(args.initPolicy),
                                                    repeat(args.noMicroFusion), repeat(args.noMacroFusion), repeat(args.simpleFrontEnd)))
       TPDict = {}
@@ -2421,12 +3944,83 @@ def main():
       exit(0)
 
    uArchConfig = MicroArchConfigs[args.arch]
-   disas = getXedDisas(args.filename, args.raw, uArchConfig, args.iacaMarkers)
+   if args.allIacaRegions:
+      if args.trace or args.graph or (args.alignmentOffset == 'all'):
+         print('Unsupported parameter combination')
+         exit(1)
+      results = analyzeIACAMarkedRegions(args.filename, args.raw, uArchConfig, int(args.alignmentOffset), args.initPolicy, args.noMicroFusion,
+                                         args.noMacroFusion, args.simpleFrontEnd, args.executor)
+      for result in results:
+         if 'error' in result:
+            print('Region at file offset 0x{:x}: {}'.format(result['fileOffset'], result['error']))
+         else:
+            print('Region at file offset 0x{:x}: {:.2f}'.format(result['fileOffset'], result['throughput']))
+      if args.json:
+         with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+      exit(0)
+
+   if args.profile:
+      if args.raw or args.iacaMarkers or args.loops or args.allIacaRegions or args.trace or args.graph or (args.alignmentOffset != '0'):
+         print('Unsupported parameter combination')
+         exit(1)
+      result = analyzeProfile(args.filename, args.profile, uArchConfig, args.topK, args.initPolicy, args.noMicroFusion, args.noMacroFusion,
+                              args.simpleFrontEnd, resultCache, args.executor)
+      print('Estimated cycles: {:.0f} (simulated blocks cover {:.1f}% of the samples)'.format(result['cycles'],
+                                                                         100 * result['coveredHits'] / max(1, result['totalHits'])))
+      print()
+      print('Blocks with the most cycles:')
+      for block in result['blocks']:
+         print('    - {}+0x{:x}: {:.1f}% ({} hits, {} instructions, TP {:.2f}{})'.format(block['function'], block['offset'],
+                        100 * block['cycles'] / max(1, result['cycles']), block['hits'], block['instructions'], block['throughput'],
+                        ', loop' if block['loop'] else ''))
+      if args.json:
+         with open(args.json, 'w') as f:
+            json.dump(result, f, indent=2)
+      exit(0)
+
+   if args.diff:
+      if args.raw or args.iacaMarkers or args.loops or args.allIacaRegions or args.profile or args.trace or args.graph or (args.alignmentOffset != '0'):
+         print('Unsupported parameter combination')
+         exit(1)
+      results = analyzeLoopDiff(args.diff, args.filename, uArchConfig, args.initPolicy, args.noMicroFusion, args.noMacroFusion,
+                                args.simpleFrontEnd, decodeCache, resultCache, args.executor)
+      nChanged = sum(1 for r in results if r.get('changed'))
+      nAdded = sum(1 for r in results if 'oldFunction' not in r)
+      nRemoved = sum(1 for r in results if 'function' not in r)
+      print('Loops: {} unchanged, {} changed, {} added, {} removed'.format(len(results) - nChanged - nAdded - nRemoved, nChanged, nAdded, nRemoved))
+      for r in results:
+         if 'oldFunction' not in r:
+            print('    - {}+0x{:x} (added): {:.2f}'.format(r['function'], r['offset'], r['throughput']))
+         elif 'function' not in r:
+            print('    - {}+0x{:x} (removed)'.format(r['oldFunction'], r['oldOffset']))
+         elif r['throughput'] != r['oldThroughput']:
+            print('    - {}+0x{:x}: {:.2f} -> {:.2f} ({:+.2f})'.format(r['function'], r['offset'], r['oldThroughput'], r['throughput'],
+                                                                  r['throughput'] - r['oldThroughput']))
+      if args.json:
+         with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+      exit(0)
+
+   if args.loops:
+      if args.raw or args.iacaMarkers or args.trace or args.graph or (args.alignmentOffset != '0'):
+         print('Unsupported parameter combination')
+         exit(1)
+      results = analyzeLoops(args.filename, uArchConfig, args.initPolicy, args.noMicroFusion, args.noMacroFusion, args.simpleFrontEnd,
+                             args.executor)
+      for result in results:
+         print('{}+0x{:x}: {:.2f}'.format(result['function'], result['offset'], result['throughput']))
+      if args.json:
+         with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+      exit(0)
+
+   disas = getXedDisas(args.filename, args.raw, uArchConfig, args.iacaMarkers, decodeCache)
    if args.alignmentOffset == 'all':
       if args.TPonly or args.trace or args.graph or args.json:
          print('Unsupported parameter combination')
          exit(1)
-      with futures.ProcessPoolExecutor() as executor:
+      with getExecutor(args.executor) as executor:
          TPList = list(executor.map(runSimulation, repeat(disas), repeat(uArchConfig), range(0,64), repeat(args.initPolicy), repeat(args.noMicroFusion),
                                                    repeat(args.noMacroFusion), repeat(args.simpleFrontEnd)))
       TPDict = {}
@@ -0,0 +1,148 @@
+import ctypes
+import os
+
+from elfFile import getExecutableELFSections
+
+# Optional in-process binding of the XED library. If a shared XED library (built in XED-to-XML with "./mfile.py --shared examples") is located
+# next to this file, the code is decoded directly from a bytes buffer, without starting the xed binary. The library generates the same text as
+# "xed -64 -v 4 -isa-set -chip-check <chip>", so the result can be processed by disas.parseXedOutput.
+
+libNames = ['libxed.so', 'libxed.dylib', 'xed.dll']
+
+maxDecodedInstSize = 8192 # upper bound for sizeof(xed_decoded_inst_t)
+maxInstrLength = 15
+bufferLen = 16384
+
+# For instructions in these categories, the decoding depends on the chip (e.g., hint NOPs that are decoded as MPX instructions on some chips)
+chipDependentCategories = {'WIDENOP', 'MPX', 'CET', 'CLDEMOTE', 'WBNOINVD'}
+
+class XedState(ctypes.Structure):
+   _fields_ = [('mmode', ctypes.c_int), ('stack_addr_width', ctypes.c_int)]
+
+
+class XedLib:
+   def __init__(self, path):
+      lib = ctypes.CDLL(path)
+      c_p = ctypes.c_void_p
+
+      def bind(name, restype, argtypes):
+         f = getattr(lib, name) # raises AttributeError if the library does not export name
+         f.restype = restype
+         f.argtypes = argtypes
+         return f
+
+      self.tablesInit = bind('xed_tables_init', None, [])
+      self.zeroSetMode = bind('xed_decoded_inst_zero_set_mode', None, [c_p, ctypes.POINTER(XedState)])
+      self.setInputChip = bind('xed_decoded_inst_set_input_chip', None, [c_p, ctypes.c_int])
+      self.decodeInstr = bind('xed_decode', ctypes.c_int, [c_p, ctypes.c_char_p, ctypes.c_uint])
+      self.getLength = bind('xed_decoded_inst_get_length', ctypes.c_uint, [c_p])
+      self.getCategory = bind('xed_decoded_inst_get_category', ctypes.c_int, [c_p])
+      self.getExtension = bind('xed_decoded_inst_get_extension', ctypes.c_int, [c_p])
+      self.getIsaSet = bind('xed_decoded_inst_get_isa_set', ctypes.c_int, [c_p])
+      self.dump = bind('xed_decoded_inst_dump', None, [c_p, ctypes.c_char_p, ctypes.c_int])
+      self.formatContext = bind('xed_format_context', ctypes.c_int, [ctypes.c_int, c_p, ctypes.c_char_p, ctypes.c_int, ctypes.c_uint64, c_p, c_p])
+      self.categoryStr = bind('xed_category_enum_t2str', ctypes.c_char_p, [ctypes.c_int])
+      self.extensionStr = bind('xed_extension_enum_t2str', ctypes.c_char_p, [ctypes.c_int])
+      self.isaSetStr = bind('xed_isa_set_enum_t2str', ctypes.c_char_p, [ctypes.c_int])
+      self.errorStr = bind('xed_error_enum_t2str', ctypes.c_char_p, [ctypes.c_int])
+      self.strToChip = bind('str2xed_chip_enum_t', ctypes.c_int, [ctypes.c_char_p])
+      self.isaSetValidForChip = bind('xed_isa_set_is_valid_for_chip', ctypes.c_int, [ctypes.c_int, ctypes.c_int])
+      strToMachineMode = bind('str2xed_machine_mode_enum_t', ctypes.c_int, [ctypes.c_char_p])
+      strToAddressWidth = bind('str2xed_address_width_enum_t', ctypes.c_int, [ctypes.c_char_p])
+      strToSyntax = bind('str2xed_syntax_enum_t', ctypes.c_int, [ctypes.c_char_p])
+
+      self.tablesInit()
+      self.state = XedState(strToMachineMode(b'LONG_64'), strToAddressWidth(b'64b'))
+      self.intelSyntax = strToSyntax(b'INTEL')
+      self.invalidChip = self.strToChip(b'INVALID')
+
+   # Returns the output that the xed binary would generate for the code (in the format that is expected by parseXedOutput), or None if the format
+   # of the file is not supported.
+   def getXedOutput(self, code, rawFile, chipName):
+      outputs = self.getXedOutputForChips(code, rawFile, [chipName])
+      return outputs[chipName] if (outputs is not None) else None
+
+   # Returns a dict chipName -> output; the code is only decoded once, and then checked for each chip. Only if some instructions are not valid
+   # for a chip (or if the decoding could be chip dependent), the code is decoded again for this chip.
+   def getXedOutputForChips(self, code, rawFile, chipNames):
+      chips = {chipName: self.strToChip(chipName.encode()) for chipName in chipNames}
+      if self.invalidChip in chips.values():
+         return None
+
+      if rawFile:
+         sections = [(None, 0, code)]
+      else:
+         sections = getExecutableELFSections(code)
+         if sections is None:
+            return None
+
+      output, isaSets, categories = self.disassemble(sections, None)
+      if (categories & chipDependentCategories) or ('ERROR: ' in output):
+         return {chipName: self.disassemble(sections, chip)[0] for chipName, chip in chips.items()}
+
+      outputs = {}
+      for chipName, chip in chips.items():
+         if all(self.isaSetValidForChip(isaSet, chip) for isaSet in isaSets):
+            outputs[chipName] = output
+         else:
+            # decode again to get the same error message as the xed binary
+            outputs[chipName] = self.disassemble(sections, chip)[0]
+      return outputs
+
+   # Returns (output, set of ISA sets, set of categories); if chip is None, the instructions are not checked for a specific chip
+   def disassemble(self, sections, chip):
+      xedd = ctypes.create_string_buffer(maxDecodedInstSize)
+      buf = ctypes.create_string_buffer(bufferLen)
+      lines = []
+      isaSets = set()
+      categories = set()
+      for name, address, sectionCode in sections:
+         if name is not None:
+            lines.append('# SECTION {}'.format(name))
+         offset = 0
+         while offset < len(sectionCode):
+            instrBytes = sectionCode[offset:offset+maxInstrLength]
+            self.zeroSetMode(xedd, ctypes.byref(self.state))
+            if chip is not None:
+               self.setInputChip(xedd, chip)
+            error = self.decodeInstr(xedd, instrBytes, len(instrBytes))
+            if error != 0:
+               lines.append('ERROR: {} Could not decode at offset: 0x{:x} PC: 0x{:x}: [{}]'.format(self.errorStr(error).decode(), offset,
+                                                                                                 address + offset, instrBytes.hex().upper()))
+               break
+            length = self.getLength(xedd)
+            isaSet = self.getIsaSet(xedd)
+            isaSets.add(isaSet)
+            category = self.categoryStr(self.getCategory(xedd)).decode()
+            categories.add(category)
+
+            self.dump(xedd, buf, bufferLen)
+            lines.append(buf.value.decode())
+
+            if not self.formatContext(self.intelSyntax, xedd, buf, bufferLen, address + offset, None, None):
+               buf.value = b'Error disassembling'
+            lines.append('XDIS {:x}: {:<9} {:<6} {:<10} {} {}'.format(address + offset, category, self.extensionStr(self.getExtension(xedd)).decode(),
+                                                                   self.isaSetStr(isaSet).decode(), sectionCode[offset:offset+length].hex().upper(),
+                                                                   buf.value.decode()))
+            offset += length
+      lines.append('')
+      return ('\n'.join(lines), isaSets, categories)
+
+
+xedLib = None
+xedLibLoaded = False
+
+# Returns the XedLib instance for the library next to this file, or None if there is no (usable) library
+def getXedLib():
+   global xedLib, xedLibLoaded
+   if not xedLibLoaded:
+      xedLibLoaded = True
+      for libName in libNames:
+         path = os.path.join(os.path.dirname(os.path.realpath(__file__)), libName)
+         if os.path.isfile(path):
+            try:
+               xedLib = XedLib(path)
+            except (OSError, AttributeError):
+               xedLib = None
+            break
+   return xedLib